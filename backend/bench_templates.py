@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.doc_types import DocumentType
+from services.foxit import create_template_env, warmup_context
+
+# ==========================================
+# ⏱ Template render benchmark (per doc type)
+# ==========================================
+# Usage: python bench_templates.py [iterations]
+#
+# cold/no-cache : fresh worker without bytecode cache (parse + compile + render)
+# cold/bytecode : fresh worker loading the persisted bytecode cache
+# warm          : steady-state render of an already loaded template
+# warm/large    : steady-state render of a large (long transcript) context
+
+
+def sample_context(doc_type: str, items: int) -> dict:
+    return {
+        "title": f"Benchmark {doc_type}",
+        "doc_type": doc_type,
+        "date": "Oct 27, 2025",
+        "structured_data": {
+            "summary": "Quarterly planning discussion covering roadmap, staffing and risks. " * 5,
+            "attendees": [f"Person {i}" for i in range(min(items, 20))],
+            "action_items": [f"Follow up on item {i} with the owning team before Friday" for i in range(items)],
+            "key_decisions": [f"Decision {i}: proceed with option B" for i in range(items // 2)],
+        },
+    }
+
+
+def first_render_ms(cache_dir, template_name: str, context: dict) -> float:
+    start = time.perf_counter()
+    env = create_template_env(cache_dir=cache_dir, auto_reload=False)
+    env.get_template(template_name).render(**context)
+    return (time.perf_counter() - start) * 1000
+
+
+def warm_render_ms(env, template_name: str, context: dict, iterations: int) -> float:
+    template = env.get_template(template_name)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        template.render(**context)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(iterations: int = 200):
+    print(f"🚀 Template render benchmark ({iterations} iterations, median ms)\n")
+    print(f"{'doc type':<24}{'cold/no-cache':>15}{'cold/bytecode':>15}{'warm':>10}{'warm/large':>12}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = create_template_env(cache_dir=cache_dir, auto_reload=False)
+        for doc_type in DocumentType:
+            name = f"{doc_type.value}.html"
+            small = sample_context(doc_type.value, 10)
+            large = sample_context(doc_type.value, 2000)
+
+            no_cache = first_render_ms(None, name, warmup_context(doc_type.value))
+            # Populate the bytecode cache, then time a fresh environment loading it
+            first_render_ms(cache_dir, name, warmup_context(doc_type.value))
+            bytecode = first_render_ms(cache_dir, name, warmup_context(doc_type.value))
+
+            warm = warm_render_ms(env, name, small, iterations)
+            warm_large = warm_render_ms(env, name, large, max(1, iterations // 10))
+            print(f"{doc_type.value:<24}{no_cache:>15.2f}{bytecode:>15.2f}{warm:>10.3f}{warm_large:>12.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
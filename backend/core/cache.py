@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# ==========================================
+# 🗄 Two-tier (memory + disk) result cache
+# ==========================================
+
+
+def content_key(*parts: str) -> str:
+    """SHA-256 over NUL-separated parts. Used as a content address."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with a fixed entry budget."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    JSON entries (plus optional file attachments) under a directory.
+    Entries expire after `ttl_seconds`; once the directory exceeds `max_bytes`
+    the least recently used entries are evicted. Access time is tracked via mtime.
+
+    An entry's files have fixed names ({key}.json, {key}.{attachment} for the
+    `attachments` names given up front), so lookups only stat those paths.
+    The directory is scanned for eviction only when a running byte count
+    passes `max_bytes` (then trimmed to LOW_WATER of it), or every
+    EVICT_EVERY_WRITES writes to drop expired entries.
+    """
+
+    LOW_WATER = 0.9
+    EVICT_EVERY_WRITES = 256
+
+    def __init__(self, directory: str, ttl_seconds: float, max_bytes: int, attachments: Tuple[str, ...] = ()):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.attachments = tuple(attachments)
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last scan plus writes since; None until the first scan
+        self._bytes: Optional[int] = None
+        self._writes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def attachment_path(self, key: str, name: str) -> str:
+        return os.path.join(self.directory, f"{key}.{name}")
+
+    def _entry_files(self, key: str) -> List[str]:
+        return [self._entry_path(key)] + [self.attachment_path(key, name) for name in self.attachments]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        if self.ttl_seconds and time.time() - stat.st_mtime > self.ttl_seconds:
+            self.delete(key)
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.delete(key)
+            return None
+
+        now = time.time()
+        for file_path in self._entry_files(key):
+            try:
+                os.utime(file_path, (now, now))
+            except OSError:
+                pass
+        return value
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def set(self, key: str, value: Dict[str, Any], attachments: Optional[Dict[str, str]] = None):
+        """Stores `value` and copies each attachment (name -> source path) next to it."""
+        os.makedirs(self.directory, exist_ok=True)
+        written = 0
+        for name, source in (attachments or {}).items():
+            if name not in self.attachments:
+                raise ValueError(f"Unknown cache attachment: {name}")
+            target = self.attachment_path(key, name)
+            tmp = f"{target}.tmp"
+            shutil.copyfile(source, tmp)
+            written += self._size(tmp) - self._size(target)
+            os.replace(tmp, target)
+
+        path = self._entry_path(key)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        written += self._size(tmp) - self._size(path)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._writes += 1
+            if self._bytes is not None:
+                self._bytes += written
+            due = (
+                self._bytes is None
+                or (self.max_bytes and self._bytes > self.max_bytes)
+                or (self.ttl_seconds and self._writes >= self.EVICT_EVERY_WRITES)
+            )
+        if due:
+            self.evict()
+
+    def delete(self, key: str):
+        for file_path in self._entry_files(key):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """Drops expired entries, then LRU entries until under the byte budget."""
+        with self._lock:
+            entries: Dict[str, Dict[str, float]] = {}
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                return
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                key = name.split(".", 1)[0]
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entry = entries.setdefault(key, {"size": 0, "mtime": 0.0})
+                entry["size"] += stat.st_size
+                entry["mtime"] = max(entry["mtime"], stat.st_mtime)
+
+            now = time.time()
+            total = 0
+            for key, entry in list(entries.items()):
+                if self.ttl_seconds and now - entry["mtime"] > self.ttl_seconds:
+                    self.delete(key)
+                    del entries[key]
+                else:
+                    total += entry["size"]
+
+            if self.max_bytes and total > self.max_bytes:
+                target = self.max_bytes * self.LOW_WATER
+                for key, entry in sorted(entries.items(), key=lambda item: item[1]["mtime"]):
+                    if total <= target:
+                        break
+                    self.delete(key)
+                    total -= entry["size"]
+            self._bytes = total
+            self._writes = 0
+
+
+class ResultCache:
+    """
+    Pipeline result cache. The memory tier holds result dicts; the disk tier
+    also keeps a copy of the final PDF so a hit can restore it if `output/`
+    was cleaned in the meantime.
+    """
+
+    PDF_ATTACHMENT = "pdf"
+
+    def __init__(self, directory: str, ttl_seconds: float, max_bytes: int, memory_entries: int):
+        self.memory = LRUCache(memory_entries)
+        self.disk = DiskCache(directory, ttl_seconds, max_bytes, attachments=(self.PDF_ATTACHMENT,))
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            expired = self.ttl_seconds and time.time() - entry["stored_at"] > self.ttl_seconds
+            if not expired and self._pdf_available(entry["result"]):
+                return entry["result"]
+            self.memory.delete(key)
+
+        entry = self.disk.get(key)
+        if entry is None:
+            return None
+
+        result = entry["result"]
+        if not self._pdf_available(result) and not self._restore_pdf(key, result):
+            self.disk.delete(key)
+            return None
+
+        self.memory.set(key, entry)
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        pdf_path = result.get("pdf_path")
+        if not pdf_path or not os.path.exists(pdf_path):
+            return
+        entry = {"stored_at": time.time(), "result": result}
+        self.memory.set(key, entry)
+        try:
+            self.disk.set(key, entry, attachments={self.PDF_ATTACHMENT: pdf_path})
+        except OSError as e:
+            print(f"⚠️ Result cache write failed (Non-blocking): {e}")
+
+    def _pdf_available(self, result: Dict[str, Any]) -> bool:
+        pdf_path = result.get("pdf_path")
+        return bool(pdf_path) and os.path.exists(pdf_path)
+
+    def _restore_pdf(self, key: str, result: Dict[str, Any]) -> bool:
+        source = self.disk.attachment_path(key, self.PDF_ATTACHMENT)
+        pdf_path = result.get("pdf_path")
+        if not pdf_path or not os.path.exists(source):
+            return False
+        directory = os.path.dirname(pdf_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(source, pdf_path)
+        return True
@@ -0,0 +1,166 @@
+import re
+import json
+from typing import Any, Dict, List
+
+# ==========================================
+# ✂️ Chunking & deterministic merge (map-reduce structuring)
+# ==========================================
+
+# "Speaker 1:" (Deepgram diarization) or "Alice:" at the start of a line
+SPEAKER_TURN_RE = re.compile(r"(?m)^(?=(?:Speaker \d+|[A-Z][\w .'-]{0,40}):\s)")
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Content field that carries the document-level summary, per doc type
+SUMMARY_FIELDS = {
+    "meeting_notes": "summary",
+    "product_requirements": "overview",
+    "code_documentation": "description",
+    "general": "summary",
+}
+
+METADATA_KEYS = ("title", "doc_type", "date")
+
+
+def _split_units(text: str) -> List[str]:
+    """Speaker turns when the text is a transcript, else paragraphs."""
+    turns = [t for t in SPEAKER_TURN_RE.split(text) if t.strip()]
+    if len(turns) > 1:
+        return turns
+    return [p for p in PARAGRAPH_RE.split(text) if p.strip()]
+
+
+def _split_oversized(unit: str, max_chars: int) -> List[str]:
+    """Sentence boundaries first, hard cuts only for run-on text."""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_RE.split(unit):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """
+    Splits text into chunks of at most `max_chars`, cutting on speaker turns
+    and paragraph boundaries so no turn is split unless it is itself too long.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = ""
+    for unit in _split_units(text):
+        unit = unit.strip()
+        parts = [unit] if len(unit) <= max_chars else _split_oversized(unit, max_chars)
+        for part in parts:
+            if current and len(current) + len(part) + 2 > max_chars:
+                chunks.append(current)
+                current = part
+            else:
+                current = f"{current}\n\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _content_of(part: Dict[str, Any]) -> Dict[str, Any]:
+    content = part.get("content")
+    if isinstance(content, dict):
+        return content
+    return {k: v for k, v in part.items() if k not in METADATA_KEYS}
+
+
+def _norm(value: Any) -> str:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return json.dumps(value, sort_keys=True)
+
+
+def _merge_action_items(existing: List[Any], items: List[Any]):
+    """Merges by owner+task; later chunks only fill in missing fields."""
+    index = {}
+    for i, item in enumerate(existing):
+        if isinstance(item, dict):
+            index[(_norm(item.get("owner") or ""), _norm(item.get("task") or ""))] = i
+    for item in items:
+        if not isinstance(item, dict):
+            if _norm(item) not in {_norm(e) for e in existing}:
+                existing.append(item)
+            continue
+        key = (_norm(item.get("owner") or ""), _norm(item.get("task") or ""))
+        if key in index:
+            merged = existing[index[key]]
+            for field, value in item.items():
+                if merged.get(field) in (None, "") and value not in (None, ""):
+                    merged[field] = value
+        else:
+            index[key] = len(existing)
+            existing.append(dict(item))
+
+
+def _merge_list(existing: List[Any], items: List[Any]):
+    """Concatenates in order, dropping duplicates (case/whitespace-insensitive)."""
+    seen = {_norm(item) for item in existing}
+    for item in items:
+        key = _norm(item)
+        if key not in seen:
+            seen.add(key)
+            existing.append(item)
+
+
+def merge_structured(parts: List[Dict[str, Any]], doc_type: str) -> Dict[str, Any]:
+    """
+    Deterministically merges per-chunk structures (in chunk order):
+    attendees and other lists are deduplicated, action_items are merged by
+    owner+task, key decisions are concatenated, and scalar fields keep the
+    first non-empty value. The summary field is left for a final pass.
+    """
+    content: Dict[str, Any] = {}
+    title = None
+    for part in parts:
+        title = title or part.get("title")
+        for field, value in _content_of(part).items():
+            if isinstance(value, list):
+                merged = content.setdefault(field, [])
+                if not isinstance(merged, list):
+                    continue
+                if field == "action_items":
+                    _merge_action_items(merged, value)
+                else:
+                    _merge_list(merged, value)
+            elif isinstance(value, dict):
+                merged = content.setdefault(field, {})
+                if isinstance(merged, dict):
+                    for key, sub_value in value.items():
+                        merged.setdefault(key, sub_value)
+            elif field not in content or content[field] in (None, ""):
+                content[field] = value
+
+    return {
+        "doc_type": doc_type,
+        "title": title or "Untitled Document",
+        "content": content,
+    }
+
+
+def chunk_summaries(parts: List[Dict[str, Any]], doc_type: str) -> List[str]:
+    """Per-chunk summary texts, used as input for the final summary pass."""
+    field = SUMMARY_FIELDS.get(doc_type, "summary")
+    summaries = []
+    for part in parts:
+        value = _content_of(part).get(field)
+        if isinstance(value, str) and value.strip():
+            summaries.append(value.strip())
+    return summaries
@@ -12,16 +12,105 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Deepgram (Voice to Text)
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# /transcribe-audio: uploads are relayed to Deepgram as they arrive; larger ones are rejected (413)
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_MAX_BYTES", str(1024 ** 3)))
+# /ws/transcribe (Deepgram live API): silence that ends a final segment; KeepAlive interval while no audio is sent
+DEEPGRAM_LIVE_ENDPOINTING_MS = int(os.getenv("DEEPGRAM_LIVE_ENDPOINTING_MS", "300"))
+DEEPGRAM_LIVE_KEEPALIVE_SECONDS = float(os.getenv("DEEPGRAM_LIVE_KEEPALIVE_SECONDS", "5"))
+# Long WAV recordings are cut into ~SEGMENT_SECONDS pieces (at the quietest point within +/- SEARCH_SECONDS),
+# overlapping by OVERLAP_SECONDS, and transcribed with up to CONCURRENCY requests at a time
+DEEPGRAM_SEGMENT_SECONDS = float(os.getenv("DEEPGRAM_SEGMENT_SECONDS", "300"))
+DEEPGRAM_SEGMENT_OVERLAP_SECONDS = float(os.getenv("DEEPGRAM_SEGMENT_OVERLAP_SECONDS", "4"))
+DEEPGRAM_SEGMENT_SEARCH_SECONDS = float(os.getenv("DEEPGRAM_SEGMENT_SEARCH_SECONDS", "15"))
+DEEPGRAM_SEGMENT_CONCURRENCY = int(os.getenv("DEEPGRAM_SEGMENT_CONCURRENCY", "8"))
+# Transcripts of already-seen audio (SHA-256 of the bytes + request settings), kept on disk
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", ".cache/transcripts")
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Word timings in transcripts: full (Deepgram's per-word objects) | columnar (parallel arrays, ~10x smaller) | none
+TRANSCRIPT_WORD_FORMAT = os.getenv("TRANSCRIPT_WORD_FORMAT", "full").lower()
 
 # Foxit PDF Services (Document Generation & Enhancement)
 # Get credentials from: https://developers.foxit.com/
 FOXIT_CLIENT_ID = os.getenv("FOXIT_CLIENT_ID")
 FOXIT_CLIENT_SECRET = os.getenv("FOXIT_CLIENT_SECRET")
+# OAuth token refresh: renew this long before expiry; TTL used when expires_in is absent
+FOXIT_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("FOXIT_TOKEN_REFRESH_MARGIN_SECONDS", "120"))
+FOXIT_TOKEN_DEFAULT_TTL_SECONDS = float(os.getenv("FOXIT_TOKEN_DEFAULT_TTL_SECONDS", "3600"))
+FOXIT_TOKEN_RETRY_SECONDS = float(os.getenv("FOXIT_TOKEN_RETRY_SECONDS", "10"))
+# PDF Services tasks (upload -> poll -> download): backoff between status checks, give-up time,
+# task ids per batched status request, concurrent uploads/downloads
+FOXIT_TASK_POLL_INITIAL_SECONDS = float(os.getenv("FOXIT_TASK_POLL_INITIAL_SECONDS", "0.5"))
+FOXIT_TASK_POLL_MAX_SECONDS = float(os.getenv("FOXIT_TASK_POLL_MAX_SECONDS", "8"))
+FOXIT_TASK_TIMEOUT_SECONDS = float(os.getenv("FOXIT_TASK_TIMEOUT_SECONDS", "300"))
+FOXIT_TASK_BATCH_SIZE = int(os.getenv("FOXIT_TASK_BATCH_SIZE", "50"))
+FOXIT_TASK_TRANSFER_CONCURRENCY = int(os.getenv("FOXIT_TASK_TRANSFER_CONCURRENCY", "16"))
 
 # Sanity CMS (Storage)
 SANITY_PROJECT_ID = os.getenv("SANITY_PROJECT_ID")
 SANITY_DATASET = os.getenv("SANITY_DATASET", "production")
 SANITY_TOKEN = os.getenv("SANITY_TOKEN")
 
+# Outbound HTTP (shared keep-alive pools for Foxit, Sanity, Deepgram)
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))  # connections kept per host
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "60"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+# Idempotent calls only; POSTs are never retried automatically
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+
 # App Settings
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+# Generated PDFs (content-addressed file names)
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR", "output")
+# Storage quota: least recently used PDFs are evicted above this size; unused ones after max age (0 = off)
+PDF_STORE_MAX_BYTES = int(os.getenv("PDF_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+PDF_STORE_MAX_AGE_SECONDS = float(os.getenv("PDF_STORE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+PDF_STORE_EVICT_INTERVAL_SECONDS = float(os.getenv("PDF_STORE_EVICT_INTERVAL_SECONDS", "60"))
+# auto: render small documents in-process, larger ones via Foxit | foxit | local
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto").lower()
+PDF_LOCAL_MAX_HTML_CHARS = int(os.getenv("PDF_LOCAL_MAX_HTML_CHARS", "20000"))
+# local: in-process incremental update | foxit: Foxit PDF Services task (local on failure)
+PDF_ENHANCE_BACKEND = os.getenv("PDF_ENHANCE_BACKEND", "local").lower()
+
+# Jinja templates: compiled bytecode persisted here; reload from disk only in development
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".cache/jinja")
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", str(ENVIRONMENT == "development")).lower() == "true"
+# Contexts larger than this (approx. characters) render in a worker thread
+TEMPLATE_THREAD_THRESHOLD_CHARS = int(os.getenv("TEMPLATE_THREAD_THRESHOLD_CHARS", "50000"))
+
+# LLM
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+# One call that returns doc_type + structure (falls back to two calls if ambiguous)
+LLM_SINGLE_PASS = os.getenv("LLM_SINGLE_PASS", "true").lower() == "true"
+# Long inputs are structured in chunks (map-reduce) above this many characters
+LLM_CHUNK_THRESHOLD_CHARS = int(os.getenv("LLM_CHUNK_THRESHOLD_CHARS", "24000"))
+LLM_CHUNK_MAX_CHARS = int(os.getenv("LLM_CHUNK_MAX_CHARS", "12000"))
+LLM_CHUNK_CONCURRENCY = int(os.getenv("LLM_CHUNK_CONCURRENCY", "4"))
+# Local keyword classifier; inputs below the confidence threshold escalate to the LLM
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+
+# Result Cache (identical resubmissions skip the LLM/Foxit/Sanity chain)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", ".cache/results")
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "256"))
+
+# Background Jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", ".cache/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", "1000"))
+# Finished/failed jobs are deleted this long after they last changed (0 keeps them forever)
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "3600"))
+
+# Batch Processing
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
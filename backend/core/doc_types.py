@@ -0,0 +1,32 @@
+from enum import Enum
+from typing import Optional
+
+
+class DocumentType(Enum):
+    MEETING_NOTES = "meeting_notes"
+    PRD = "product_requirements"
+    CODE_DOCS = "code_documentation"
+    UNKNOWN = "general"
+
+
+# Short labels used by the prompts (SYSTEM_PROMPT emits "prd" / "code_docs")
+DOC_TYPE_ALIASES = {
+    "prd": DocumentType.PRD,
+    "code_docs": DocumentType.CODE_DOCS,
+}
+
+
+def parse_doc_type(label) -> Optional[DocumentType]:
+    """
+    Maps a model-emitted label onto DocumentType.
+    Returns None when the label is not a recognised value or alias.
+    """
+    if not isinstance(label, str):
+        return None
+    label = label.strip().strip("'\"").lower()
+    if label in DOC_TYPE_ALIASES:
+        return DOC_TYPE_ALIASES[label]
+    try:
+        return DocumentType(label)
+    except ValueError:
+        return None
@@ -0,0 +1,258 @@
+import os
+import json
+import uuid
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from core.pipeline import PIPELINE_STAGES, process_document_pipeline_async
+from core.config import JOBS_DB_PATH, JOB_WORKERS, JOB_QUEUE_MAX_PENDING, JOB_RETENTION_SECONDS, JOB_SWEEP_INTERVAL_SECONDS
+from core.metrics import JOBS_PURGED
+
+# ==========================================
+# 📬 Background Job Queue (SQLite-backed)
+# ==========================================
+
+# Job lifecycle: queued -> running -> succeeded | failed
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the number of pending jobs reaches the configured cap."""
+
+
+class JobStore:
+    """
+    Durable job records. Queued and running jobs found at startup are
+    re-enqueued, so work survives a restart.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    source_type TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at)")
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "text": row["text"],
+            "source_type": row["source_type"],
+            "stages": json.loads(row["stages"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def create(self, text: str, source_type: str) -> Dict[str, Any]:
+        now = datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        stages = {stage: "pending" for stage in PIPELINE_STAGES}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, text, source_type, stages, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, text, source_type, json.dumps(stages), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        """Updates status / stages / result / error for a job."""
+        columns = []
+        values = []
+        for name, value in fields.items():
+            if name in ("stages", "result") and value is not None:
+                value = json.dumps(value)
+            columns.append(f"{name} = ?")
+            values.append(value)
+        columns.append("updated_at = ?")
+        values.append(datetime.now().isoformat())
+        values.append(job_id)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", values)
+
+    def count_pending(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+            ).fetchone()
+        return row[0]
+
+    def recover(self) -> List[str]:
+        """Resets interrupted jobs to queued and returns all queued ids, oldest first."""
+        stages = json.dumps({stage: "pending" for stage in PIPELINE_STAGES})
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stages = ? WHERE status = ?",
+                (JOB_QUEUED, stages, JOB_RUNNING),
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge_finished(self, older_than: float) -> int:
+        """Deletes succeeded/failed jobs not updated in the last `older_than` seconds; returns how many."""
+        cutoff = (datetime.now() - timedelta(seconds=older_than)).isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, cutoff),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs queued pipeline jobs on a bounded pool of asyncio workers. Without
+    a `store`, the SQLite store at `db_path` is opened by start() and closed
+    by stop() (the app lifespan), so importing this module touches no files.
+    Finished and failed jobs older than `retention_seconds` are swept every
+    `sweep_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        workers: int = JOB_WORKERS,
+        max_pending: int = JOB_QUEUE_MAX_PENDING,
+        db_path: str = JOBS_DB_PATH,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        sweep_interval: float = JOB_SWEEP_INTERVAL_SECONDS,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.sweep_interval = sweep_interval
+        self._owns_store = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        if self.store is None:
+            self.store = await asyncio.to_thread(JobStore, self.db_path)
+            self._owns_store = True
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self.store.recover):
+            self._queue.put_nowait(job_id)
+        if self._queue.qsize():
+            print(f"📬 Re-queued {self._queue.qsize()} job(s) from previous run")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.retention_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._sweep_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._owns_store:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+            self._owns_store = False
+
+    async def sweep(self) -> int:
+        """Deletes finished/failed jobs past retention; returns how many."""
+        purged = await asyncio.to_thread(self.store.purge_finished, self.retention_seconds)
+        if purged:
+            JOBS_PURGED.inc(purged)
+            print(f"🧹 Purged {purged} finished job(s) older than {self.retention_seconds:g}s")
+        return purged
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Job retention sweep failed (Non-blocking): {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def submit(self, text: str, source_type: str = "text") -> Dict[str, Any]:
+        if self.max_pending and await asyncio.to_thread(self.store.count_pending) >= self.max_pending:
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending).")
+        job = await asyncio.to_thread(self.store.create, text, source_type)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Job worker {index} crashed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if not job or job["status"] != JOB_QUEUED:
+            return
+
+        stages = dict(job["stages"])
+        await asyncio.to_thread(self.store.update, job_id, status=JOB_RUNNING, stages=stages)
+
+        async def on_stage(stage: str, status: str):
+            stages[stage] = status
+            await asyncio.to_thread(self.store.update, job_id, stages=stages)
+
+        try:
+            result = await process_document_pipeline_async(job["text"], job["source_type"], on_stage=on_stage)
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            for stage, status in stages.items():
+                if status == "running":
+                    stages[stage] = "failed"
+            await asyncio.to_thread(self.store.update, job_id, status=JOB_FAILED, stages=stages, error=str(e))
+            return
+
+        result = {**result, "timestamp": datetime.now().isoformat()}
+        await asyncio.to_thread(self.store.update, job_id, status=JOB_SUCCEEDED, stages=stages, result=result)
+
+
+# Singleton (its store is opened by the app lifespan)
+job_queue = JobQueue()
@@ -0,0 +1,134 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+# ==========================================
+# 🌊 Incremental JSON section parser
+# ==========================================
+
+
+class JSONSectionStream:
+    """
+    Consumes a JSON object as it is generated, chunk by chunk, and reports
+    each member as soon as it is complete:
+
+    - members of the root object, e.g. ("doc_type",) / ("title",)
+    - members of the root "content" object, e.g. ("content", "summary")
+
+    The "content" object itself is not reported; its members already were.
+    Values are only parsed once complete, so partial strings or lists are
+    never emitted. Anything generated after the root object closes is
+    ignored.
+    """
+
+    SECTION_KEY = "content"
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        # Span of the root object: its opening bracket and just past its closing one
+        self._start = 0
+        self._end: Optional[int] = None
+        # One frame per open container: type, watched, path, key, expect, value_start
+        self._stack: List[dict] = []
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Adds generated text; returns the members completed by it."""
+        self.buffer += chunk
+        events = []
+        while self._pos < len(self.buffer) and self._end is None:
+            self._step(self.buffer[self._pos], self._pos, events)
+            self._pos += 1
+        return events
+
+    def result(self) -> Optional[dict]:
+        """The whole document once the root object is closed (None before)."""
+        if self._end is None:
+            return None
+        try:
+            value = json.loads(self.buffer[self._start:self._end])
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    def _top(self) -> Optional[dict]:
+        return self._stack[-1] if self._stack else None
+
+    def _finish_member(self, frame: dict, end: int, events: list):
+        if frame["value_start"] is None or frame["key"] is None:
+            return
+        raw = self.buffer[frame["value_start"]:end].strip()
+        frame["value_start"] = None
+        if frame["child_watched"]:
+            # Already reported member by member
+            frame["child_watched"] = False
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        events.append((frame["path"] + (frame["key"],), value))
+
+    def _step(self, c: str, i: int, events: list):
+        top = self._top()
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if top and top["watched"] and top["expect"] == "key":
+                    top["key"] = json.loads(self.buffer[self._string_start:i + 1])
+                    top["expect"] = "colon"
+            return
+
+        if c.isspace():
+            return
+
+        watched = bool(top and top["watched"])
+        if watched and top["expect"] == "value" and top["value_start"] is None and c not in ",}":
+            top["value_start"] = i
+
+        if c == '"':
+            self._in_string = True
+            self._string_start = i
+        elif c in "{[":
+            child_watched = False
+            path: Tuple[str, ...] = ()
+            if top is None:
+                child_watched = c == "{"
+                self._start = i
+            elif watched and top["expect"] == "value" and top["value_start"] == i:
+                # Direct value of a watched member: watch root["content"] too
+                if c == "{" and top["path"] == () and top["key"] == self.SECTION_KEY:
+                    child_watched = True
+                    path = (self.SECTION_KEY,)
+                    top["child_watched"] = True
+            self._stack.append({
+                "type": c,
+                "watched": child_watched,
+                "path": path,
+                "key": None,
+                "expect": "key",
+                "value_start": None,
+                "child_watched": False,
+            })
+        elif c in "}]":
+            if top is None:
+                # Stray closer before the root opened
+                return
+            if watched and c == "}":
+                self._finish_member(top, i, events)
+            self._stack.pop()
+            if not self._stack:
+                self._end = i + 1
+        elif watched and c == ":" and top["expect"] == "colon":
+            top["expect"] = "value"
+        elif watched and c == ",":
+            self._finish_member(top, i, events)
+            top["key"] = None
+            top["expect"] = "key"
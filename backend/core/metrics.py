@@ -0,0 +1,327 @@
+import time
+import math
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ==========================================
+# 📈 In-process metrics (Prometheus text format)
+# ==========================================
+# Memory is bounded per label set: histograms keep fixed buckets plus a
+# fixed-size window of recent samples for the p50/p95/p99 estimates.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_WINDOW = 1024
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class _HistogramState:
+    __slots__ = ("buckets", "count", "total", "window")
+
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=QUANTILE_WINDOW)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative buckets (Prometheus histogram) plus p50/p95/p99 over the most
+    recent QUANTILE_WINDOW observations, exported as `<name>_quantile`.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets)) + (math.inf,)
+        self._states: Dict[Tuple[str, ...], _HistogramState] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HistogramState(len(self.bounds))
+            state.buckets[bisect.bisect_left(self.bounds, value)] += 1
+            state.count += 1
+            state.total += value
+            state.window.append(value)
+
+    def time(self, **labels) -> "Timer":
+        return Timer(self, labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        state = self._states.get(self._key(labels))
+        if not state or not state.window:
+            return None
+        with self._lock:
+            samples = sorted(state.window)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def count(self, **labels) -> int:
+        state = self._states.get(self._key(labels))
+        return state.count if state else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        quantile_name = f"{self.name}_quantile"
+        lines.append(f"# HELP {quantile_name} {self.documentation} (recent-window quantiles)")
+        lines.append(f"# TYPE {quantile_name} gauge")
+        with self._lock:
+            windows = sorted((key, sorted(state.window)) for key, state in self._states.items())
+        for key, samples in windows:
+            if not samples:
+                continue
+            for q in QUANTILES:
+                value = samples[min(len(samples) - 1, int(q * len(samples)))]
+                lines.append(f"{quantile_name}{_format_labels(self.labelnames, key, ('quantile', str(q)))} {_format_value(value)}")
+        return lines
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            states = sorted((key, list(state.buckets), state.count, state.total) for key, state in self._states.items())
+        for key, buckets, count, total in states:
+            cumulative = 0
+            for bound, hits in zip(self.bounds, buckets):
+                cumulative += hits
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Timer:
+    """
+    Times a block (sync or async `with`) into a histogram. Optionally tracks
+    an in-flight gauge and counts exceptions in an error counter.
+    """
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str], in_flight: Optional[Gauge] = None,
+                 in_flight_labels: Optional[Dict[str, str]] = None, errors: Optional[Counter] = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.in_flight = in_flight
+        self.in_flight_labels = in_flight_labels or {}
+        self.errors = errors
+        self._start = 0.0
+
+    def __enter__(self):
+        if self.in_flight:
+            self.in_flight.inc(**self.in_flight_labels)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        if self.in_flight:
+            self.in_flight.dec(**self.in_flight_labels)
+        if exc_type is not None and self.errors and not issubclass(exc_type, GeneratorExit):
+            self.errors.inc(**self.labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton registry + the metrics DocuMind exports
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "documind_http_request_duration_seconds", "API request latency", ("method", "route", "status"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "documind_http_requests_in_flight", "API requests currently being served")
+STAGE_SECONDS = registry.histogram(
+    "documind_pipeline_stage_duration_seconds", "Pipeline stage latency", ("stage",))
+STAGE_ERRORS = registry.counter(
+    "documind_pipeline_stage_errors_total", "Pipeline stages that raised", ("stage",))
+STAGES_IN_FLIGHT = registry.gauge(
+    "documind_pipeline_stages_in_flight", "Pipeline stages currently running", ("stage",))
+OUTBOUND_SECONDS = registry.histogram(
+    "documind_outbound_request_duration_seconds", "Latency of calls to external services", ("service", "operation"))
+OUTBOUND_ERRORS = registry.counter(
+    "documind_outbound_errors_total", "Failed calls to external services", ("service", "operation"))
+OUTBOUND_IN_FLIGHT = registry.gauge(
+    "documind_outbound_requests_in_flight", "Calls to external services currently in flight", ("service",))
+MOCK_FALLBACKS = registry.counter(
+    "documind_mock_fallbacks_total", "Times a service fell back to mock/skipped behaviour", ("service", "operation"))
+PDF_REUSED = registry.counter(
+    "documind_pdf_reused_total", "Renders/enhancements skipped because identical output already existed", ("kind",))
+PDF_RENDERS = registry.counter(
+    "documind_pdf_renders_total", "PDFs produced, by backend", ("backend",))
+PDF_ENHANCEMENTS = registry.counter(
+    "documind_pdf_enhancements_total", "PDF enhancements, by mode (incremental update, unchanged copy, foxit)", ("mode",))
+PDF_STORE_BYTES = registry.gauge(
+    "documind_pdf_store_bytes", "Bytes of generated PDFs on disk")
+PDF_STORE_FILES = registry.gauge(
+    "documind_pdf_store_files", "Generated PDFs on disk")
+PDF_STORE_EVICTIONS = registry.counter(
+    "documind_pdf_store_evictions_total", "PDFs deleted from storage, by reason (age, quota, superseded)", ("reason",))
+JOBS_PURGED = registry.counter(
+    "documind_jobs_purged_total", "Finished or failed job records deleted by the retention sweep")
+HTTP_POOL_REQUESTS = registry.counter(
+    "documind_http_pool_requests_total", "Outbound requests sent through the shared connection pools", ("client",))
+HTTP_POOL_CONNECTIONS = registry.gauge(
+    "documind_http_pool_connections", "Pooled outbound connections per host (sync: idle/opened so far, async: idle/open)", ("client", "host", "state"))
+FOXIT_TASKS_OUTSTANDING = registry.gauge(
+    "documind_foxit_tasks_outstanding", "Foxit PDF Services tasks currently being polled")
+FOXIT_TASK_STATUS_REQUESTS = registry.counter(
+    "documind_foxit_task_status_requests_total", "Foxit task status requests, batched or single", ("mode",))
+DEEPGRAM_LIVE_SESSIONS = registry.gauge(
+    "documind_deepgram_live_sessions", "Open live transcription streams (/ws/transcribe)")
+CACHE_LOOKUPS = registry.counter(
+    "documind_result_cache_lookups_total", "Pipeline result cache lookups", ("result",))
+TRANSCRIPT_CACHE_LOOKUPS = registry.counter(
+    "documind_transcript_cache_lookups_total", "Transcript cache lookups by audio fingerprint", ("result",))
+CLASSIFIER_DECISIONS = registry.counter(
+    "documind_classifier_decisions_total", "Document classifications by route (local fast path vs LLM)", ("route",))
+
+
+def track_outbound(service: str, operation: str) -> Timer:
+    """`with track_outbound("foxit", "doc_gen"):` around an external call."""
+    return Timer(
+        OUTBOUND_SECONDS,
+        {"service": service, "operation": operation},
+        in_flight=OUTBOUND_IN_FLIGHT,
+        in_flight_labels={"service": service},
+        errors=OUTBOUND_ERRORS,
+    )
+
+
+def track_stage(stage: str) -> Timer:
+    """`with track_stage("render"):` around a pipeline stage."""
+    return Timer(
+        STAGE_SECONDS,
+        {"stage": stage},
+        in_flight=STAGES_IN_FLIGHT,
+        in_flight_labels={"stage": stage},
+        errors=STAGE_ERRORS,
+    )
+
+
+def record_mock_fallback(service: str, operation: str):
+    MOCK_FALLBACKS.inc(service=service, operation=operation)
@@ -0,0 +1,346 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from core.cache import content_key
+from core.config import (
+    PDF_OUTPUT_DIR,
+    PDF_STORE_MAX_BYTES,
+    PDF_STORE_MAX_AGE_SECONDS,
+    PDF_STORE_EVICT_INTERVAL_SECONDS,
+)
+from core.metrics import PDF_STORE_BYTES, PDF_STORE_FILES, PDF_STORE_EVICTIONS
+
+# ==========================================
+# 🗂 Content-addressed PDF output
+# ==========================================
+# Files are named after what produced them, so concurrent requests never
+# overwrite each other and identical renders can be reused as-is:
+#
+#   raw:      {template}-{sha256(engine, html)[:32]}.pdf
+#   enhanced: {template}-{sha256(raw digest, options)[:32]}_enhanced.pdf
+#
+# Files live in hashed shard directories ({root}/ab/cd/{name}) so no single
+# directory grows to hundreds of thousands of entries; `pdf_storage` indexes
+# them by name and keeps the total under a byte quota.
+
+DIGEST_CHARS = 32
+SHARD_LEVELS = 2
+CONTENT_ADDRESSED_RE = re.compile(r"^(?P<prefix>.+)-(?P<digest>[0-9a-f]{%d})\.pdf$" % DIGEST_CHARS)
+ENHANCED_RE = re.compile(r"^(?P<prefix>.+)-(?P<digest>[0-9a-f]{%d})_enhanced\.pdf$" % DIGEST_CHARS)
+
+
+def shard_path(name: str, root: Optional[str] = None) -> str:
+    """{root}/ab/cd/{name}, with ab/cd taken from the hash of the file name."""
+    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    shards = [digest[2 * i:2 * i + 2] for i in range(SHARD_LEVELS)]
+    return os.path.join(root or PDF_OUTPUT_DIR, *shards, name)
+
+
+def raw_pdf_path(template_name: str, html: str, engine: str) -> str:
+    """Output path for rendering `html` with `engine` (e.g. foxit vs mock)."""
+    digest = content_key("pdf", engine, html)[:DIGEST_CHARS]
+    return shard_path(f"{template_name}-{digest}.pdf")
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def enhanced_pdf_path(pdf_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Output path for enhancing `pdf_path` with `options`. Content-addressed
+    inputs reuse the digest in their name; anything else is hashed.
+    """
+    name = os.path.basename(pdf_path)
+    match = CONTENT_ADDRESSED_RE.match(name)
+    if match:
+        prefix, source_digest = match.group("prefix"), match.group("digest")
+    else:
+        prefix, source_digest = os.path.splitext(name)[0], file_digest(pdf_path)
+    digest = content_key("enhance", source_digest, json.dumps(options or {}, sort_keys=True))[:DIGEST_CHARS]
+    return shard_path(f"{prefix}-{digest}_enhanced.pdf")
+
+
+def is_content_addressed(filename: str) -> bool:
+    """True for raw/enhanced output names; such a file never changes once written."""
+    name = os.path.basename(filename)
+    return bool(CONTENT_ADDRESSED_RE.match(name) or ENHANCED_RE.match(name))
+
+
+@lru_cache(maxsize=4096)
+def _etag_for(path: str, size: int, mtime_ns: int) -> str:
+    return '"%s"' % file_digest(path)[:DIGEST_CHARS]
+
+
+def file_etag(path: str) -> str:
+    """
+    Strong ETag from the file's SHA-256. Hashed once per (path, size, mtime),
+    so repeat downloads only stat the file.
+    """
+    stat = os.stat(path)
+    return _etag_for(path, stat.st_size, stat.st_mtime_ns)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+@contextmanager
+def atomic_writer(path: str):
+    """
+    Yields a binary file that becomes `path` only once fully written
+    (unique temp file in the same directory + os.replace). Readers never see
+    a partial PDF, and concurrent writers of the same path cannot interleave.
+    The file is also readable, so a writer can parse what it has written so far.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            yield f
+        # mkstemp creates 0600 files; published PDFs get regular permissions
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# ==========================================
+# 📦 Indexed, size-bounded PDF storage
+# ==========================================
+
+
+class PdfStorage:
+    """
+    Name -> file index over the sharded output directory, with byte
+    accounting and eviction:
+
+    - `add` registers a finished file; registering an enhanced PDF with its
+      `source` deletes the intermediate raw PDF right away;
+    - `resolve` serves /download lookups from the index (no directory scan)
+      and marks the file as recently used; on a miss it checks the file's
+      shard, since other worker processes write to the same directory;
+    - a background task drops files unused for `max_age_seconds`, then the
+      least recently used ones once the total exceeds `max_bytes` (down to
+      90% of it, so eviction does not run on every new file).
+
+    The index lives in memory (per process) and is rebuilt from disk at startup (`rebuild`),
+    which also moves files from the old flat layout into their shards.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(
+        self,
+        root: str = PDF_OUTPUT_DIR,
+        max_bytes: int = PDF_STORE_MAX_BYTES,
+        max_age_seconds: float = PDF_STORE_MAX_AGE_SECONDS,
+        evict_interval: float = PDF_STORE_EVICT_INTERVAL_SECONDS,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval = evict_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}  # name -> {path, size, used_at}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _publish(self):
+        PDF_STORE_BYTES.set(self._total)
+        PDF_STORE_FILES.set(len(self._entries))
+
+    def _put(self, path: str, used_at: Optional[float] = None):
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous:
+                self._total -= previous["size"]
+            self._entries[name] = {"path": path, "size": stat.st_size, "used_at": used_at or time.time()}
+            self._total += stat.st_size
+        self._publish()
+
+    def add(self, path: str, source: Optional[str] = None):
+        """Indexes a finished file. `source` (the raw input of an enhanced PDF) is removed."""
+        if not path or not os.path.exists(path):
+            return
+        self._put(path)
+        if source and os.path.abspath(source) != os.path.abspath(path):
+            if self.remove(os.path.basename(source), path=source):
+                PDF_STORE_EVICTIONS.inc(reason="superseded")
+        if self.max_bytes and self._total > self.max_bytes:
+            self._request_eviction()
+
+    def track(self, path: str):
+        """Indexes `path` if it is not known yet (e.g. restored by the result cache), else touches it."""
+        if path and self.resolve(os.path.basename(path)) is None:
+            self.add(path)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Path of a stored file, or None. Counts as a use for LRU eviction.
+        Files missing from the index but present in their shard (written by
+        another worker process, or a script) are indexed on first lookup.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry["used_at"] = time.time()
+                path = entry["path"]
+        if entry is None:
+            return self._discover(name)
+        if not os.path.exists(path):
+            # Deleted behind our back; forget it
+            self.remove(name)
+            return None
+        return path
+
+    def _discover(self, name: str) -> Optional[str]:
+        if name != os.path.basename(name) or not name.endswith(".pdf"):
+            return None
+        path = shard_path(name, self.root)
+        try:
+            self._put(path)
+        except FileNotFoundError:
+            return None
+        if self.max_bytes and self._total > self.max_bytes:
+            self._request_eviction()
+        return path
+
+    def remove(self, name: str, path: Optional[str] = None) -> bool:
+        """Deletes a file and its index entry. Returns True if a file was removed."""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry:
+                self._total -= entry["size"]
+        self._publish()
+        target = path or (entry and entry["path"])
+        if not target:
+            return False
+        try:
+            os.remove(target)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def rebuild(self) -> int:
+        """Re-indexes the shards (and migrates flat files into them). Returns the file count."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(directory, name)
+                target = shard_path(name, self.root)
+                try:
+                    if path != target:
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(path, target)
+                    stat = os.stat(target)
+                except OSError as e:
+                    print(f"⚠️ Skipping {path} while indexing PDF storage: {e}")
+                    continue
+                entries[name] = {"path": target, "size": stat.st_size, "used_at": stat.st_mtime}
+        with self._lock:
+            self._entries = entries
+            self._total = sum(entry["size"] for entry in entries.values())
+        self._publish()
+        print(f"📦 PDF storage: {len(entries)} file(s), {self._total / 1024 / 1024:.1f} MiB indexed")
+        return len(entries)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Drops expired files, then LRU files until below the quota's low-water mark."""
+        now = now or time.time()
+        with self._lock:
+            by_use = sorted(self._entries.items(), key=lambda item: item[1]["used_at"])
+        victims: List[tuple] = []
+        total = self._total
+        for name, entry in by_use:
+            if self.max_age_seconds and now - entry["used_at"] > self.max_age_seconds:
+                victims.append((name, "age"))
+                total -= entry["size"]
+        if self.max_bytes and total > self.max_bytes:
+            target = self.max_bytes * self.LOW_WATER
+            expired = {name for name, _ in victims}
+            for name, entry in by_use:
+                if total <= target:
+                    break
+                if name not in expired:
+                    victims.append((name, "quota"))
+                    total -= entry["size"]
+
+        for name, reason in victims:
+            self.remove(name)
+            PDF_STORE_EVICTIONS.inc(reason=reason)
+        if victims:
+            print(f"🧹 Evicted {len(victims)} PDF(s); storage now {self._total / 1024 / 1024:.1f} MiB")
+        return len(victims)
+
+    # ------------------------------------------
+    # Background eviction
+    # ------------------------------------------
+
+    def _request_eviction(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _evict_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.evict_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception as e:
+                print(f"⚠️ PDF eviction failed (Non-blocking): {e}")
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._evict_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+
+
+# Singleton instance
+pdf_storage = PdfStorage()
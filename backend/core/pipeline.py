@@ -1,52 +1,141 @@
+import os
 import json
-from enum import Enum
-from typing import Dict, Any
+import asyncio
+import datetime
+from typing import Dict, Any, Tuple, Optional, Callable, Awaitable, AsyncIterator, List, Union
 
-from services.llm import llm_service
-from services.foxit import foxit_client
+from services.llm import llm_service, track_fallbacks
+from services.foxit import foxit_client, PdfStream
 from services.sanity import sanity_client
+from core.cache import ResultCache, content_key
+from core.json_stream import JSONSectionStream
+from core.stages import StageGraph
+from core.metrics import track_stage, CACHE_LOOKUPS
+from core.pdf_store import pdf_storage
+from core.prompts import PROMPT_VERSION
+from core.doc_types import DocumentType, parse_doc_type
+from core.config import (
+    LLM_MODEL,
+    LLM_SINGLE_PASS,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MEMORY_ENTRIES,
+)
 
 # ==========================================
 # 🧠 DocuMind Core Pipeline
 # ==========================================
 
-class DocumentType(Enum):
-    MEETING_NOTES = "meeting_notes"
-    PRD = "product_requirements"
-    CODE_DOCS = "code_documentation"
-    UNKNOWN = "general"
+# Content-addressed cache of finished pipeline runs
+result_cache = ResultCache(
+    directory=RESULT_CACHE_DIR,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    memory_entries=RESULT_CACHE_MEMORY_ENTRIES,
+) if RESULT_CACHE_ENABLED else None
 
-def process_document_pipeline(raw_input: str, source_type: str = "text") -> Dict[str, Any]:
+
+# Stages reported to `on_stage` callbacks (e.g. the job queue)
+PIPELINE_STAGES = ("classify", "structure", "render", "enhance", "store")
+
+StageCallback = Callable[[str, str], Awaitable[None]]
+
+
+async def _emit_stage(on_stage: Optional[StageCallback], stage: str, status: str):
+    """Reports a stage transition (running / done / skipped / failed)."""
+    if on_stage:
+        await on_stage(stage, status)
+
+
+def pipeline_cache_key(clean_text: str, source_type: str) -> str:
+    """Cache key: cleaned text + source type + prompt/model version."""
+    return content_key(PROMPT_VERSION, LLM_MODEL, source_type, clean_text)
+
+
+def _resolve_doc_type(doc_type_str: str) -> DocumentType:
+    return parse_doc_type(doc_type_str) or DocumentType.UNKNOWN
+
+
+def _classify_and_structure(clean_text: str) -> Tuple[DocumentType, Dict[str, Any]]:
     """
-    Core pipeline to transform raw input into structured data + PDF.
+    Local fast-path classification when confident, else one LLM round trip
+    when the single-pass answer is unambiguous, otherwise the classic
+    classify -> structure pair.
     """
-    
-    print(f"🚀 Starting pipeline for source: {source_type}")
+    # Obvious cases are classified locally; only the structuring call hits the LLM
+    local_label = llm_service.classify_locally(clean_text)
+    if local_label:
+        doc_type = _resolve_doc_type(local_label)
+        print("🧠 Structuring content with AI...")
+        return doc_type, llm_service.structure_text(clean_text, doc_type.value)
+
+    # Long inputs are chunked; classification only needs the beginning
+    if LLM_SINGLE_PASS and not llm_service.needs_chunking(clean_text):
+        print("🧠 Classifying + structuring in a single pass...")
+        single = llm_service.classify_and_structure(clean_text)
+        if single:
+            return single["doc_type"], single["structured_data"]
+        print("↩️ Single-pass answer ambiguous. Falling back to two-call path.")
 
-    # 1. Ingest & Preprocess
-    clean_text = raw_input.strip()
-    
     # 2. Detect Document Type
     print("🔍 Classifying document...")
-    doc_type_str = llm_service.classify_text(clean_text)
-    try:
-        doc_type = DocumentType(doc_type_str)
-    except ValueError:
-        doc_type = DocumentType.UNKNOWN
-    
+    doc_type = _resolve_doc_type(llm_service.classify_text(clean_text, use_local=False))
+
     print(f"📋 Detected Document Type: {doc_type.value}")
 
     # 3. Structure Content
     print("🧠 Structuring content with AI...")
-    structured_data = llm_service.structure_text(clean_text, doc_type.value)
-    
-    # 4. Generate PDF
-    print(f"📄 Generating PDF via Foxit API...")
-    
-    # 4a. Prepare Context for Template
-    import datetime
+    return doc_type, llm_service.structure_text(clean_text, doc_type.value)
+
+
+async def _classify_and_structure_async(clean_text: str, on_stage: Optional[StageCallback] = None) -> Tuple[DocumentType, Dict[str, Any]]:
+    """Async variant of _classify_and_structure."""
+    await _emit_stage(on_stage, "classify", "running")
+
+    # Obvious cases are classified locally; only the structuring call hits the LLM
+    local_label = llm_service.classify_locally(clean_text)
+    if local_label:
+        doc_type = _resolve_doc_type(local_label)
+        await _emit_stage(on_stage, "classify", "done")
+        await _emit_stage(on_stage, "structure", "running")
+        print("🧠 Structuring content with AI...")
+        structured_data = await llm_service.structure_text_async(clean_text, doc_type.value)
+        await _emit_stage(on_stage, "structure", "done")
+        return doc_type, structured_data
+
+    # Long inputs are chunked; classification only needs the beginning
+    if LLM_SINGLE_PASS and not llm_service.needs_chunking(clean_text):
+        print("🧠 Classifying + structuring in a single pass...")
+        # Reported as classification until the answer is known to be usable
+        single = await llm_service.classify_and_structure_async(clean_text)
+        if single:
+            await _emit_stage(on_stage, "classify", "done")
+            await _emit_stage(on_stage, "structure", "running")
+            await _emit_stage(on_stage, "structure", "done")
+            return single["doc_type"], single["structured_data"]
+        print("↩️ Single-pass answer ambiguous. Falling back to two-call path.")
+
+    # 2. Detect Document Type
+    print("🔍 Classifying document...")
+    doc_type = _resolve_doc_type(await llm_service.classify_text_async(clean_text, use_local=False))
+    await _emit_stage(on_stage, "classify", "done")
+
+    print(f"📋 Detected Document Type: {doc_type.value}")
+
+    # 3. Structure Content
+    print("🧠 Structuring content with AI...")
+    await _emit_stage(on_stage, "structure", "running")
+    structured_data = await llm_service.structure_text_async(clean_text, doc_type.value)
+    await _emit_stage(on_stage, "structure", "done")
+    return doc_type, structured_data
+
+
+def _build_pdf_context(structured_data: Dict[str, Any], doc_type: DocumentType) -> Dict[str, Any]:
+    """Prepares the template context for the PDF render."""
     current_date = datetime.datetime.now().strftime("%b %d, %Y")
-    
+
     # Check if 'content' key exists (Real LLM structure) or it's flat (Mock structure)
     if "content" in structured_data:
         content_body = structured_data["content"]
@@ -54,39 +143,433 @@ def process_document_pipeline(raw_input: str, source_type: str = "text") -> Dict
         # Filter out metadata keys from flat structure to get content
         content_body = {k: v for k, v in structured_data.items() if k not in ["title", "doc_type", "date"]}
 
-    pdf_context = {
+    return {
         "title": structured_data.get("title", "Untitled Document"),
         "doc_type": doc_type.value,
         "date": structured_data.get("date", current_date),
         "structured_data": content_body
     }
 
-    raw_pdf_path = foxit_client.generate_pdf_from_html(pdf_context, doc_type.value)
-    
+
+def _build_result(
+    doc_type: DocumentType,
+    structured_data: Dict[str, Any],
+    pdf_path: str,
+    timings: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    return {
+        "doc_type": doc_type.value,
+        "title": structured_data.get("title", "Untitled Document"),
+        "structured_data": structured_data,
+        "pdf_path": pdf_path,
+        "cached": False,
+        "timings": timings,
+    }
+
+
+def _cache_get(cache_key: str) -> Optional[Dict[str, Any]]:
+    cached = result_cache.get(cache_key)
+    CACHE_LOOKUPS.inc(result="hit" if cached else "miss")
+    if cached:
+        # The PDF may have been restored from the cache's copy after eviction
+        pdf_storage.track(cached["pdf_path"])
+    return cached
+
+
+def _cacheable(fallbacks: List[str]) -> bool:
+    """Results built on mock LLM output are not cached, so a retry can recover."""
+    if fallbacks:
+        print(f"⚠️ Not caching result: LLM fell back to mock output ({', '.join(sorted(set(fallbacks)))})")
+    return not fallbacks
+
+
+def _retire_raw_pdf(raw_pdf_path: str, final_pdf_path: str):
+    """The raw render is only an intermediate once the enhanced PDF exists."""
+    if final_pdf_path and final_pdf_path != raw_pdf_path:
+        pdf_storage.add(final_pdf_path, source=raw_pdf_path)
+
+
+def _cached_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    print(f"⚡ Cache hit: {result['pdf_path']}")
+    return {**result, "cached": True, "timings": None}
+
+
+def process_document_pipeline(raw_input: str, source_type: str = "text") -> Dict[str, Any]:
+    """
+    Core pipeline to transform raw input into structured data + PDF.
+    """
+
+    print(f"🚀 Starting pipeline for source: {source_type}")
+
+    # 1. Ingest & Preprocess
+    clean_text = raw_input.strip()
+    cache_key = pipeline_cache_key(clean_text, source_type)
+
+    if result_cache:
+        cached = _cache_get(cache_key)
+        if cached:
+            return _cached_result(cached)
+
+    # 2-3. Detect Document Type & Structure Content
+    fallbacks = track_fallbacks()
+    with track_stage("llm"):
+        doc_type, structured_data = _classify_and_structure(clean_text)
+
+    # 4. Generate PDF
+    print(f"📄 Generating PDF...")
+    pdf_context = _build_pdf_context(structured_data, doc_type)
+    with track_stage("render"):
+        raw_pdf_path = foxit_client.generate_pdf_from_html(pdf_context, doc_type.value)
+
     # 5. Enhance PDF (Foxit Integration)
     try:
-        final_pdf_path = foxit_client.enhance_pdf(raw_pdf_path)
+        with track_stage("enhance"):
+            final_pdf_path = foxit_client.enhance_pdf(raw_pdf_path)
     except Exception:
         final_pdf_path = raw_pdf_path
-    
+    _retire_raw_pdf(raw_pdf_path, final_pdf_path)
+
     print(f"✅ Document ready at: {final_pdf_path}")
-    
+
     # 6. Save to Sanity CMS
     try:
         print(f"💾 Saving to Sanity CMS...")
-        sanity_client.create_document(
-            doc_type=doc_type.value,
-            title=structured_data.get("title", "Untitled Document"),
-            structured_data=structured_data,
-            pdf_path=final_pdf_path
-        )
+        with track_stage("store"):
+            sanity_client.create_document(
+                doc_type=doc_type.value,
+                title=structured_data.get("title", "Untitled Document"),
+                structured_data=structured_data,
+                pdf_path=final_pdf_path
+            )
     except Exception as e:
         print(f"⚠️ Sanity Save Failed (Non-blocking): {e}")
 
+    result = _build_result(doc_type, structured_data, final_pdf_path)
+    if result_cache and _cacheable(fallbacks):
+        result_cache.set(cache_key, result)
+    return result
+
+
+def _document_graph(
+    structure: Callable[[], Awaitable[Tuple[DocumentType, Dict[str, Any]]]],
+    on_stage: Optional[StageCallback] = None,
+) -> StageGraph:
+    """
+    The async pipeline as a stage graph. Foxit auth, template loading and the
+    Sanity connection warmup have no dependency on the LLM output, so they run
+    while the LLM call (`structure`) is in flight:
+
+        llm ─────────────┐
+        foxit_auth ──────┼─> render ─> enhance ─┐
+        templates ───────┘                      ├─> store
+        sanity_warmup ──────────────────────────┘
+    """
+
+    async def render(inputs):
+        doc_type, structured_data = inputs["llm"]
+        print(f"📄 Generating PDF...")
+        await _emit_stage(on_stage, "render", "running")
+        pdf_context = _build_pdf_context(structured_data, doc_type)
+        raw_pdf_path = await foxit_client.generate_pdf_from_html_async(pdf_context, doc_type.value)
+        await _emit_stage(on_stage, "render", "done" if raw_pdf_path else "failed")
+        return raw_pdf_path
+
+    async def enhance(inputs):
+        raw_pdf_path = inputs["render"]
+        await _emit_stage(on_stage, "enhance", "running")
+        try:
+            final_pdf_path = await foxit_client.enhance_pdf_async(raw_pdf_path)
+            await _emit_stage(on_stage, "enhance", "done")
+        except Exception:
+            final_pdf_path = raw_pdf_path
+            await _emit_stage(on_stage, "enhance", "failed")
+        _retire_raw_pdf(raw_pdf_path, final_pdf_path)
+        print(f"✅ Document ready at: {final_pdf_path}")
+        return final_pdf_path
+
+    async def store(inputs):
+        doc_type, structured_data = inputs["llm"]
+        await _emit_stage(on_stage, "store", "running")
+        try:
+            print(f"💾 Saving to Sanity CMS...")
+            await sanity_client.create_document_async(
+                doc_type=doc_type.value,
+                title=structured_data.get("title", "Untitled Document"),
+                structured_data=structured_data,
+                pdf_path=inputs["enhance"]
+            )
+            await _emit_stage(on_stage, "store", "done")
+        except Exception as e:
+            print(f"⚠️ Sanity Save Failed (Non-blocking): {e}")
+            await _emit_stage(on_stage, "store", "failed")
+
+    async def llm(_):
+        return await structure()
+
+    async def foxit_auth(_):
+        return await foxit_client.ensure_token_async()
+
+    async def templates(_):
+        return await asyncio.to_thread(foxit_client.load_templates)
+
+    async def sanity_warmup(_):
+        return await sanity_client.warm_async()
+
+    return (
+        StageGraph()
+        .add("llm", llm)
+        .add("foxit_auth", foxit_auth, optional=True)
+        .add("templates", templates, optional=True)
+        .add("sanity_warmup", sanity_warmup, optional=True)
+        .add("render", render, deps=("llm", "foxit_auth", "templates"))
+        .add("enhance", enhance, deps=("render",))
+        .add("store", store, deps=("llm", "enhance", "sanity_warmup"))
+    )
+
+
+async def _run_document_graph(
+    structure: Callable[[], Awaitable[Tuple[DocumentType, Dict[str, Any]]]],
+    on_stage: Optional[StageCallback] = None,
+) -> Dict[str, Any]:
+    """Runs the stage graph and returns the pipeline result with its timing report."""
+    run = await _document_graph(structure, on_stage).run()
+    doc_type, structured_data = run.results["llm"]
+    timings = run.report()
+    print(f"⏱ Critical path: {' -> '.join(timings['critical_path'])} ({timings['total_ms']} ms)")
+    return _build_result(doc_type, structured_data, run.results["enhance"], timings)
+
+
+async def process_document_pipeline_async(
+    raw_input: str,
+    source_type: str = "text",
+    on_stage: Optional[StageCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Async variant of process_document_pipeline. All network calls go through
+    the async clients, so the event loop stays free while a document is in flight.
+    `on_stage(stage, status)` is awaited on every stage transition.
+    """
+
+    print(f"🚀 Starting pipeline for source: {source_type}")
+
+    # 1. Ingest & Preprocess
+    clean_text = raw_input.strip()
+    cache_key = pipeline_cache_key(clean_text, source_type)
+
+    if result_cache:
+        cached = await asyncio.to_thread(_cache_get, cache_key)
+        if cached:
+            for stage in PIPELINE_STAGES:
+                await _emit_stage(on_stage, stage, "skipped")
+            return _cached_result(cached)
+
+    # 2-6. Classify & Structure, Generate PDF, Enhance, Save to Sanity CMS
+    # (independent warmups overlap with the LLM call; see _document_graph)
+    fallbacks = track_fallbacks()
+    result = await _run_document_graph(lambda: _classify_and_structure_async(clean_text, on_stage), on_stage)
+    if result_cache and _cacheable(fallbacks):
+        await asyncio.to_thread(result_cache.set, cache_key, result)
+    return result
+
+
+async def process_batch_async(
+    items: List[Tuple[str, str]],
+    concurrency: int,
+) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+    """
+    Runs (text, source_type) items through the async pipeline with at most
+    `concurrency` in flight, yielding (index, result or exception) in
+    completion order. Pending items are cancelled if the consumer stops early.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, text: str, source_type: str):
+        async with semaphore:
+            try:
+                return index, await process_document_pipeline_async(text, source_type)
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.create_task(run(i, text, source_type)) for i, (text, source_type) in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_document_pipeline_async(
+    raw_input: str,
+    source_type: str = "text",
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of the async pipeline. Yields (event, payload) pairs:
+    "meta" / "section" for each top-level member of the structured output as
+    soon as the model has finished generating it, then "document" with the
+    PDF once it has been rendered.
+    """
+
+    print(f"🚀 Starting streaming pipeline for source: {source_type}")
+
+    clean_text = raw_input.strip()
+    cache_key = pipeline_cache_key(clean_text, source_type)
+
+    if result_cache:
+        cached = await asyncio.to_thread(_cache_get, cache_key)
+        if cached:
+            cached = _cached_result(cached)
+            for event, payload in _section_events(cached["structured_data"]):
+                yield event, payload
+            yield "document", _document_event(cached)
+            return
+
+    fallbacks = track_fallbacks()
+
+    # Confident local label -> typed prompt; otherwise the model picks doc_type itself
+    local_label = llm_service.classify_locally(clean_text)
+    doc_type = _resolve_doc_type(local_label) if local_label else None
+
+    # The graph starts now so auth / templates / Sanity warm up while we stream;
+    # its LLM stage completes when the streamed structure is ready.
+    structure_ready = asyncio.get_running_loop().create_future()
+
+    async def structure():
+        return await structure_ready
+
+    graph_task = asyncio.create_task(_run_document_graph(structure))
+    try:
+        if llm_service.needs_chunking(clean_text):
+            # Map-reduce output only exists once merged; sections follow in one burst
+            if doc_type is None:
+                doc_type = _resolve_doc_type(await llm_service.classify_text_async(clean_text, use_local=False))
+            structured_data = await llm_service.structure_text_async(clean_text, doc_type.value)
+            for event, payload in _section_events(structured_data):
+                yield event, payload
+        else:
+            parser = JSONSectionStream()
+            completed: Dict[str, Any] = {}
+            async for delta in llm_service.stream_structure_text_async(clean_text, doc_type.value if doc_type else None):
+                for path, value in parser.feed(delta):
+                    if len(path) == 1:
+                        completed[path[0]] = value
+                    else:
+                        completed.setdefault("content", {})[path[1]] = value
+                    yield _section_event(path, value)
+            structured_data = parser.result()
+            if structured_data is None and completed:
+                # The client already has these sections; the document must match them
+                print("⚠️ Streamed output was cut off. Building the document from the sections that completed.")
+                structured_data = {"content": {}, **completed}
+
+        if structured_data is None:
+            print("⚠️ Streamed output was not valid JSON. Falling back to mock structured data.")
+            structured_data = llm_service.mock_structured_data(doc_type.value if doc_type else DocumentType.UNKNOWN.value)
+            for event, payload in _section_events(structured_data):
+                yield event, payload
+
+        if doc_type is None:
+            doc_type = _resolve_doc_type(structured_data.get("doc_type"))
+
+        structure_ready.set_result((doc_type, structured_data))
+        result = await graph_task
+    finally:
+        graph_task.cancel()
+
+    if result_cache and _cacheable(fallbacks):
+        await asyncio.to_thread(result_cache.set, cache_key, result)
+    yield "document", _document_event(result)
+
+
+async def open_document_pdf_stream_async(
+    raw_input: str,
+    source_type: str = "text",
+) -> Tuple[Dict[str, Any], PdfStream, Callable[[], Awaitable[None]]]:
+    """
+    Variant of the async pipeline that hands back the PDF as a stream
+    instead of a path: (result, pdf stream, finish). The stream tees the
+    renderer's output to the client and to storage (see
+    FoxitClient.stream_pdf_async). `finish()` saves to Sanity and caches the
+    result once the stream has completed; it is a no-op otherwise.
+    """
+
+    print(f"🚀 Starting PDF streaming pipeline for source: {source_type}")
+
+    clean_text = raw_input.strip()
+    cache_key = pipeline_cache_key(clean_text, source_type)
+
+    async def nothing_to_finish():
+        return None
+
+    if result_cache:
+        cached = await asyncio.to_thread(_cache_get, cache_key)
+        if cached:
+            pdf_path = pdf_storage.resolve(os.path.basename(cached["pdf_path"] or ""))
+            if pdf_path:
+                return _cached_result(cached), PdfStream(pdf_path), nothing_to_finish
+
+    fallbacks = track_fallbacks()
+
+    # Auth and templates warm up while the LLM call is in flight
+    warmups = asyncio.gather(
+        foxit_client.ensure_token_async(),
+        asyncio.to_thread(foxit_client.load_templates),
+        return_exceptions=True,
+    )
+    try:
+        doc_type, structured_data = await _classify_and_structure_async(clean_text)
+    finally:
+        await warmups
+
+    print(f"📄 Streaming PDF...")
+    stream = await foxit_client.stream_pdf_async(_build_pdf_context(structured_data, doc_type), doc_type.value)
+    if stream is None:
+        raise RuntimeError("PDF generation failed")
+    result = _build_result(doc_type, structured_data, stream.path)
+
+    async def finish():
+        if not stream.complete:
+            return
+        print(f"✅ Document streamed and stored at: {stream.path}")
+        try:
+            print(f"💾 Saving to Sanity CMS...")
+            await sanity_client.create_document_async(
+                doc_type=doc_type.value,
+                title=result["title"],
+                structured_data=structured_data,
+                pdf_path=stream.path
+            )
+        except Exception as e:
+            print(f"⚠️ Sanity Save Failed (Non-blocking): {e}")
+        if result_cache and _cacheable(fallbacks):
+            await asyncio.to_thread(result_cache.set, cache_key, result)
+
+    return result, stream, finish
+
+
+def _section_event(path: Tuple[str, ...], value: Any) -> Tuple[str, Dict[str, Any]]:
+    key = path[-1]
+    if len(path) == 1 and key in ("doc_type", "title", "date"):
+        return "meta", {"key": key, "value": value}
+    return "section", {"key": key, "value": value}
+
+
+def _section_events(structured_data: Dict[str, Any]):
+    """Events for an already complete structure (cache hits / fallbacks)."""
+    for key, value in structured_data.items():
+        if key == "content" and isinstance(value, dict):
+            for section, section_value in value.items():
+                yield _section_event(("content", section), section_value)
+        else:
+            yield _section_event((key,), value)
+
+
+def _document_event(result: Dict[str, Any]) -> Dict[str, Any]:
+    pdf_path = result["pdf_path"]
     return {
-        "doc_type": doc_type.value,
-        "title": structured_data.get("title", "Untitled Document"),
-        "structured_data": structured_data,
-        "pdf_path": final_pdf_path,
+        "doc_type": result["doc_type"],
+        "title": result["title"],
+        "pdf_path": pdf_path,
+        "download_url": f"/download/{os.path.basename(pdf_path)}" if pdf_path else None,
+        "cached": result["cached"],
     }
-
@@ -1,5 +1,9 @@
 # prompts.py
 
+# Bump whenever a prompt below changes: it is part of the result cache key,
+# so cached documents produced by an older prompt are not served.
+PROMPT_VERSION = "2"
+
 SYSTEM_PROMPT = """
 You are DocuMind, an expert technical writer and document structurer.
 Your goal is to analyze the user's raw input and transform it into a structured JSON object.
@@ -25,6 +29,32 @@ SPECIFIC FIELDS BY TYPE:
 - Code Docs: module_name, description, classes (list), functions (list with params/returns), usage_example.
 """
 
+# User message for the single-pass mode: the model picks doc_type itself
+# instead of receiving it from a separate classification call.
+SINGLE_PASS_INSTRUCTION = """DOCUMENT TYPE: not provided. Decide it yourself and set "doc_type" to exactly one of:
+"meeting_notes", "prd", "code_docs", or "general" if none of them fits.
+Then fill "content" with the fields for that type.
+
+INPUT TEXT:
+{raw_text}"""
+
+# User message for one chunk of a long input (map step of chunked structuring)
+CHUNK_INSTRUCTION = """DOCUMENT TYPE: {doc_type}
+
+This is part {index} of {total} of a longer input. Extract only what appears in this part;
+other parts are processed separately and merged afterwards.
+
+INPUT TEXT:
+{raw_text}"""
+
+# Final pass of chunked structuring: one summary from the per-chunk summaries
+SUMMARY_PROMPT = """
+You are DocuMind, an expert technical writer.
+You receive partial summaries of consecutive parts of one {doc_type} document.
+Write a single concise, professional summary of the whole document (3-5 sentences).
+Output ONLY the summary text. No markdown, no commentary.
+"""
+
 def get_structuring_prompt(raw_text):
     """
     Combines system prompt with user input.
@@ -0,0 +1,105 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.metrics import track_stage
+
+# ==========================================
+# 🕸 Stage graph executor
+# ==========================================
+
+# A stage receives the results of its dependencies, keyed by stage name
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class StageGraph:
+    """
+    A small DAG of async stages. Every stage starts as soon as all of its
+    dependencies have finished, so independent work (auth, template loading,
+    connection warmup) overlaps with the LLM calls. Optional stages are
+    best-effort: a failure yields None instead of failing the run.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[StageFunc, Tuple[str, ...], bool]] = {}
+
+    def add(self, name: str, func: StageFunc, deps: Tuple[str, ...] = (), optional: bool = False) -> "StageGraph":
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (func, tuple(deps), optional)
+        return self
+
+    async def run(self) -> "StageRun":
+        origin = time.perf_counter()
+        timings: Dict[str, Tuple[float, float]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            func, deps, optional = self._stages[name]
+            inputs = {dep: await tasks[dep] for dep in deps}
+            start = time.perf_counter()
+            try:
+                with track_stage(name):
+                    return await func(inputs)
+            except Exception as e:
+                if not optional:
+                    raise
+                print(f"⚠️ Optional stage '{name}' failed (Non-blocking): {e}")
+                return None
+            finally:
+                timings[name] = (start - origin, time.perf_counter() - origin)
+
+        # Insertion order is a topological order (deps must be added first)
+        for name in self._stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        results = {name: task.result() for name, task in tasks.items()}
+        return StageRun(results, timings, {name: deps for name, (_, deps, _) in self._stages.items()})
+
+
+class StageRun:
+    """Results and timing of one StageGraph run."""
+
+    def __init__(self, results: Dict[str, Any], timings: Dict[str, Tuple[float, float]], deps: Dict[str, Tuple[str, ...]]):
+        self.results = results
+        self.timings = timings
+        self.deps = deps
+
+    def critical_path(self) -> List[str]:
+        """
+        The chain of stages that determined total latency: start from the
+        stage that finished last and repeatedly step to the dependency that
+        finished last (the one it was actually waiting for).
+        """
+        if not self.timings:
+            return []
+        name: Optional[str] = max(self.timings, key=lambda n: self.timings[n][1])
+        path = []
+        while name:
+            path.append(name)
+            deps = self.deps.get(name, ())
+            name = max(deps, key=lambda n: self.timings[n][1]) if deps else None
+        return list(reversed(path))
+
+    def report(self) -> Dict[str, Any]:
+        """JSON-friendly per-run timing report (milliseconds)."""
+        return {
+            "total_ms": round(max((end for _, end in self.timings.values()), default=0.0) * 1000, 2),
+            "critical_path": self.critical_path(),
+            "stages": {
+                name: {
+                    "start_ms": round(start * 1000, 2),
+                    "duration_ms": round((end - start) * 1000, 2),
+                }
+                for name, (start, end) in self.timings.items()
+            },
+        }
@@ -0,0 +1,136 @@
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# ==========================================
+# 📤 Streaming multipart uploads
+# ==========================================
+# Starlette's UploadFile spools the whole body (memory, then a temp file)
+# before the endpoint runs. `MultipartFileStream` instead parses the request
+# body as it arrives and hands out one file field's bytes chunk by chunk, so
+# a large recording can be relayed onwards while it is still being uploaded
+# and only a few network chunks are ever held in memory.
+
+
+class UploadError(Exception):
+    """The request body is not a usable multipart upload."""
+
+
+class UploadTooLargeError(UploadError):
+    """The upload exceeds the configured maximum size."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit.")
+        self.max_bytes = max_bytes
+
+
+class MultipartFileStream:
+    """
+    One file field of a multipart/form-data body, read incrementally from
+    `body` (e.g. `request.stream()`).
+
+        upload = MultipartFileStream(request.stream(), request.headers["content-type"], "file", max_bytes)
+        await upload.open()          # parses up to the field's first bytes
+        async for chunk in upload:   # the rest, as it arrives
+            ...
+
+    More than `max_bytes` of file data raises UploadTooLargeError while
+    streaming; other fields are skipped without being buffered.
+    """
+
+    def __init__(self, body: AsyncIterator[bytes], content_type: str, field: str, max_bytes: int):
+        kind, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if kind != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data body.")
+
+        self.field = field
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self._body = body.__aiter__()
+        self._pending: Deque[bytes] = deque()
+        self._state = "searching"  # -> streaming (inside the field) -> done
+        self._in_field = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_field = self._state == "searching" and disposition.get(b"name") == self.field.encode()
+        if self._in_field:
+            self.filename = disposition.get(b"filename", b"").decode("utf-8", "replace") or None
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+            self._state = "streaming"
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_field:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(self.max_bytes)
+        self._pending.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_field:
+            self._in_field = False
+            self._state = "done"
+
+    async def _feed(self) -> bool:
+        """Parses the next body chunk. False once the body is exhausted."""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed multipart body: {e}") from e
+        return True
+
+    async def open(self) -> "MultipartFileStream":
+        """
+        Reads until the field's headers and first bytes (or its end) are in.
+        Raises UploadError if the body has no such field.
+        """
+        while self._state == "searching" or (self._state == "streaming" and not self._pending):
+            if not await self._feed():
+                break
+        if self._state == "searching":
+            raise UploadError(f"No '{self.field}' file in the upload.")
+        return self
+
+    async def __aiter__(self):
+        while True:
+            while self._pending:
+                yield self._pending.popleft()
+            if self._state == "done":
+                return
+            if not await self._feed():
+                raise UploadError("Upload ended before the file was complete.")
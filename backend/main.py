@@ -4,10 +4,15 @@ AI-powered document automation: ingest text/voice → structure → PDF.
 """
 
 import os
+import json
+import asyncio
+import time
 import tempfile
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse, Response
+from starlette.background import BackgroundTask
 
 from models import (
     TextProcessRequest,
@@ -16,17 +21,52 @@ from models import (
     HealthResponse,
     ErrorResponse,
     IntegrationStatusResponse,
+    JobResponse,
+    BatchProcessRequest,
+    BatchItemResult,
 )
-from core.pipeline import process_document_pipeline
-from services.deepgram import deepgram_client
+from core.pipeline import process_document_pipeline_async, stream_document_pipeline_async, process_batch_async, open_document_pdf_stream_async
+from core.jobs import job_queue, QueueFullError
+from core.metrics import registry, HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT
+from core.pdf_store import file_etag, etag_matches, is_content_addressed, pdf_storage
+from core.uploads import MultipartFileStream, UploadError, UploadTooLargeError
+from services.deepgram import deepgram_client, WORD_FORMATS
+from services.foxit import foxit_client
 from services.sanity import sanity_client
-from core.config import OPENAI_API_KEY, DEEPGRAM_API_KEY, FOXIT_CLIENT_ID, SANITY_TOKEN
+from services.llm import llm_service
+from services.http import http_pool
+from core.config import (
+    OPENAI_API_KEY,
+    DEEPGRAM_API_KEY,
+    FOXIT_CLIENT_ID,
+    SANITY_TOKEN,
+    BATCH_MAX_ITEMS,
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    AUDIO_UPLOAD_MAX_BYTES,
+)
 
 
 # ==========================================
 # 🏗 App Setup
 # ==========================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warms templates, indexes PDF storage, opens the job store and starts its workers and retention sweep, Foxit token refresh and PDF eviction; closes the job store and releases pooled async HTTP connections on shutdown."""
+    await asyncio.to_thread(foxit_client.warm_templates)
+    await asyncio.to_thread(pdf_storage.rebuild)
+    await pdf_storage.start()
+    await foxit_client.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await pdf_storage.stop()
+    await foxit_client.aclose()
+    await sanity_client.aclose()
+    await http_pool.close()
+
+
 app = FastAPI(
     title="DocuMind API",
     description=(
@@ -37,6 +77,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS — allow all origins for hackathon flexibility
@@ -49,6 +90,30 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Request latency by route template (not raw path, to keep label sets
+    bounded). Streaming responses are measured up to the first byte.
+    """
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+        HTTP_IN_FLIGHT.dec()
+
+
 # ==========================================
 # ⚠️ Global Exception Handler
 # ==========================================
@@ -111,54 +176,263 @@ async def process_text(request: TextProcessRequest):
         raise HTTPException(status_code=400, detail="Text input cannot be empty.")
 
     try:
-        result = process_document_pipeline(request.text, request.source_type)
-        return DocumentResponse(
-            doc_type=result["doc_type"],
-            title=result["title"],
-            structured_data=result["structured_data"],
-            pdf_path=result["pdf_path"],
+        result = await process_document_pipeline_async(request.text, request.source_type)
+        return DocumentResponse(**result)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Pipeline processing failed: {str(e)}",
         )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post(
+    "/process-text/stream",
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Server-Sent Events"},
+        400: {"model": ErrorResponse, "description": "Invalid input"},
+    },
+    tags=["Documents"],
+    summary="Process raw text, streaming sections as Server-Sent Events",
+)
+async def process_text_stream(request: TextProcessRequest):
+    """
+    Same as /process-text, but streams the structured output:
+    `meta` / `section` events for each top-level section as soon as the model
+    has generated it, then a final `document` event with the PDF link.
+    Failures are reported as an `error` event.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text input cannot be empty.")
+
+    async def event_stream():
+        try:
+            async for event, payload in stream_document_pipeline_async(request.text, request.source_type):
+                yield _sse(event, payload)
+        except Exception as e:
+            print(f"❌ Streaming pipeline error: {e}")
+            yield _sse("error", {"detail": f"Pipeline processing failed: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post(
+    "/process-text/pdf",
+    responses={
+        200: {"content": {"application/pdf": {}}, "description": "The generated PDF"},
+        400: {"model": ErrorResponse, "description": "Invalid input"},
+        500: {"model": ErrorResponse, "description": "Processing failure"},
+    },
+    tags=["Documents"],
+    summary="Process raw text and stream the generated PDF back in the same response",
+)
+async def process_text_pdf(request: TextProcessRequest):
+    """
+    Same pipeline as /process-text, but the response body is the PDF itself:
+    bytes are relayed as the renderer produces them while being written to
+    storage, so no second /download round trip is needed. The stored copy is
+    named in X-Download-Url; doc type and cache status are in X-Doc-Type and
+    X-Cached. A failure after the first byte aborts the (truncated) response.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text input cannot be empty.")
+
+    try:
+        result, stream, finish = await open_document_pdf_stream_async(request.text, request.source_type)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Pipeline processing failed: {str(e)}",
         )
 
+    name = os.path.basename(stream.path)
+    headers = {
+        "Content-Disposition": f'inline; filename="{name}"',
+        "X-Download-Url": f"/download/{name}",
+        "X-Doc-Type": result["doc_type"],
+        "X-Cached": "true" if result["cached"] else "false",
+    }
+    if stream.chunks is None:
+        return FileResponse(stream.path, media_type="application/pdf", headers=headers, background=BackgroundTask(finish))
+    return StreamingResponse(
+        stream,
+        media_type="application/pdf",
+        headers={**headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(finish),
+    )
+
+
+@app.post(
+    "/process-batch",
+    responses={
+        200: {"content": {"application/x-ndjson": {}}, "description": "One BatchItemResult per line"},
+        400: {"model": ErrorResponse, "description": "Invalid batch"},
+    },
+    tags=["Documents"],
+    summary="Process many texts with bounded concurrency, streaming NDJSON results",
+)
+async def process_batch(request: BatchProcessRequest):
+    """
+    Runs every item through the pipeline with at most `concurrency` in flight,
+    sharing the pooled service connections. Each finished item is streamed as
+    one NDJSON line (a BatchItemResult), in completion order; per-item failures
+    are reported inline instead of failing the batch.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items.")
+
+    concurrency = min(request.concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    runnable = []
+    rejected = []
+    for index, item in enumerate(request.items):
+        if item.text.strip():
+            runnable.append((index, item))
+        else:
+            rejected.append(BatchItemResult(index=index, success=False, error="Text input cannot be empty."))
+
+    async def ndjson_stream():
+        for line in rejected:
+            yield line.model_dump_json() + "\n"
+        items = [(item.text, item.source_type) for _, item in runnable]
+        async for position, outcome in process_batch_async(items, concurrency):
+            index = runnable[position][0]
+            if isinstance(outcome, Exception):
+                line = BatchItemResult(index=index, success=False, error=f"Pipeline processing failed: {str(outcome)}")
+            else:
+                line = BatchItemResult(index=index, success=True, result=DocumentResponse(**outcome))
+            yield line.model_dump_json() + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+def _job_response(job: dict) -> JobResponse:
+    return JobResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        stages=job["stages"],
+        result=DocumentResponse(**job["result"]) if job["result"] else None,
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
+@app.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid input"},
+        503: {"model": ErrorResponse, "description": "Job queue is full"},
+    },
+    tags=["Jobs"],
+    summary="Enqueue a document generation job",
+)
+async def create_job(request: TextProcessRequest):
+    """
+    Enqueues the pipeline run and returns immediately with a job id.
+    Poll GET /jobs/{job_id} for per-stage progress and the final document.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text input cannot be empty.")
+
+    try:
+        job = await job_queue.submit(request.text, request.source_type)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _job_response(job)
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    responses={404: {"model": ErrorResponse, "description": "Unknown job"}},
+    tags=["Jobs"],
+    summary="Get job status and result",
+)
+async def get_job(job_id: str):
+    """Returns per-stage status and, once finished, the DocumentResponse."""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+# Room for multipart boundaries, part headers and small extra fields
+UPLOAD_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+ALLOWED_AUDIO_TYPES = {
+    "audio/mpeg", "audio/wav", "audio/mp3",
+    "audio/x-wav", "audio/ogg", "audio/webm",
+    "application/octet-stream",  # fallback for unknown types
+}
+
 
 @app.post(
     "/transcribe-audio",
     response_model=TranscribeResponse,
     responses={
         400: {"model": ErrorResponse, "description": "Invalid file"},
+        413: {"model": ErrorResponse, "description": "File too large"},
         500: {"model": ErrorResponse, "description": "Transcription failure"},
     },
     tags=["Audio"],
     summary="Transcribe an audio file to text",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+                "required": ["file"],
+            }}},
+        },
+    },
 )
-async def transcribe_audio_endpoint(file: UploadFile = File(...)):
+async def transcribe_audio_endpoint(request: Request, words: str = None):
     """
-    Accepts an audio file upload (.mp3, .wav, etc.),
+    Accepts an audio file upload (.mp3, .wav, etc.) in the `file` field,
     transcribes it via Deepgram, and returns the transcript.
+    `words` picks the word timing format in structured_data: full
+    (per-word objects, the default), columnar (compact parallel arrays,
+    about a tenth of the size) or none.
+
+    The upload is never held in memory: it is fingerprinted and spooled to
+    a temp file as it arrives, so a recording transcribed before is answered
+    from the transcript cache and long WAVs can be transcribed as parallel
+    segments (with the cache off, other formats are relayed to Deepgram
+    directly; see DeepgramClient.transcribe_upload_async). Bodies
+    announced larger than AUDIO_UPLOAD_MAX_BYTES are rejected before reading;
+    others are cut off with 413 as soon as they cross it.
     """
-    if not file:
-        raise HTTPException(status_code=400, detail="No file uploaded.")
-    
-    # Validate file type
-    allowed_types = {
-        "audio/mpeg", "audio/wav", "audio/mp3",
-        "audio/x-wav", "audio/ogg", "audio/webm",
-        "application/octet-stream",  # fallback for unknown types
-    }
-    if file.content_type and file.content_type not in allowed_types:
-         print(f"⚠️ Warning: potentially unsupported file type {file.content_type}")
+    if words and words not in WORD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"words must be one of: {', '.join(WORD_FORMATS)}.")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > AUDIO_UPLOAD_MAX_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {AUDIO_UPLOAD_MAX_BYTES} byte limit.")
 
     try:
-        content = await file.read()
-        if not content:
+        upload = await MultipartFileStream(
+            request.stream(), request.headers.get("content-type", ""), "file", AUDIO_UPLOAD_MAX_BYTES
+        ).open()
+        if not upload.size:
             raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
+        # Validate file type
+        if upload.content_type and upload.content_type not in ALLOWED_AUDIO_TYPES:
+            print(f"⚠️ Warning: potentially unsupported file type {upload.content_type}")
+
         # Real Deepgram Call
-        result = deepgram_client.transcribe_bytes(content, file.filename)
+        result = await deepgram_client.transcribe_upload_async(upload, upload.content_type, upload.filename, words)
         
         transcript_text = result.get("formatted_transcript", "") or result.get("transcript", "")
         
@@ -171,11 +445,96 @@ async def transcribe_audio_endpoint(file: UploadFile = File(...)):
         )
     except HTTPException:
         raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ Transcription endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/ws/transcribe")
+async def transcribe_live(websocket: WebSocket):
+    """
+    Live transcription. The client sends microphone audio as binary
+    messages (any container Deepgram detects, e.g. MediaRecorder webm/opus)
+    and `{"type": "stop"}` when the user stops talking. The server pushes
+    JSON messages as Deepgram produces them:
+
+    - `{"type": "interim" | "final", "speaker", "text", "start", "end", "speech_final"}`
+      per speaker run (interim segments are replaced by later ones);
+    - `{"type": "transcript", "transcript", "formatted_transcript", ...}`
+      once the stream is flushed, then the socket closes;
+    - `{"type": "error", "detail"}` on failure (closed with 1011).
+    """
+    await websocket.accept()
+    try:
+        session = await deepgram_client.open_live_async()
+    except Exception as e:
+        print(f"❌ Live transcription unavailable: {e}")
+        await websocket.send_json({"type": "error", "detail": f"Live transcription unavailable: {e}"})
+        await websocket.close(code=1011)
+        return
+
+    client_gone = asyncio.Event()
+
+    async def relay_audio():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    client_gone.set()
+                    break
+                if message.get("bytes"):
+                    await session.send(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        control = json.loads(message["text"])
+                    except ValueError:
+                        control = None
+                    if not isinstance(control, dict):
+                        print("⚠️ Ignoring malformed live transcription control message (Non-blocking)")
+                    elif control.get("type") == "stop":
+                        break
+        finally:
+            if client_gone.is_set():
+                # Nobody left to deliver the remaining finals to
+                await session.aclose()
+            else:
+                await session.finish()
+
+    relay = asyncio.create_task(relay_audio())
+    try:
+        async for segment in session.segments():
+            if client_gone.is_set():
+                break
+            await websocket.send_json(segment)
+        if client_gone.is_set():
+            print("⚠️ Live transcription client disconnected (Non-blocking)")
+            return
+        if relay.done() and relay.exception():
+            raise relay.exception()
+        await websocket.send_json({"type": "transcript", **session.result()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        print("⚠️ Live transcription client disconnected (Non-blocking)")
+    except Exception as e:
+        if client_gone.is_set():
+            # A send raced the disconnect
+            print("⚠️ Live transcription client disconnected (Non-blocking)")
+            return
+        print(f"❌ Live transcription error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        relay.cancel()
+        await session.aclose()
+
+
 # ==========================================
 # 🏃‍♂️ Entry Point
 # ==========================================
@@ -183,12 +542,12 @@ async def transcribe_audio_endpoint(file: UploadFile = File(...)):
 @app.get("/documents")
 async def get_documents(doc_type: str = None):
     """Fetches list of generated documents from Sanity."""
-    return sanity_client.get_documents(doc_type)
+    return await sanity_client.get_documents_async(doc_type)
 
 @app.get("/documents/tasks")
 async def get_open_tasks():
     """Fetches all open action items from Sanity documents."""
-    return sanity_client.get_open_tasks()
+    return await sanity_client.get_open_tasks_async()
 
 @app.get(
     "/integrations/status",
@@ -206,6 +565,25 @@ async def get_integration_status():
     )
 
 
+@app.get("/classifier/stats", tags=["System"])
+async def get_classifier_stats():
+    """Local fast-path vs LLM classification counters."""
+    return llm_service.classifier_stats()
+
+
+@app.get("/http/stats", tags=["System"])
+async def get_http_pool_stats():
+    """Outbound connection pool utilization per host (keep-alive reuse)."""
+    return http_pool.stats()
+
+
+@app.get("/metrics", tags=["System"], response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint: stage/outbound latency, errors, fallbacks, in-flight gauges."""
+    http_pool.publish_metrics()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", tags=["System"])
 async def root():
     """Root endpoint to verify the server is running."""
@@ -216,14 +594,32 @@ async def root():
     }
 
 
-@app.get("/download/{filename}")
-async def download_file(filename: str):
-    """Serves generated PDF files."""
-    file_path = os.path.join("output", filename)
-    if not os.path.exists(file_path):
+# Content-addressed PDFs never change: let clients and proxies keep them for a year
+DOWNLOAD_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download_file(filename: str, request: Request):
+    """
+    Serves generated PDF files. Responses carry a strong ETag (content hash):
+    a matching If-None-Match gets a bodiless 304, and Range requests are
+    answered with 206 partial content. Content-addressed files never change,
+    so browsers may cache them for good.
+    """
+    name = os.path.basename(filename)
+    file_path = pdf_storage.resolve(name)
+    if not file_path:
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(file_path, media_type='application/pdf', filename=filename)
+
+    etag = await asyncio.to_thread(file_etag, file_path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": DOWNLOAD_IMMUTABLE_CACHE_CONTROL if is_content_addressed(name) else "no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(file_path, media_type='application/pdf', filename=name, headers=headers)
 
 
 if __name__ == "__main__":
@@ -36,6 +36,20 @@ class TextProcessRequest(BaseModel):
     }
 
 
+class BatchProcessRequest(BaseModel):
+    """Request body for POST /process-batch"""
+    items: List[TextProcessRequest] = Field(
+        ...,
+        min_length=1,
+        description="Documents to process"
+    )
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Max documents in flight (defaults to BATCH_DEFAULT_CONCURRENCY)"
+    )
+
+
 # ==========================================
 # 📤 Response Models
 # ==========================================
@@ -51,12 +65,26 @@ class DocumentResponse(BaseModel):
     pdf_path: Optional[str] = Field(
         None, description="Path to generated PDF (if available)"
     )
+    cached: bool = Field(
+        False, description="True if served from the result cache"
+    )
+    timings: Optional[Dict[str, Any]] = Field(
+        None, description="Per-stage timings and the critical path of this run"
+    )
     timestamp: str = Field(
         default_factory=lambda: datetime.now().isoformat(),
         description="Processing timestamp"
     )
 
 
+class BatchItemResult(BaseModel):
+    """One NDJSON line of POST /process-batch."""
+    index: int = Field(..., description="Position of the item in the request")
+    success: bool = Field(..., description="Whether this item was processed")
+    result: Optional[DocumentResponse] = Field(None, description="Document, if successful")
+    error: Optional[str] = Field(None, description="Failure reason, if not")
+
+
 class TranscribeResponse(BaseModel):
     """Response for audio transcription."""
     success: bool = True
@@ -70,6 +98,21 @@ class TranscribeResponse(BaseModel):
         description="Processing timestamp"
     )
 
+class JobResponse(BaseModel):
+    """Response for POST /jobs and GET /jobs/{job_id}."""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="queued | running | succeeded | failed")
+    stages: Dict[str, str] = Field(
+        ..., description="Per-stage status: classify, structure, render, enhance, store"
+    )
+    result: Optional[DocumentResponse] = Field(
+        None, description="Final document once the job has succeeded"
+    )
+    error: Optional[str] = Field(None, description="Failure reason if the job failed")
+    created_at: str = Field(..., description="Enqueue timestamp")
+    updated_at: str = Field(..., description="Last status change")
+
+
 class IntegrationStatusResponse(BaseModel):
     """Response for GET /integrations/status."""
     openai: str = Field(..., description="Status of OpenAI integration")
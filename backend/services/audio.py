@@ -0,0 +1,310 @@
+import os
+import sys
+import struct
+from array import array
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# ==========================================
+# 🎚 Audio segmentation (long recordings)
+# ==========================================
+# Long recordings are transcribed as overlapping segments in parallel (see
+# DeepgramClient). Cutting needs random access to samples, so only
+# uncompressed PCM WAV is segmented; compressed formats (mp3, webm, ogg)
+# would need a decoder and are sent in one request.
+#
+# Sources are either the audio bytes or a file path; each read opens its
+# own handle, so segments can be read from concurrent workers.
+
+AudioSource = Union[bytes, bytearray, memoryview, str]
+
+ENERGY_FRAME_SECONDS = 0.02
+# Cut in the middle of the quietest stretch of this length
+QUIET_WINDOW_SECONDS = 0.2
+# Samples looked at per energy frame (subsampled beyond this)
+MAX_SAMPLES_PER_FRAME = 400
+# Read size when streaming a segment's samples into a request body
+SEGMENT_CHUNK_BYTES = 64 * 1024
+
+
+class WavInfo(NamedTuple):
+    channels: int
+    sample_rate: int
+    bits: int
+    block_align: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def duration(self) -> float:
+        return self.data_size / (self.block_align * self.sample_rate)
+
+    def byte_offset(self, seconds: float) -> int:
+        """Offset of the sample frame at `seconds`, relative to the data chunk."""
+        frame = round(seconds * self.sample_rate)
+        return min(frame * self.block_align, self.data_size)
+
+
+class AudioSegment(NamedTuple):
+    """
+    One request's worth of audio: [start, end) is sent (it includes the
+    overlap), [core_start, core_end) is the part whose words are kept.
+    """
+    index: int
+    start: float
+    end: float
+    core_start: float
+    core_end: float
+
+
+def _size(source: AudioSource) -> int:
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return len(source)
+
+
+def read_range(source: AudioSource, offset: int, length: int) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+    return bytes(memoryview(source)[offset:offset + length])
+
+
+def read_wav_info(source: AudioSource) -> Optional[WavInfo]:
+    """Format and data location of a PCM WAV file; None for anything else."""
+    if read_range(source, 0, 12)[:4] != b"RIFF" or read_range(source, 8, 4) != b"WAVE":
+        return None
+    total = _size(source)
+    pos, fmt = 12, None
+    while pos + 8 <= total:
+        header = read_range(source, pos, 8)
+        chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+        if chunk_id == b"fmt ":
+            body = read_range(source, pos + 8, min(size, 40))
+            if len(body) < 16:
+                return None
+            tag, channels, rate, _, align, bits = struct.unpack("<HHIIHH", body[:16])
+            # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE (PCM data for our purposes)
+            if tag not in (1, 0xFFFE) or not (channels and rate and align):
+                return None
+            fmt = (channels, rate, bits, align)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            # Streamed WAVs often carry a placeholder size; trust the file instead
+            size = min(size, total - pos - 8)
+            size -= size % fmt[3]
+            return WavInfo(*fmt, data_offset=pos + 8, data_size=size)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def wav_header(info: WavInfo, data_size: int) -> bytes:
+    byte_rate = info.sample_rate * info.block_align
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, info.channels, info.sample_rate, byte_rate, info.block_align, info.bits)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def wav_segment(
+    source: AudioSource,
+    info: WavInfo,
+    segment: AudioSegment,
+    chunk_bytes: int = SEGMENT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """
+    A standalone WAV file holding [segment.start, segment.end), as a stream:
+    the header, then the samples in reads of `chunk_bytes`, so a segment is
+    never held in memory whole.
+    """
+    start, end = info.byte_offset(segment.start), info.byte_offset(segment.end)
+    yield wav_header(info, end - start)
+    offset, stop = info.data_offset + start, info.data_offset + end
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            f.seek(offset)
+            while offset < stop and (chunk := f.read(min(chunk_bytes, stop - offset))):
+                offset += len(chunk)
+                yield chunk
+    else:
+        view = memoryview(source)
+        for pos in range(offset, stop, chunk_bytes):
+            yield bytes(view[pos:min(pos + chunk_bytes, stop)])
+
+
+def _frame_energies(source: AudioSource, info: WavInfo, start: float, end: float) -> List[int]:
+    """Summed absolute amplitude per ENERGY_FRAME_SECONDS frame of [start, end)."""
+    if info.bits not in (8, 16):
+        return []
+    offset, stop = info.byte_offset(start), info.byte_offset(end)
+    data = read_range(source, info.data_offset + offset, stop - offset)
+    if info.bits == 16:
+        samples = array("h")
+        samples.frombytes(data[:len(data) - len(data) % 2])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        center = 0
+    else:
+        samples = array("B", data)
+        center = 128
+
+    per_frame = max(1, round(info.sample_rate * ENERGY_FRAME_SECONDS)) * info.channels
+    step = max(1, per_frame // MAX_SAMPLES_PER_FRAME)
+    return [
+        sum(abs(s - center) for s in samples[i:i + per_frame:step])
+        for i in range(0, len(samples) - per_frame + 1, per_frame)
+    ]
+
+
+def quietest_point(source: AudioSource, info: WavInfo, start: float, end: float) -> float:
+    """
+    Time in [start, end) in the middle of the longest pause: the longest run
+    of QUIET_WINDOW_SECONDS windows within 10% of the quietest one's energy.
+    The middle of the range when energy cannot be measured.
+    """
+    energies = _frame_energies(source, info, start, end)
+    window = max(1, round(QUIET_WINDOW_SECONDS / ENERGY_FRAME_SECONDS))
+    if len(energies) < window:
+        return (start + end) / 2
+
+    totals = [sum(energies[:window])]
+    for i in range(window, len(energies)):
+        totals.append(totals[-1] + energies[i] - energies[i - window])
+    limit = min(totals) * 11 // 10
+
+    best_start, best_length, run_start = 0, 0, None
+    for i, total in enumerate(totals + [limit + 1]):
+        if total <= limit:
+            run_start = i if run_start is None else run_start
+        elif run_start is not None:
+            if i - run_start > best_length:
+                best_start, best_length = run_start, i - run_start
+            run_start = None
+    # Runs of windows: the stretch covered spans best_length - 1 + window frames
+    return start + (best_start + (best_length - 1 + window) / 2) * ENERGY_FRAME_SECONDS
+
+
+def plan_segments(
+    source: AudioSource,
+    info: WavInfo,
+    segment_seconds: float,
+    overlap_seconds: float,
+    search_seconds: float,
+) -> List[AudioSegment]:
+    """
+    Splits the recording about every `segment_seconds`, cutting at the
+    quietest point within +/- `search_seconds` of each target. Every segment
+    also covers `overlap_seconds / 2` on either side of its cuts, so words at
+    the edges are heard in context and speakers can be matched across them.
+    Recordings up to 1.5 segments long are not split.
+    """
+    duration = info.duration
+    cuts = [0.0]
+    target = segment_seconds
+    while duration - target > segment_seconds / 2:
+        low = max(cuts[-1] + overlap_seconds, target - search_seconds)
+        cut = quietest_point(source, info, low, min(duration, target + search_seconds))
+        cuts.append(cut)
+        target = cut + segment_seconds
+    cuts.append(duration)
+
+    half = overlap_seconds / 2
+    return [
+        AudioSegment(i, max(0.0, a - half), min(duration, b + half), a, b)
+        for i, (a, b) in enumerate(zip(cuts, cuts[1:]))
+    ]
+
+
+def _same_word(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Heard twice in an overlap: same word, time ranges overlapping by half."""
+    if (a.get("word") or "").lower() != (b.get("word") or "").lower():
+        return False
+    shared = min(a["end"], b["end"]) - max(a["start"], b["start"])
+    return shared >= 0.5 * min(a["end"] - a["start"], b["end"] - b["start"])
+
+
+def _speaker_mapping(
+    previous: List[Dict[str, Any]],
+    current: List[Dict[str, Any]],
+    overlap_end: float,
+    next_speaker: int,
+) -> Tuple[Dict[Any, int], int]:
+    """
+    Maps a segment's speaker labels onto global ones by voting over the
+    words it shares with the previous segment (heard before `overlap_end`);
+    labels without a match get fresh global numbers.
+    """
+    votes: Dict[Tuple[Any, int], int] = {}
+    i = 0
+    for word in current:
+        if word["start"] >= overlap_end:
+            break
+        while i < len(previous) and previous[i]["end"] <= word["start"]:
+            i += 1
+        for candidate in previous[i:i + 3]:
+            if _same_word(candidate, word):
+                key = (word.get("speaker", 0), candidate["speaker"])
+                votes[key] = votes.get(key, 0) + 1
+                break
+
+    mapping: Dict[Any, int] = {}
+    taken = set()
+    for (local, global_label), _ in sorted(votes.items(), key=lambda item: -item[1]):
+        if local not in mapping and global_label not in taken:
+            mapping[local] = global_label
+            taken.add(global_label)
+    for word in current:
+        local = word.get("speaker", 0)
+        if local not in mapping:
+            mapping[local] = next_speaker
+            next_speaker += 1
+    return mapping, next_speaker
+
+
+def stitch_segments(segments: List[AudioSegment], alternatives: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Joins per-segment Deepgram alternatives ({"transcript", "confidence",
+    "words"}, times relative to the segment) into one for the recording:
+    word times are shifted by the segment start, each word is kept only by
+    the segment whose core contains its midpoint (dropping the overlap's
+    duplicates), and speaker labels are reconciled across boundaries.
+    """
+    words: List[Dict[str, Any]] = []
+    confidences: List[Tuple[float, int]] = []
+    previous: List[Dict[str, Any]] = []
+    previous_end = 0.0
+    next_speaker = 0
+    last = len(segments) - 1
+
+    for segment, alternative in zip(segments, alternatives):
+        shifted = [
+            {**w, "start": w.get("start", 0) + segment.start, "end": w.get("end", 0) + segment.start}
+            for w in alternative.get("words") or []
+        ]
+        if segment.index:
+            mapping, next_speaker = _speaker_mapping(
+                [w for w in previous if w["end"] > segment.start], shifted, previous_end, next_speaker
+            )
+        else:
+            # The first segment's labels are the global ones
+            mapping = {w.get("speaker", 0): w.get("speaker", 0) for w in shifted}
+            next_speaker = max(mapping.values(), default=-1) + 1
+
+        kept = 0
+        for w in shifted:
+            w["speaker"] = mapping[w.get("speaker", 0)]
+            middle = (w["start"] + w["end"]) / 2
+            if segment.core_start <= middle and (middle < segment.core_end or segment.index == last):
+                words.append(w)
+                kept += 1
+        confidences.append((alternative.get("confidence", 0), kept))
+        previous, previous_end = shifted, segment.end
+
+    weight = sum(count for _, count in confidences)
+    return {
+        "transcript": " ".join(w.get("punctuated_word") or w.get("word", "") for w in words),
+        "confidence": sum(c * count for c, count in confidences) / weight if weight else 0,
+        "words": words,
+    }
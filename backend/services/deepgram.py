@@ -1,13 +1,241 @@
 import os
-import requests
 import json
-from core.config import DEEPGRAM_API_KEY
+import time
+import asyncio
+import hashlib
+import tempfile
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+from websockets.asyncio.client import connect as ws_connect
+from websockets.exceptions import ConnectionClosed
+from core.cache import DiskCache, content_key
+from core.config import (
+    DEEPGRAM_API_KEY, DEEPGRAM_LIVE_KEEPALIVE_SECONDS, DEEPGRAM_LIVE_ENDPOINTING_MS, TRANSCRIPT_WORD_FORMAT,
+    DEEPGRAM_SEGMENT_SECONDS, DEEPGRAM_SEGMENT_OVERLAP_SECONDS, DEEPGRAM_SEGMENT_SEARCH_SECONDS, DEEPGRAM_SEGMENT_CONCURRENCY,
+    TRANSCRIPT_CACHE_ENABLED, TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_TTL_SECONDS, TRANSCRIPT_CACHE_MAX_BYTES,
+)
+from core.metrics import track_outbound, DEEPGRAM_LIVE_SESSIONS, TRANSCRIPT_CACHE_LOOKUPS
+from core.uploads import UploadError
+from services.audio import AudioSegment, AudioSource, WavInfo, plan_segments, read_wav_info, stitch_segments, wav_segment
+from services.http import http_pool
 
 DEEPGRAM_URL = "https://api.deepgram.com/v1/listen"
+DEEPGRAM_LIVE_URL = "wss://api.deepgram.com/v1/listen"
+# Read size when streaming or hashing a local file
+FILE_CHUNK_BYTES = 64 * 1024
+# Segmentable (uncompressed) uploads, see DeepgramClient._plan_segments
+WAV_AUDIO_TYPES = {"audio/wav", "audio/x-wav", "audio/wave"}
+
+
+WORD_FORMATS = ("columnar", "full", "none")
+
+
+def _audio_content_type(content_type: Optional[str]) -> str:
+    return content_type if content_type and content_type.startswith("audio/") else "audio/*"
+
+
+def _word_text(word: Dict[str, Any]) -> str:
+    return word.get("punctuated_word") or word.get("word", "")
+
+
+def speaker_turns(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Consecutive words of one speaker grouped into
+    {"speaker", "start", "end", "words", "text"} turns ("words" = count).
+    One pass over the words and one join per turn, so long recordings stay
+    linear.
+    """
+    turns: List[Dict[str, Any]] = []
+    texts: List[List[str]] = []
+    for word in words:
+        speaker = word.get("speaker", 0)
+        if not turns or turns[-1]["speaker"] != speaker:
+            turns.append({"speaker": speaker, "start": word.get("start"), "end": word.get("end"), "words": 0})
+            texts.append([])
+        turn = turns[-1]
+        turn["end"] = word.get("end")
+        turn["words"] += 1
+        texts[-1].append(_word_text(word))
+    for turn, text in zip(turns, texts):
+        turn["text"] = " ".join(text)
+    return turns
+
+
+def columnar_words(words: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Word timings as parallel arrays instead of one dict per word:
+
+    - "text": the punctuated words joined by single spaces (word i is
+      text.split(" ")[i]; spaces inside a word become U+00A0);
+    - "gap_ms": silence before each word in ms (its start minus the
+      previous word's end; the first is its absolute start);
+    - "duration_ms", "confidence" (percent): integers per word;
+    - "speakers": [[speaker, word count], ...] runs.
+
+    About a tenth of the JSON size of Deepgram's per-word objects.
+    """
+    gaps, durations, confidences = [], [], []
+    speakers: List[List[int]] = []
+    previous_end = 0
+    for word in words:
+        start = round((word.get("start") or 0) * 1000)
+        end = round((word.get("end") or 0) * 1000)
+        gaps.append(start - previous_end)
+        durations.append(end - start)
+        previous_end = end
+        confidences.append(round((word.get("confidence") or 0) * 100))
+        speaker = word.get("speaker", 0)
+        if speakers and speakers[-1][0] == speaker:
+            speakers[-1][1] += 1
+        else:
+            speakers.append([speaker, 1])
+    return {
+        "encoding": "columnar-v1",
+        "count": len(words),
+        "text": " ".join(_word_text(w).replace(" ", "\u00a0") for w in words),
+        "gap_ms": gaps,
+        "duration_ms": durations,
+        "confidence": confidences,
+        "speakers": speakers,
+    }
+
+
+def expand_columnar_words(timings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of columnar_words: per-word dicts (times in seconds, ms precision)."""
+    texts = timings["text"].split(" ") if timings["count"] else []
+    speakers = [speaker for speaker, count in timings["speakers"] for _ in range(count)]
+    words, end = [], 0
+    for i, text in enumerate(texts):
+        start = end + timings["gap_ms"][i]
+        end = start + timings["duration_ms"][i]
+        words.append({
+            "punctuated_word": text.replace("\u00a0", " "),
+            "start": start / 1000,
+            "end": end / 1000,
+            "confidence": timings["confidence"][i] / 100,
+            "speaker": speakers[i],
+        })
+    return words
+
+
+def live_segments(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Transcript segments in one streaming `Results` message, split into runs
+    of the same speaker: {"type": "interim" | "final", "speaker", "text",
+    "start", "end", "speech_final"}. Interim segments are superseded by the
+    next message for the same audio; final ones are settled.
+    """
+    if message.get("type") != "Results":
+        return []
+    alternative = (message.get("channel", {}).get("alternatives") or [{}])[0]
+    kind = "final" if message.get("is_final") else "interim"
+    speech_final = bool(message.get("speech_final"))
+
+    words = alternative.get("words") or []
+    if not words:
+        text = alternative.get("transcript", "")
+        if not text:
+            return []
+        start = message.get("start", 0)
+        return [{"type": kind, "speaker": None, "text": text, "start": start,
+                 "end": start + message.get("duration", 0), "speech_final": speech_final}]
+
+    segments = [
+        {"type": kind, "speaker": turn["speaker"], "text": turn["text"], "start": turn["start"], "end": turn["end"], "speech_final": False}
+        for turn in speaker_turns(words)
+    ]
+    segments[-1]["speech_final"] = speech_final
+    return segments
+
+
+class DeepgramLiveSession:
+    """
+    One streaming transcription over Deepgram's live WebSocket API: audio
+    goes in with `send`, `finish` flushes it, and `segments()` yields
+    interim/final segments until Deepgram closes the stream. Final words are
+    collected so `result()` returns the same shape as a prerecorded call.
+    While the caller sends nothing, KeepAlive messages hold the stream open.
+    """
+
+    def __init__(self, client: "DeepgramClient", connection, keepalive_seconds: float = DEEPGRAM_LIVE_KEEPALIVE_SECONDS):
+        self.client = client
+        self.connection = connection
+        self._closed = False
+        self.words: List[dict] = []
+        self.transcripts: List[str] = []
+        self.confidences: List[float] = []
+        self._last_sent = time.monotonic()
+        self._keepalive = asyncio.create_task(self._keepalive_loop(keepalive_seconds))
+        DEEPGRAM_LIVE_SESSIONS.inc()
+
+    async def _keepalive_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(max(0.0, self._last_sent + interval - time.monotonic()))
+            if time.monotonic() - self._last_sent >= interval:
+                try:
+                    await self.connection.send(json.dumps({"type": "KeepAlive"}))
+                except ConnectionClosed:
+                    # Deepgram ended the stream; segments() finishes on its own
+                    return
+                self._last_sent = time.monotonic()
+
+    async def send(self, chunk: bytes):
+        self._last_sent = time.monotonic()
+        await self.connection.send(chunk)
+
+    async def finish(self):
+        """No more audio: Deepgram sends the remaining finals and closes."""
+        self._keepalive.cancel()
+        try:
+            await self.connection.send(json.dumps({"type": "CloseStream"}))
+        except ConnectionClosed:
+            pass
+
+    async def segments(self) -> AsyncIterator[Dict[str, Any]]:
+        async for message in self.connection:
+            if isinstance(message, bytes):
+                continue
+            data = json.loads(message)
+            if data.get("type") == "Results" and data.get("is_final"):
+                alternative = (data.get("channel", {}).get("alternatives") or [{}])[0]
+                if alternative.get("transcript"):
+                    self.transcripts.append(alternative["transcript"])
+                    self.confidences.append(alternative.get("confidence", 0))
+                self.words.extend(alternative.get("words") or [])
+            for segment in live_segments(data):
+                yield segment
+
+    def result(self) -> dict:
+        """The settled transcript so far, shaped like transcribe_bytes' result."""
+        confidence = sum(self.confidences) / len(self.confidences) if self.confidences else 0
+        return self.client._process_response({"results": {"channels": [{"alternatives": [{
+            "transcript": " ".join(self.transcripts),
+            "confidence": confidence,
+            "words": self.words,
+        }]}]}})
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._keepalive.cancel()
+        DEEPGRAM_LIVE_SESSIONS.dec()
+        await self.connection.close()
 
 class DeepgramClient:
     def __init__(self):
         self.api_key = DEEPGRAM_API_KEY
+        self.live_url = DEEPGRAM_LIVE_URL
+        self.word_format = TRANSCRIPT_WORD_FORMAT
+        self.segment_seconds = DEEPGRAM_SEGMENT_SECONDS
+        self.segment_overlap_seconds = DEEPGRAM_SEGMENT_OVERLAP_SECONDS
+        self.segment_search_seconds = DEEPGRAM_SEGMENT_SEARCH_SECONDS
+        self.segment_concurrency = DEEPGRAM_SEGMENT_CONCURRENCY
+        # Transcripts by audio fingerprint (see _cache_key)
+        self.cache = DiskCache(
+            TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_TTL_SECONDS, TRANSCRIPT_CACHE_MAX_BYTES
+        ) if TRANSCRIPT_CACHE_ENABLED else None
         if not self.api_key:
             print("⚠️ Deepgram API Key missing. Transcription will fail.")
 
@@ -28,51 +256,296 @@ class DeepgramClient:
             "language": "en",
         }
 
-    def transcribe_bytes(self, audio_data: bytes, filename: str = "upload.mp3") -> dict:
+    def _get_live_params(self):
+        # Utterances and sentiment are prerecorded-only features
+        params = {k: v for k, v in self._get_params().items() if k not in ("utterances", "sentiment")}
+        params.update({"interim_results": "true", "endpointing": str(DEEPGRAM_LIVE_ENDPOINTING_MS)})
+        return params
+
+    async def open_live_async(self) -> DeepgramLiveSession:
+        """Opens a streaming transcription (Deepgram's live WebSocket API)."""
+        if not self.api_key:
+            raise RuntimeError("Deepgram API key missing.")
+        url = f"{self.live_url}?{urlencode(self._get_live_params())}"
+        async with track_outbound("deepgram", "listen_live"):
+            connection = await ws_connect(url, additional_headers={"Authorization": f"Token {self.api_key}"})
+        return DeepgramLiveSession(self, connection)
+
+    def _plan_segments(self, source: AudioSource) -> Optional[Tuple[WavInfo, List[AudioSegment]]]:
         """
-        Transcribes audio bytes and returns a structured response.
+        Segments for a long PCM WAV recording (see services.audio), or None
+        when the audio is sent in one request: short recordings, and
+        compressed formats that cannot be cut without decoding.
         """
-        print(f"🎧 Transcribing audio ({len(audio_data)} bytes) with Deepgram...")
-        
+        info = read_wav_info(source)
+        if info is None or info.duration <= self.segment_seconds * 1.5:
+            return None
+        return info, plan_segments(source, info, self.segment_seconds, self.segment_overlap_seconds, self.segment_search_seconds)
+
+    @staticmethod
+    def _alternative(data: dict) -> dict:
+        return data["results"].get("channels", [{}])[0].get("alternatives", [{}])[0]
+
+    def _process_alternative(self, alternative: dict, word_format: Optional[str] = None) -> dict:
+        return self._process_response({"results": {"channels": [{"alternatives": [alternative]}]}}, word_format)
+
+    # --- Transcript cache ---
+    # Entries hold Deepgram's alternative ({"transcript", "confidence",
+    # "words"}), so a hit is processed exactly like a fresh response, in
+    # whatever word format the caller asks for.
+
+    def _cache_key(self, audio_digest: str) -> str:
+        return content_key(audio_digest, json.dumps(self._get_params(), sort_keys=True))
+
+    def _cache_get(self, audio_digest: str) -> Optional[dict]:
+        entry = self.cache.get(self._cache_key(audio_digest))
+        TRANSCRIPT_CACHE_LOOKUPS.inc(result="hit" if entry else "miss")
+        if entry:
+            print(f"⚡ Transcript cache hit: {audio_digest[:12]}")
+            return entry["alternative"]
+        return None
+
+    def _cache_set(self, audio_digest: str, alternative: dict):
+        try:
+            self.cache.set(self._cache_key(audio_digest), {"stored_at": time.time(), "alternative": alternative})
+        except OSError as e:
+            print(f"⚠️ Transcript cache write failed (Non-blocking): {e}")
+
+    @staticmethod
+    def _file_digest(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as audio:
+            while chunk := audio.read(FILE_CHUNK_BYTES):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _transcribe_cached(self, audio_digest: Optional[str], transcribe, word_format: Optional[str] = None) -> dict:
+        """Runs `transcribe()` -> alternative unless the cache has the audio; errors become {"error"} results."""
+        try:
+            alternative = self._cache_get(audio_digest) if self.cache is not None else None
+            if alternative is not None:
+                return {**self._process_alternative(alternative, word_format), "cached": True}
+            alternative = transcribe()
+            if self.cache is not None:
+                self._cache_set(audio_digest, alternative)
+            return {**self._process_alternative(alternative, word_format), "cached": False}
+        except Exception as e:
+            print(f"❌ Deepgram Transcription Failed: {e}")
+            return {"transcript": "", "error": str(e)}
+
+    async def _transcribe_cached_async(self, audio_digest: Optional[str], transcribe, word_format: Optional[str] = None) -> dict:
+        """Async twin of _transcribe_cached; `transcribe` is a coroutine function."""
         try:
-            response = requests.post(
+            alternative = await asyncio.to_thread(self._cache_get, audio_digest) if self.cache is not None else None
+            if alternative is not None:
+                return {**self._process_alternative(alternative, word_format), "cached": True}
+            alternative = await transcribe()
+            if self.cache is not None:
+                await asyncio.to_thread(self._cache_set, audio_digest, alternative)
+            return {**self._process_alternative(alternative, word_format), "cached": False}
+        except Exception as e:
+            print(f"❌ Deepgram Transcription Failed: {e}")
+            return {"transcript": "", "error": str(e)}
+
+    # --- Deepgram requests (each returns the alternative or raises) ---
+
+    def _listen(self, audio, content_type: str = "audio/*") -> dict:
+        with track_outbound("deepgram", "listen"):
+            response = http_pool.session.post(
                 DEEPGRAM_URL,
                 params=self._get_params(),
-                headers=self._get_headers(),
-                data=audio_data,
-                timeout=60
+                headers=self._get_headers(content_type),
+                data=audio,
             )
             response.raise_for_status()
-            return self._process_response(response.json())
-        except Exception as e:
-            print(f"❌ Deepgram Transcription Failed: {e}")
-            return {"transcript": "", "error": str(e)}
+        return self._alternative(response.json())
+
+    async def _listen_async(self, content, content_type: str = "audio/*") -> dict:
+        async with track_outbound("deepgram", "listen"):
+            response = await http_pool.async_client().post(
+                DEEPGRAM_URL,
+                params=self._get_params(),
+                headers=self._get_headers(content_type),
+                content=content,
+            )
+            response.raise_for_status()
+        return self._alternative(response.json())
+
+    def _transcribe_segments(self, source: AudioSource, info: WavInfo, segments: List[AudioSegment]) -> dict:
+        """
+        Transcribes the segments concurrently (up to segment_concurrency
+        requests) and stitches them, so wall-clock time follows the segment
+        length rather than the recording's. Any failed segment fails the call.
+        """
+        print(f"🎧 Transcribing {info.duration:.0f}s of audio as {len(segments)} parallel segments...")
+        with ThreadPoolExecutor(max_workers=min(self.segment_concurrency, len(segments))) as pool:
+            # requests sends a generator body chunked, reading it as it goes
+            alternatives = list(pool.map(lambda segment: self._listen(wav_segment(source, info, segment), "audio/wav"), segments))
+        return stitch_segments(segments, alternatives)
+
+    async def _transcribe_segments_async(self, source: AudioSource, info: WavInfo, segments: List[AudioSegment]) -> dict:
+        """Async twin of _transcribe_segments, on the pooled httpx client."""
+        print(f"🎧 Transcribing {info.duration:.0f}s of audio as {len(segments)} parallel segments...")
+        semaphore = asyncio.Semaphore(self.segment_concurrency)
+
+        async def body(segment: AudioSegment):
+            # Each ranged read happens off the loop, as the request consumes it
+            reader = wav_segment(source, info, segment)
+            try:
+                while (chunk := await asyncio.to_thread(next, reader, None)) is not None:
+                    yield chunk
+            finally:
+                reader.close()
+
+        async def transcribe(segment: AudioSegment) -> dict:
+            async with semaphore:
+                return await self._listen_async(body(segment), "audio/wav")
+
+        alternatives = await asyncio.gather(*(transcribe(segment) for segment in segments))
+        return stitch_segments(segments, list(alternatives))
+
+    # --- Public API ---
+
+    def transcribe_bytes(self, audio_data: bytes, filename: str = "upload.mp3") -> dict:
+        """
+        Transcribes audio bytes and returns a structured response.
+        Long WAV recordings are transcribed as parallel segments; audio seen
+        before is answered from the transcript cache.
+        """
+        print(f"🎧 Transcribing audio ({len(audio_data)} bytes) with Deepgram...")
+
+        def transcribe() -> dict:
+            plan = self._plan_segments(audio_data)
+            if plan:
+                return self._transcribe_segments(audio_data, *plan)
+            return self._listen(audio_data)
+
+        digest = hashlib.sha256(audio_data).hexdigest() if self.cache is not None else None
+        return self._transcribe_cached(digest, transcribe)
 
     def transcribe_file(self, file_path: str) -> dict:
         """
         Transcribes a local audio file.
+        Long WAV recordings are transcribed as parallel segments; audio seen
+        before is answered from the transcript cache.
         """
         if not os.path.exists(file_path):
             return {"transcript": "", "error": "File not found"}
 
-        try:
+        def transcribe() -> dict:
+            plan = self._plan_segments(file_path)
+            if plan:
+                return self._transcribe_segments(file_path, *plan)
             with open(file_path, "rb") as audio:
-                response = requests.post(
-                    DEEPGRAM_URL,
-                    params=self._get_params(),
-                    headers=self._get_headers(),
-                    data=audio,
-                    timeout=60
-                )
-            response.raise_for_status()
-            return self._process_response(response.json())
+                return self._listen(audio)
+
+        digest = self._file_digest(file_path) if self.cache is not None else None
+        return self._transcribe_cached(digest, transcribe)
+
+    async def transcribe_file_async(
+        self,
+        file_path: str,
+        content_type: Optional[str] = None,
+        word_format: Optional[str] = None,
+        audio_digest: Optional[str] = None,
+    ) -> dict:
+        """
+        Transcribes a local audio file without blocking the event loop: long
+        WAV recordings as parallel segments, anything else streamed from disk
+        in one request. `audio_digest` (SHA-256 hex of the file) saves
+        re-reading the file for the cache lookup when the caller has it.
+        """
+        async def chunks():
+            with open(file_path, "rb") as audio:
+                while chunk := await asyncio.to_thread(audio.read, FILE_CHUNK_BYTES):
+                    yield chunk
+
+        async def transcribe() -> dict:
+            plan = await asyncio.to_thread(self._plan_segments, file_path)
+            if plan:
+                return await self._transcribe_segments_async(file_path, *plan)
+            return await self._listen_async(chunks(), _audio_content_type(content_type))
+
+        if self.cache is not None and audio_digest is None:
+            audio_digest = await asyncio.to_thread(self._file_digest, file_path)
+        return await self._transcribe_cached_async(audio_digest, transcribe, word_format)
+
+    async def transcribe_upload_async(
+        self,
+        chunks: AsyncIterable[bytes],
+        content_type: Optional[str] = None,
+        filename: Optional[str] = None,
+        word_format: Optional[str] = None,
+    ) -> dict:
+        """
+        Transcribes an upload as it arrives. With the transcript cache off
+        and audio that cannot be segmented, the chunks are relayed straight to
+        Deepgram (transcribe_stream_async). Otherwise they are spooled to a
+        temp file while their SHA-256 is computed, so a repeated upload is
+        answered from the cache without a Deepgram call, and long WAVs can be
+        cut into segments. Upload errors raised by `chunks` propagate.
+        """
+        is_wav = content_type in WAV_AUDIO_TYPES or (filename or "").lower().endswith(".wav")
+        if self.cache is None and not is_wav:
+            return await self.transcribe_stream_async(chunks, content_type, word_format)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "upload.wav" if is_wav else "upload")
+            digest = hashlib.sha256()
+
+            def spool_block(block: bytes):
+                digest.update(block)
+                spool.write(block)
+
+            with open(path, "wb") as spool:
+                # Upload chunks are gathered into blocks; each block is hashed and written off the loop
+                buffer = bytearray()
+                async for chunk in chunks:
+                    buffer += chunk
+                    if len(buffer) >= FILE_CHUNK_BYTES:
+                        await asyncio.to_thread(spool_block, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(spool_block, bytes(buffer))
+            return await self.transcribe_file_async(path, content_type, word_format, digest.hexdigest())
+
+    async def transcribe_stream_async(self, chunks: AsyncIterable[bytes], content_type: Optional[str] = None, word_format: Optional[str] = None) -> dict:
+        """
+        Transcribes audio that is still arriving: `chunks` are sent to Deepgram
+        as a chunked request body as soon as they are produced, so memory use
+        does not grow with the recording. Upload errors raised by `chunks`
+        (e.g. UploadTooLargeError) propagate; Deepgram failures are returned
+        as {"transcript": "", "error": ...} like transcribe_bytes. Not cached:
+        the audio is only fingerprinted once Deepgram has already heard it.
+        """
+        print(f"🎧 Streaming audio to Deepgram...")
+        upload_error = None
+
+        async def body():
+            nonlocal upload_error
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            except UploadError as e:
+                upload_error = e
+                raise
+
+        try:
+            alternative = await self._listen_async(body(), _audio_content_type(content_type))
+            return self._process_alternative(alternative, word_format)
         except Exception as e:
+            # httpx may wrap errors raised while producing the body
+            if upload_error is not None:
+                raise upload_error
             print(f"❌ Deepgram Transcription Failed: {e}")
             return {"transcript": "", "error": str(e)}
 
-    def _process_response(self, data: dict) -> dict:
+    def _process_response(self, data: dict, word_format: Optional[str] = None) -> dict:
         """
         Extracts transcript, speaker-labeled text, and sentiment.
+        Word timings are returned as `word_timings` (columnar, see
+        columnar_words), as Deepgram's raw `words` list ("full"), or not at
+        all ("none"); `word_format` defaults to TRANSCRIPT_WORD_FORMAT.
         """
         try:
             result = data["results"]
@@ -82,35 +555,27 @@ class DeepgramClient:
             # 1. Plain Text
             raw_transcript = alternatives.get("transcript", "")
             
-            # 2. Speaker-Labeled Transcript (Diarized)
-            # Iterate through words/utterances to reconstruct "Speaker X: ..."
-            diarized_transcript = ""
-            current_speaker = None
-            
-            words = alternatives.get("words", [])
-            if words:
-                for word in words:
-                    speaker = word.get("speaker", 0)
-                    text = word.get("word", "")
-                    punctuated = word.get("punctuated_word", text)
-                    
-                    if speaker != current_speaker:
-                        if current_speaker is not None:
-                            diarized_transcript += "\n\n"
-                        diarized_transcript += f"Speaker {speaker}: "
-                        current_speaker = speaker
-                    
-                    diarized_transcript += f"{punctuated} "
+            # 2. Speaker-Labeled Transcript (Diarized): "Speaker X: ..." per turn
+            words = alternatives.get("words") or []
+            turns = speaker_turns(words)
+            if turns:
+                diarized_transcript = "\n\n".join(f"Speaker {turn['speaker']}: {turn['text']}" for turn in turns)
             else:
                 # Fallback if no word-level info
                 diarized_transcript = raw_transcript
 
-            return {
+            processed = {
                 "transcript": raw_transcript,
                 "formatted_transcript": diarized_transcript.strip(),
                 "confidence": alternatives.get("confidence", 0),
-                "words": words
+                "speaker_turns": turns,
             }
+            word_format = word_format or self.word_format
+            if word_format == "full":
+                processed["words"] = words
+            elif word_format == "columnar":
+                processed["word_timings"] = columnar_words(words)
+            return processed
 
         except Exception as e:
             print(f"❌ Error processing Deepgram response: {e}")
@@ -1,133 +1,876 @@
-import requests
+import asyncio
+import httpx
 import json
 import base64
 import os
-from jinja2 import Environment, FileSystemLoader
-from core.config import FOXIT_CLIENT_ID, FOXIT_CLIENT_SECRET
+import time
+import random
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import Executor
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from core.config import (
+    FOXIT_CLIENT_ID,
+    FOXIT_CLIENT_SECRET,
+    FOXIT_TOKEN_REFRESH_MARGIN_SECONDS,
+    FOXIT_TOKEN_DEFAULT_TTL_SECONDS,
+    FOXIT_TOKEN_RETRY_SECONDS,
+    TEMPLATE_CACHE_DIR,
+    TEMPLATE_AUTO_RELOAD,
+    TEMPLATE_THREAD_THRESHOLD_CHARS,
+    PDF_BACKEND,
+    PDF_LOCAL_MAX_HTML_CHARS,
+    PDF_ENHANCE_BACKEND,
+    FOXIT_TASK_POLL_INITIAL_SECONDS,
+    FOXIT_TASK_POLL_MAX_SECONDS,
+    FOXIT_TASK_TIMEOUT_SECONDS,
+    FOXIT_TASK_BATCH_SIZE,
+    FOXIT_TASK_TRANSFER_CONCURRENCY,
+)
+from core.metrics import track_outbound, track_stage, record_mock_fallback, PDF_REUSED, PDF_RENDERS, PDF_ENHANCEMENTS, FOXIT_TASKS_OUTSTANDING, FOXIT_TASK_STATUS_REQUESTS
+from core.pdf_store import raw_pdf_path, enhanced_pdf_path, atomic_writer, is_content_addressed, pdf_storage
+from services.pdf_backends import PdfBackend, LocalPdfBackend, FoxitDocGenBackend
+from services.pdf_enhance import enhance_file, enhancement_update
+from services.http import http_pool
 
 # Foxit API Endpoints
 FOXIT_API_BASE = "https://api.foxit.com" # Placeholder - replace with actual base URL if different
 FOXIT_OAUTH_URL = "https://services.foxit.com/api/oauth/token"
 FOXIT_DOC_GEN_URL = "https://services.foxit.com/api/doc-gen/html-to-pdf"
 FOXIT_PDF_SERVICES_URL = "https://services.foxit.com/api/pdf-services"
+# PDF Services operation used for remote enhancement (PDF_ENHANCE_BACKEND=foxit)
+FOXIT_ENHANCE_OPERATION = "documents/enhance/pdf-watermark"
+
+MOCK_TOKEN = "MOCK_TOKEN"
+
+# Part of the enhanced file's content address
+DEFAULT_ENHANCE_OPTIONS = {"watermark": "CONFIDENTIAL", "page_numbers": True}
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+
+def create_template_env(cache_dir: Optional[str] = TEMPLATE_CACHE_DIR, auto_reload: bool = TEMPLATE_AUTO_RELOAD) -> Environment:
+    """
+    Jinja environment with compiled templates persisted to `cache_dir`, so a
+    fresh worker loads bytecode instead of re-parsing. Outside development,
+    templates are not re-checked on disk for every render.
+    """
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        bytecode_cache=bytecode_cache,
+        auto_reload=auto_reload,
+    )
+
+
+def warmup_context(doc_type: str) -> dict:
+    """Small context exercising every template branch (strings and lists)."""
+    return {
+        "title": "Warmup",
+        "doc_type": doc_type,
+        "date": "",
+        "structured_data": {"summary": "Warmup", "action_items": ["Warmup"]},
+    }
+
+
+def context_size(value, limit: int) -> int:
+    """Approximate text size of a render context; stops counting at `limit`."""
+    size = 0
+    stack = [value]
+    while stack and size < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+            size += len(item)
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+            size += len(item)
+    return size
+
+# A token fetch returns (access_token, expires_in seconds or None)
+TokenFetch = Callable[[], Tuple[str, Optional[float]]]
+AsyncTokenFetch = Callable[[], Awaitable[Tuple[str, Optional[float]]]]
+
+
+class FoxitTokenManager:
+    """
+    Caches the OAuth token together with its expiry and renews it before it
+    runs out:
+
+    - a background loop (start/stop) refreshes ahead of expiry, so request
+      handlers normally just read the cached token;
+    - concurrent callers share one in-flight refresh (single-flight), both
+      across asyncio tasks and across threads;
+    - a token inside the refresh window is still served while a refresh runs;
+    - after a failed fetch, new attempts wait `retry_seconds`.
+    """
+
+    def __init__(
+        self,
+        fetch: TokenFetch,
+        fetch_async: AsyncTokenFetch,
+        refresh_margin: float = FOXIT_TOKEN_REFRESH_MARGIN_SECONDS,
+        default_ttl: float = FOXIT_TOKEN_DEFAULT_TTL_SECONDS,
+        retry_seconds: float = FOXIT_TOKEN_RETRY_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self._fetch_async = fetch_async
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.retry_seconds = retry_seconds
+        self._clock = clock
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    @property
+    def token(self) -> Optional[str]:
+        """The cached token if it has not expired yet."""
+        return self._token if self._clock() < self._expires_at else None
+
+    def _needs_refresh(self) -> bool:
+        return self._clock() >= self._refresh_at
+
+    def _store(self, token: str, expires_in: Optional[float]):
+        if not token:
+            raise ValueError("Token response has no access_token")
+        ttl = float(expires_in) if expires_in else self.default_ttl
+        now = self._clock()
+        with self._lock:
+            self._token = token
+            self._expires_at = now + ttl
+            # Short-lived tokens refresh at half-life instead of past their expiry
+            self._refresh_at = now + ttl - min(self.refresh_margin, ttl / 2)
+            self._retry_at = 0.0
+            self.refreshes += 1
+
+    def _fetch_failed(self, e: Exception):
+        print(f"❌ Foxit Auth Failed: {e}")
+        self._retry_at = self._clock() + self.retry_seconds
+
+    def invalidate(self):
+        """Drops the cached token (e.g. after a 401) so the next caller refreshes."""
+        with self._lock:
+            self._token = None
+            self._expires_at = self._refresh_at = self._retry_at = 0.0
+
+    def get_token(self) -> Optional[str]:
+        """Sync access (scripts, worker threads). Refreshes inline only when due."""
+        if not self._needs_refresh():
+            return self.token
+        with self._fetch_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._needs_refresh() and self._clock() >= self._retry_at:
+                try:
+                    self._store(*self._fetch())
+                except Exception as e:
+                    self._fetch_failed(e)
+        return self.token
+
+    async def get_token_async(self) -> Optional[str]:
+        """
+        Returns the cached token without I/O when possible; a token in the
+        refresh window triggers a background refresh, and only a missing or
+        expired token makes the caller wait (on the shared refresh).
+        """
+        if not self._needs_refresh():
+            return self.token
+        if self.token:
+            self._refresh_in_background()
+            return self.token
+        return await self.refresh_async()
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh_async())
+
+    async def refresh_async(self) -> Optional[str]:
+        """Joins the in-flight refresh or starts one (single-flight)."""
+        self._refresh_in_background()
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh_async(self) -> Optional[str]:
+        if self._clock() < self._retry_at:
+            return self.token
+        try:
+            token, expires_in = await self._fetch_async()
+            self._store(token, expires_in)
+        except Exception as e:
+            self._fetch_failed(e)
+        return self.token
+
+    async def _refresh_loop(self):
+        while True:
+            if self._needs_refresh():
+                await self.refresh_async()
+            now = self._clock()
+            wake_at = self._refresh_at if self.token and self._refresh_at > now else now + self.retry_seconds
+            await asyncio.sleep(max(wake_at - now, 0.05))
+
+    async def start(self):
+        """Fetches the first token and keeps it fresh in the background."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._loop_task, self._refresh_task) if t), return_exceptions=True)
+        self._loop_task = None
+        self._refresh_task = None
+
+
+class FoxitTaskError(Exception):
+    """A Foxit PDF Services task failed, timed out or returned an unusable response."""
+
+
+class _PendingTask:
+    """Poll state of one outstanding task."""
+
+    def __init__(self, task_id: str, future: asyncio.Future, now: float, interval: float, timeout: float):
+        self.task_id = task_id
+        self.future = future
+        self.started = now
+        self.interval = interval
+        self.next_poll = now + interval
+        self.deadline = now + timeout
+        self.polls = 0
+
+
+class FoxitTaskEngine:
+    """
+    Runs Foxit PDF Services tasks (upload -> task id -> poll -> download)
+    for many documents on one event loop:
+
+    - callers await a future; a single poller task checks every outstanding
+      task, so hundreds of documents cost hundreds of futures, not threads;
+    - each task backs off exponentially (with jitter) up to `poll_max`, or
+      follows the server's progress estimate when the status reports one;
+    - tasks that are due together are checked with one batched status
+      request (concurrent single requests if batching is unavailable), and
+      a 429 pushes every poll back by its Retry-After;
+    - uploads and downloads stream from/to disk, `transfer_concurrency` at a time.
+    """
+
+    def __init__(
+        self,
+        client: "FoxitClient",
+        base_url: str = FOXIT_PDF_SERVICES_URL,
+        poll_initial: float = FOXIT_TASK_POLL_INITIAL_SECONDS,
+        poll_max: float = FOXIT_TASK_POLL_MAX_SECONDS,
+        poll_factor: float = 2.0,
+        timeout: float = FOXIT_TASK_TIMEOUT_SECONDS,
+        batch_size: int = FOXIT_TASK_BATCH_SIZE,
+        transfer_concurrency: int = FOXIT_TASK_TRANSFER_CONCURRENCY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self.transfer_concurrency = max(1, transfer_concurrency)
+        self._clock = clock
+        self._pending: Dict[str, _PendingTask] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._transfers: Optional[asyncio.Semaphore] = None
+        self.batch_supported = True
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._pending)
+
+    # ------------------------------------------
+    # HTTP
+    # ------------------------------------------
+
+    async def _request(self, method: str, path: str, operation: str, allow: Tuple[int, ...] = (), **kwargs) -> httpx.Response:
+        token = await self.client.get_token_async()
+        if not token:
+            raise FoxitTaskError("Foxit auth unavailable")
+        headers = {"Authorization": f"Bearer {token}"}
+        async with track_outbound("foxit", operation):
+            response = await self.client._get_async_http().request(method, f"{self.base_url}/{path}", headers=headers, **kwargs)
+            if response.status_code == 401:
+                self.client.tokens.invalidate()
+            if response.status_code not in allow:
+                response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _field(response: httpx.Response, name: str) -> str:
+        value = response.json().get(name)
+        if not value:
+            raise FoxitTaskError(f"Foxit response has no {name}")
+        return value
+
+    def _transfer_slot(self) -> asyncio.Semaphore:
+        if self._transfers is None:
+            self._transfers = asyncio.Semaphore(self.transfer_concurrency)
+        return self._transfers
+
+    async def upload(self, pdf_path: str) -> str:
+        """Streams the file to Foxit; returns its document id."""
+        async with self._transfer_slot():
+            with open(pdf_path, "rb") as f:
+                files = {"file": (os.path.basename(pdf_path), f, "application/pdf")}
+                response = await self._request("POST", "documents/upload", "task_upload", files=files)
+        return self._field(response, "documentId")
+
+    async def submit(self, operation: str, document_id: str, config: Optional[dict] = None) -> str:
+        """Starts `operation` on an uploaded document; returns the task id."""
+        payload = {"documentId": document_id, "config": config or {}}
+        response = await self._request("POST", operation, "task_submit", json=payload)
+        return self._field(response, "taskId")
+
+    async def download(self, document_id: str, output_path: str) -> str:
+        """Streams a result document to `output_path` (atomically)."""
+        async with self._transfer_slot():
+            token = await self.client.get_token_async()
+            if not token:
+                raise FoxitTaskError("Foxit auth unavailable")
+            url = f"{self.base_url}/documents/{document_id}/download"
+            async with track_outbound("foxit", "task_download"):
+                async with self.client._get_async_http().stream("GET", url, headers={"Authorization": f"Bearer {token}"}) as response:
+                    if response.status_code == 401:
+                        self.client.tokens.invalidate()
+                    response.raise_for_status()
+                    with atomic_writer(output_path) as f:
+                        async for chunk in response.aiter_bytes(chunk_size=65536):
+                            f.write(chunk)
+        return output_path
+
+    async def run(self, pdf_path: str, output_path: str, operation: str, config: Optional[dict] = None) -> str:
+        """Upload -> submit -> wait -> download for one document."""
+        document_id = await self.upload(pdf_path)
+        task_id = await self.submit(operation, document_id, config)
+        result_id = await self.wait(task_id)
+        return await self.download(result_id, output_path)
+
+    # ------------------------------------------
+    # Polling
+    # ------------------------------------------
+
+    async def wait(self, task_id: str) -> str:
+        """Waits for a submitted task; returns its result document id."""
+        pending = _PendingTask(task_id, asyncio.get_running_loop().create_future(), self._clock(), self.poll_initial, self.timeout)
+        self._pending[task_id] = pending
+        FOXIT_TASKS_OUTSTANDING.set(len(self._pending))
+        self._ensure_poller()
+        try:
+            return await pending.future
+        finally:
+            self._forget(pending)
+
+    def _forget(self, pending: _PendingTask):
+        if self._pending.get(pending.task_id) is pending:
+            del self._pending[pending.task_id]
+            FOXIT_TASKS_OUTSTANDING.set(len(self._pending))
+
+    def _ensure_poller(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self):
+        while self._pending:
+            now = self._clock()
+            due = [p for p in self._pending.values() if p.next_poll <= now]
+            if not due:
+                # Sleep until the next task is due, or until a new task arrives
+                wake_at = min(p.next_poll for p in self._pending.values())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wake_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due.sort(key=lambda p: p.next_poll)
+            batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+            await asyncio.gather(*(self._check(batch) for batch in batches))
+
+    async def _check(self, batch: List[_PendingTask]):
+        try:
+            statuses = await self._fetch_statuses([p.task_id for p in batch])
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                self._defer_all(e.response.headers.get("Retry-After"))
+                return
+            print(f"⚠️ Foxit task status check failed (will retry): {e}")
+            statuses = {}
+        except Exception as e:
+            print(f"⚠️ Foxit task status check failed (will retry): {e}")
+            statuses = {}
+
+        now = self._clock()
+        for pending in batch:
+            self._advance(pending, statuses.get(pending.task_id), now)
+
+    async def _fetch_statuses(self, task_ids: List[str]) -> Dict[str, dict]:
+        if self.batch_supported and len(task_ids) > 1:
+            response = await self._request(
+                "GET", "tasks", "task_status", allow=(404, 405, 501), params={"taskIds": ",".join(task_ids)})
+            if response.status_code in (404, 405, 501):
+                print("⚠️ Foxit batch task status unavailable. Polling tasks individually.")
+                self.batch_supported = False
+            else:
+                FOXIT_TASK_STATUS_REQUESTS.inc(mode="batch")
+                return {t.get("taskId"): t for t in response.json().get("tasks", [])}
+
+        async def one(task_id: str) -> dict:
+            FOXIT_TASK_STATUS_REQUESTS.inc(mode="single")
+            return (await self._request("GET", f"tasks/{task_id}", "task_status")).json()
+
+        results = await asyncio.gather(*(one(t) for t in task_ids), return_exceptions=True)
+        for result in results:
+            if isinstance(result, httpx.HTTPStatusError) and result.response.status_code == 429:
+                raise result
+        return {t: r for t, r in zip(task_ids, results) if isinstance(r, dict)}
+
+    def _advance(self, pending: _PendingTask, status: Optional[dict], now: float):
+        pending.polls += 1
+        state = str((status or {}).get("status", "")).upper()
+        if state == "COMPLETED":
+            result_id = status.get("resultDocumentId")
+            if result_id:
+                self._settle(pending, result=result_id)
+            else:
+                self._settle(pending, error=FoxitTaskError(f"Foxit task {pending.task_id} completed without a result document"))
+        elif state == "FAILED":
+            self._settle(pending, error=FoxitTaskError(f"Foxit task {pending.task_id} failed: {status.get('message', 'unknown error')}"))
+        elif now >= pending.deadline:
+            self._settle(pending, error=FoxitTaskError(f"Foxit task {pending.task_id} timed out after {self.timeout:g}s"))
+        else:
+            pending.next_poll = now + self._next_interval(pending, status, now)
+
+    def _next_interval(self, pending: _PendingTask, status: Optional[dict], now: float) -> float:
+        progress = (status or {}).get("progress")
+        if isinstance(progress, (int, float)) and 0 < progress < 100:
+            # Remaining time extrapolated from progress so far
+            remaining = (now - pending.started) * (100 - progress) / progress
+            pending.interval = min(max(remaining, self.poll_initial), self.poll_max)
+            return pending.interval
+        pending.interval = min(pending.interval * self.poll_factor, self.poll_max)
+        return pending.interval * random.uniform(0.8, 1.2)
+
+    def _defer_all(self, retry_after: Optional[str]):
+        try:
+            delay = float(retry_after) if retry_after else self.poll_max
+        except ValueError:
+            delay = self.poll_max
+        print(f"⚠️ Foxit rate limited task polling. Backing off {delay:g}s.")
+        resume_at = self._clock() + delay
+        for pending in self._pending.values():
+            pending.next_poll = max(pending.next_poll, resume_at)
+
+    def _settle(self, pending: _PendingTask, result: Optional[str] = None, error: Optional[Exception] = None):
+        self._forget(pending)
+        if pending.future.done():
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(result)
+
+    async def aclose(self):
+        """Stops polling; outstanding waits fail."""
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        for pending in list(self._pending.values()):
+            self._settle(pending, error=FoxitTaskError("Foxit task engine closed"))
+
+
+class PdfStream:
+    """
+    A finished PDF as it is being produced. `path` is where it is stored
+    (known before the first byte); iterating yields the bytes. With `chunks`
+    None the file is already on disk and can be served as-is. `complete`
+    turns True once every byte has been produced and stored.
+    """
+
+    def __init__(self, path: str, chunks: Optional[AsyncIterator[bytes]] = None):
+        self.path = path
+        self.chunks = chunks
+        self.complete = chunks is None
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.chunks:
+                yield chunk
+            self.complete = True
+        finally:
+            # A consumer that stops early (client gone) discards the partial file
+            await self.chunks.aclose()
+
 
 class FoxitClient:
     def __init__(self):
         self.client_id = FOXIT_CLIENT_ID
         self.client_secret = FOXIT_CLIENT_SECRET
-        self.token = None
-        self.template_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates'))
-        )
-
-    def _get_access_token(self):
-        """Authenticates with Foxit and retrieves a Bearer token."""
-        if not self.client_id or not self.client_secret:
+        self.tokens = FoxitTokenManager(self._fetch_token, self._fetch_token_async)
+        self._async_http = None
+        if not self.has_credentials:
             print("⚠️ Foxit credentials missing. Skipping auth.")
-            return "MOCK_TOKEN"
+        self.template_env = create_template_env()
+        # Large renders run here (None = the loop's default thread pool)
+        self.render_executor: Optional[Executor] = None
+        self.render_thread_threshold = TEMPLATE_THREAD_THRESHOLD_CHARS
+        self.pdf_backends = {
+            "local": LocalPdfBackend(),
+            "foxit": FoxitDocGenBackend(self, FOXIT_DOC_GEN_URL),
+        }
+        self.pdf_backend_mode = PDF_BACKEND
+        self.local_max_html_chars = PDF_LOCAL_MAX_HTML_CHARS
+        self.tasks = FoxitTaskEngine(self)
+        self.enhance_backend = PDF_ENHANCE_BACKEND
 
-        payload = {
+    def _get_async_http(self) -> httpx.AsyncClient:
+        """The shared pooled async client (or one pinned on `_async_http`, e.g. in tests)."""
+        return self._async_http or http_pool.async_client()
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    async def start(self):
+        """Starts background token refresh so auth stays off the request path."""
+        if self.has_credentials:
+            await self.tokens.start()
+
+    async def aclose(self):
+        """Stops token refresh and task polling; closes a pinned async HTTP client."""
+        await self.tasks.aclose()
+        await self.tokens.stop()
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+
+    def _oauth_payload(self) -> dict:
+        return {
             "grant_type": "client_credentials",
             "client_id": self.client_id,
             "client_secret": self.client_secret,
             "scope": "pdf-services"
         }
-        
-        try:
-            response = requests.post(FOXIT_OAUTH_URL, data=payload, timeout=10)
+
+    def _fetch_token(self) -> Tuple[str, Optional[float]]:
+        """Authenticates with Foxit and retrieves a Bearer token + its lifetime."""
+        with track_outbound("foxit", "oauth"):
+            response = http_pool.session.post(FOXIT_OAUTH_URL, data=self._oauth_payload(), timeout=10)
             response.raise_for_status()
-            self.token = response.json().get("access_token")
-            return self.token
+        body = response.json()
+        return body.get("access_token"), body.get("expires_in")
+
+    async def _fetch_token_async(self) -> Tuple[str, Optional[float]]:
+        """Async variant of _fetch_token."""
+        async with track_outbound("foxit", "oauth"):
+            response = await self._get_async_http().post(FOXIT_OAUTH_URL, data=self._oauth_payload(), timeout=10)
+            response.raise_for_status()
+        body = response.json()
+        return body.get("access_token"), body.get("expires_in")
+
+    def get_token(self) -> Optional[str]:
+        """Current Bearer token (MOCK_TOKEN without credentials, None if auth failed)."""
+        if not self.has_credentials:
+            return MOCK_TOKEN
+        return self.tokens.get_token()
+
+    async def get_token_async(self) -> Optional[str]:
+        """Async variant of get_token; never waits while a valid token is cached."""
+        if not self.has_credentials:
+            return MOCK_TOKEN
+        return await self.tokens.get_token_async()
+
+    async def ensure_token_async(self):
+        """Makes sure a token is ready ahead of the render call."""
+        return await self.get_token_async()
+
+    def load_templates(self) -> int:
+        """Loads and compiles every template so the render call does not pay for it."""
+        names = self.template_env.list_templates(extensions=["html"])
+        for name in names:
+            self.template_env.get_template(name)
+        return len(names)
+
+    def warm_templates(self) -> int:
+        """
+        Compiles every template (writing the bytecode cache on first run) and
+        renders each once, so the first real request costs the same as any other.
+        """
+        names = self.template_env.list_templates(extensions=["html"])
+        for name in names:
+            try:
+                self.template_env.get_template(name).render(**warmup_context(os.path.splitext(name)[0]))
+            except Exception as e:
+                print(f"⚠️ Template warmup failed for {name} (Non-blocking): {e}")
+        return len(names)
+
+    def _render_html(self, data: dict, template_name: str) -> str:
+        """Renders the Jinja2 template for a doc type. Returns "" on failure."""
+        try:
+            with track_stage("template_render"):
+                template = self.template_env.get_template(f"{template_name}.html")
+                return template.render(**data)
         except Exception as e:
-            print(f"❌ Foxit Auth Failed: {e}")
+            print(f"❌ Template Rendering Failed: {e}")
+            return ""
+
+    async def _render_html_async(self, data: dict, template_name: str) -> str:
+        """
+        Small documents render inline (a thread hop would cost more than the
+        render); large ones go to `render_executor` to keep the loop responsive.
+        """
+        if context_size(data, self.render_thread_threshold) < self.render_thread_threshold:
+            return self._render_html(data, template_name)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.render_executor, self._render_html, data, template_name)
+
+    def select_pdf_backend(self, html_content: str) -> PdfBackend:
+        """
+        PDF_BACKEND=local/foxit forces a backend; auto renders small documents
+        in-process and sends larger ones to Foxit. Without Foxit credentials
+        everything renders locally.
+        """
+        local, foxit = self.pdf_backends["local"], self.pdf_backends["foxit"]
+        if self.pdf_backend_mode == "local":
+            return local
+        if not foxit.available():
+            if self.pdf_backend_mode == "foxit":
+                print("   [Mock] Foxit API skipped (no keys). Rendering locally.")
+                record_mock_fallback("foxit", "doc_gen")
+            return local
+        if self.pdf_backend_mode == "foxit" or len(html_content) > self.local_max_html_chars:
+            return foxit
+        return local
+
+    def _reuse(self, path: str, kind: str) -> bool:
+        if os.path.exists(path):
+            print(f"♻️ Reusing identical {kind} PDF: {path}")
+            PDF_REUSED.inc(kind=kind)
+            pdf_storage.track(path)
+            return True
+        return False
+
+    def _superseded(self, raw_path: str) -> bool:
+        """
+        True if `raw_path` was rendered before and has since been replaced by
+        its enhanced PDF (PdfStorage.add deletes the raw intermediate). The
+        enhanced name follows from the raw one, so the enhance step will reuse
+        it and rendering again would be wasted.
+        """
+        candidates = [enhanced_pdf_path(raw_path, DEFAULT_ENHANCE_OPTIONS)]
+        if self.enhance_backend == "foxit":
+            candidates.insert(0, enhanced_pdf_path(raw_path, {**DEFAULT_ENHANCE_OPTIONS, "engine": "foxit"}))
+        for path in candidates:
+            if os.path.exists(path):
+                print(f"♻️ Skipping render, enhanced PDF already exists: {path}")
+                PDF_REUSED.inc(kind="raw")
+                return True
+        return False
+
+    def _fallback_backend(self, backend: PdfBackend, e: Exception) -> Optional[PdfBackend]:
+        """In auto mode a failed Foxit render is retried with the local renderer."""
+        print(f"❌ PDF render failed ({backend.name}): {e}")
+        local = self.pdf_backends["local"]
+        if backend is local or self.pdf_backend_mode != "auto":
             return None
+        print("↩️ Falling back to the local PDF renderer.")
+        record_mock_fallback("foxit", "doc_gen")
+        return local
 
     def generate_pdf_from_html(self, data: dict, template_name: str) -> str:
         """
         1. Renders Jinja2 template with data.
-        2. Sends HTML to Foxit Doc Gen API.
-        3. Saves resulting PDF to disk.
+        2. Produces the PDF with the selected backend (Foxit Doc Gen API or the
+           local renderer), skipped if this HTML was rendered before.
+        3. Saves resulting PDF to disk under a content-addressed name.
         """
         # 1. Render Template
-        try:
-            template = self.template_env.get_template(f"{template_name}.html")
-            html_content = template.render(**data)
-        except Exception as e:
-            print(f"❌ Template Rendering Failed: {e}")
+        html_content = self._render_html(data, template_name)
+        if not html_content:
             return ""
 
-        # 2. Call Foxit API
-        if not self.token:
-            self._get_access_token()
+        # 2. Render PDF
+        backend = self.select_pdf_backend(html_content)
+        while backend:
+            output_path = raw_pdf_path(template_name, html_content, backend.engine)
+            if self._reuse(output_path, "raw") or self._superseded(output_path):
+                return output_path
 
-        output_path = f"output/{template_name}_generated.pdf"
-        os.makedirs("output", exist_ok=True)
+            print(f"📄 Rendering PDF with {backend.name} backend ({len(html_content)} bytes of HTML)...")
+            try:
+                with track_stage(f"pdf_{backend.name}"):
+                    backend.render(html_content, data, output_path)
+                PDF_RENDERS.inc(backend=backend.name)
+                pdf_storage.add(output_path)
+                return output_path
+            except Exception as e:
+                backend = self._fallback_backend(backend, e)
+        return ""
 
-        print(f"📄 Sending HTML to Foxit Doc Gen API ({len(html_content)} bytes)...")
-        
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "html": html_content,
-            "engine": "blink" # Uses Chrome rendering engine
-        }
+    async def generate_pdf_from_html_async(self, data: dict, template_name: str) -> str:
+        """
+        Async variant of generate_pdf_from_html. The Doc Gen response is
+        streamed to disk without blocking the event loop on the network.
+        """
+        html_content = await self._render_html_async(data, template_name)
+        if not html_content:
+            return ""
+
+        backend = self.select_pdf_backend(html_content)
+        while backend:
+            output_path = raw_pdf_path(template_name, html_content, backend.engine)
+            if self._reuse(output_path, "raw") or self._superseded(output_path):
+                return output_path
+
+            print(f"📄 Rendering PDF with {backend.name} backend ({len(html_content)} bytes of HTML)...")
+            try:
+                async with track_stage(f"pdf_{backend.name}"):
+                    await backend.render_async(html_content, data, output_path)
+                PDF_RENDERS.inc(backend=backend.name)
+                pdf_storage.add(output_path)
+                return output_path
+            except Exception as e:
+                backend = self._fallback_backend(backend, e)
+        return ""
+
+    async def stream_pdf_async(self, data: dict, template_name: str, options: dict = None) -> Optional[PdfStream]:
+        """
+        Renders and enhances a document while its bytes are relayed to the
+        caller: each chunk from the backend is written to the enhanced file
+        and yielded in the same step, then the enhancement update is appended
+        to both. Nothing is read back or copied, and the file ends up exactly
+        where enhance_pdf would have put it. Enhancement is always the local
+        incremental update (it can follow the bytes; a Foxit task cannot).
+
+        Backend failures before the first byte fall back like
+        generate_pdf_from_html_async; a failure mid-stream aborts it and
+        discards the partial file. Returns None if nothing could be rendered.
+        """
+        html_content = await self._render_html_async(data, template_name)
+        if not html_content:
+            return None
+
+        options = {**DEFAULT_ENHANCE_OPTIONS, **(options or {})}
+        backend = self.select_pdf_backend(html_content)
+        while backend:
+            output_path = enhanced_pdf_path(raw_pdf_path(template_name, html_content, backend.engine), options)
+            if self._reuse(output_path, "enhanced"):
+                return PdfStream(output_path)
+
+            print(f"📄 Streaming PDF from {backend.name} backend ({len(html_content)} bytes of HTML)...")
+            chunks = backend.stream_async(html_content, data)
+            try:
+                first = await chunks.__anext__()
+            except Exception as e:
+                await chunks.aclose()
+                if isinstance(e, StopAsyncIteration):
+                    e = RuntimeError("empty PDF response")
+                backend = self._fallback_backend(backend, e)
+                continue
+            return PdfStream(output_path, self._tee_async(backend, first, chunks, output_path, options))
+        return None
 
+    async def _tee_async(self, backend: PdfBackend, first: bytes, chunks: AsyncIterator[bytes], output_path: str, options: dict) -> AsyncIterator[bytes]:
         try:
-            # REAL API CALL (Commented out if no credentials)
-            if self.token and self.token != "MOCK_TOKEN":
-                response = requests.post(FOXIT_DOC_GEN_URL, json=payload, headers=headers, stream=True)
-                response.raise_for_status()
-                with open(output_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            else:
-                # MOCK: Just write dummy PDF if no keys
-                print("   [Mock] Foxit API skipped (no keys). Writing dummy PDF.")
-                with open(output_path, "wb") as f:
-                    f.write(b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n...")
-            
-            return output_path
+            with atomic_writer(output_path) as f:
+                f.write(first)
+                yield first
+                async for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+                PDF_RENDERS.inc(backend=backend.name)
 
-        except Exception as e:
-            print(f"❌ Foxit Generation Failed: {e}")
-            return ""
+                # The reader only touches the xref and page objects just written
+                async with track_stage("pdf_enhance"):
+                    update = await asyncio.to_thread(enhancement_update, f, options)
+                PDF_ENHANCEMENTS.inc(mode="incremental" if update else "copy")
+                if update:
+                    f.seek(0, os.SEEK_END)
+                    f.write(update)
+        finally:
+            await chunks.aclose()
+
+        # Stored before the last bytes go out, so /download works once the client has them all
+        pdf_storage.add(output_path)
+        if update:
+            yield update
 
     def enhance_pdf(self, pdf_path: str, options: dict = None) -> str:
         """
-        Uploads PDF to Foxit PDF Services to add watermarks, etc.
+        Adds the watermark, page numbers and metadata in `options` as one
+        incremental update appended to a streamed copy of the PDF (see
+        services/pdf_enhance.py). The result is named by the input's content
+        hash plus the options, so repeated enhancements of the same PDF are reused.
         """
-        if not os.path.exists(pdf_path):
+        # A content-addressed raw PDF may already be gone (superseded by its
+        # enhanced version); its enhanced path is still known from the name
+        if not (os.path.exists(pdf_path) or is_content_addressed(pdf_path)):
             return pdf_path
 
-        enhanced_path = pdf_path.replace(".pdf", "_enhanced.pdf")
-        
-        print(f"✨ Enhancing PDF with Foxit Services...")
-
-        if not self.token:
-            self._get_access_token()
-
-        headers = {
-            "Authorization": f"Bearer {self.token}"
-        }
+        options = {**DEFAULT_ENHANCE_OPTIONS, **(options or {})}
+        enhanced_path = enhanced_pdf_path(pdf_path, options)
+        if self._reuse(enhanced_path, "enhanced"):
+            return enhanced_path
+        if not os.path.exists(pdf_path):
+            return pdf_path
 
-        # Mocking implementation for now as actual endpoints vary by exact service subscription
-        # Real implementation would be:
-        # 1. Upload file -> Get Task ID
-        # 2. Poll Task Status
-        # 3. Download Result
-        
-        # Simulating enhancement by copying
+        print(f"✨ Enhancing PDF ({', '.join(k for k, v in options.items() if v)})...")
         try:
-            with open(pdf_path, "rb") as f_in, open(enhanced_path, "wb") as f_out:
-                f_out.write(f_in.read())
-            print(f"   [Foxit] Watermark applied: 'CONFIDENTIAL'")
+            with track_stage("pdf_enhance"):
+                applied = enhance_file(pdf_path, enhanced_path, options)
+            PDF_ENHANCEMENTS.inc(mode="incremental" if applied else "copy")
+            pdf_storage.add(enhanced_path)
+            if applied and options.get("watermark"):
+                print(f"   Watermark applied: '{options['watermark']}'")
             return enhanced_path
         except Exception as e:
              print(f"❌ Enhancement Failed: {e}")
              return pdf_path
 
+    async def enhance_pdf_async(self, pdf_path: str, options: dict = None) -> str:
+        """
+        Async variant of enhance_pdf. Local enhancement is file work, so it
+        runs in a worker thread; with PDF_ENHANCE_BACKEND=foxit the document
+        goes through the Foxit task engine instead (local on failure).
+        """
+        if self.enhance_backend == "foxit" and self.has_credentials and (os.path.exists(pdf_path) or is_content_addressed(pdf_path)):
+            options = {**DEFAULT_ENHANCE_OPTIONS, **(options or {})}
+            enhanced_path = enhanced_pdf_path(pdf_path, {**options, "engine": "foxit"})
+            if self._reuse(enhanced_path, "enhanced"):
+                return enhanced_path
+            if os.path.exists(pdf_path):
+                print(f"✨ Enhancing PDF with Foxit PDF Services ({self.tasks.outstanding} tasks outstanding)...")
+                try:
+                    async with track_stage("pdf_enhance_foxit"):
+                        await self.tasks.run(pdf_path, enhanced_path, FOXIT_ENHANCE_OPERATION, options)
+                    PDF_ENHANCEMENTS.inc(mode="foxit")
+                    pdf_storage.add(enhanced_path)
+                    return enhanced_path
+                except Exception as e:
+                    print(f"❌ Foxit enhancement failed, enhancing locally: {e}")
+                    record_mock_fallback("foxit", "enhance")
+        return await asyncio.to_thread(self.enhance_pdf, pdf_path, options)
+
 # Singleton instance
 foxit_client = FoxitClient()
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.config import (
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF_SECONDS,
+)
+from core.metrics import HTTP_POOL_CONNECTIONS, HTTP_POOL_REQUESTS
+
+# ==========================================
+# 🔌 Shared, pooled HTTP clients
+# ==========================================
+# Every service client (Foxit, Sanity, Deepgram) goes through one sync
+# requests.Session and one httpx.AsyncClient per event loop, so calls to the
+# same host reuse a warm keep-alive connection instead of paying a TCP+TLS
+# handshake each time.
+#
+# Idempotent requests (GET/HEAD/PUT/DELETE/OPTIONS) are retried on connection
+# errors and 429/502/503/504 with exponential backoff plus jitter; POSTs are
+# never retried automatically.
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 10.0) -> float:
+    """Exponential backoff with jitter: base * 2^attempt, +/- 50%."""
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies default (connect, read) timeouts when a call sets none."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        HTTP_POOL_REQUESTS.inc(client="sync")
+        return super().send(request, **kwargs)
+
+
+class _RetryingAsyncTransport(httpx.AsyncHTTPTransport):
+    """httpx transport that retries idempotent requests like the sync Retry policy."""
+
+    def __init__(self, retries: int, backoff: float, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = retries
+        self.backoff = backoff
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        HTTP_POOL_REQUESTS.inc(client="async")
+        retryable = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            try:
+                response = await super().handle_async_request(request)
+            except httpx.TransportError:
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                if not retryable or attempt >= self.retries or response.status_code not in RETRY_STATUSES:
+                    return response
+                # Drain the body so the connection goes back to the pool instead of being dropped
+                await response.aread()
+                await response.aclose()
+            await asyncio.sleep(backoff_delay(attempt, self.backoff))
+            attempt += 1
+
+
+class HttpPool:
+    """
+    Owns the pooled clients. `session` is a plain requests.Session (thread
+    safe for concurrent requests); `async_client()` returns the httpx client
+    bound to the running event loop.
+    """
+
+    def __init__(
+        self,
+        hosts: int = HTTP_POOL_HOSTS,
+        per_host: int = HTTP_POOL_MAXSIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        read_timeout: float = HTTP_READ_TIMEOUT_SECONDS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_RETRY_BACKOFF_SECONDS,
+    ):
+        self.hosts = hosts
+        self.per_host = per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_expiry = keepalive_expiry
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self.session = self._new_session()
+
+    def _new_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            backoff_jitter=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _TimeoutHTTPAdapter(
+            timeout=(self.connect_timeout, self.read_timeout),
+            pool_connections=self.hosts,
+            pool_maxsize=self.per_host,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def async_client(self) -> httpx.AsyncClient:
+        """The pooled async client for the running event loop (created on first use)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                limits = httpx.Limits(
+                    max_connections=self.hosts * self.per_host,
+                    max_keepalive_connections=self.hosts * self.per_host,
+                    keepalive_expiry=self.keepalive_expiry,
+                )
+                transport = _RetryingAsyncTransport(self.retries, self.backoff, limits=limits)
+                timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+                client = httpx.AsyncClient(transport=transport, timeout=timeout)
+                self._async_clients[loop] = client
+            return client
+
+    async def close(self):
+        """
+        Releases pooled connections (app shutdown): the running loop's async
+        client and the sync session, which is replaced so the pool stays usable.
+        """
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+        self.session.close()
+        self.session = self._new_session()
+
+    def _sync_stats(self) -> Dict[str, Dict[str, int]]:
+        hosts: Dict[str, Dict[str, int]] = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                # The queue is pre-filled with None slots; only real connections are idle ones
+                free = getattr(pool, "pool", None)
+                queue = getattr(free, "queue", None)
+                hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    "connections_opened": getattr(pool, "num_connections", 0),
+                    "requests": getattr(pool, "num_requests", 0),
+                    "idle": sum(1 for conn in list(queue) if conn is not None) if queue is not None else 0,
+                    "max_size": getattr(free, "maxsize", 0),
+                }
+        return hosts
+
+    def _async_stats(self) -> Dict[str, Dict[str, int]]:
+        hosts: Dict[str, Dict[str, int]] = {}
+        for client in list(self._async_clients.values()):
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            for connection in list(getattr(pool, "connections", None) or []):
+                origin = getattr(connection, "_origin", None)
+                if origin is None:
+                    continue
+                host = f"{origin.scheme.decode()}://{origin.host.decode()}:{origin.port}"
+                entry = hosts.setdefault(host, {"connections": 0, "idle": 0})
+                entry["connections"] += 1
+                entry["idle"] += int(connection.is_idle())
+        return hosts
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-host connection pool utilization for both clients. This reads
+        urllib3/httpcore internals, so a client whose internals look
+        different is reported as empty instead of failing the caller.
+        """
+        stats: Dict[str, Any] = {"limits": {"hosts": self.hosts, "per_host": self.per_host}}
+        for name, collect in (("sync", self._sync_stats), ("async", self._async_stats)):
+            try:
+                stats[name] = collect()
+            except Exception as e:
+                print(f"⚠️ HTTP pool {name} stats unavailable (Non-blocking): {e}")
+                stats[name] = {}
+        return stats
+
+    def publish_metrics(self):
+        """Copies `stats()` into the connection gauges (called before a /metrics scrape)."""
+        stats = self.stats()
+        for host, entry in stats["sync"].items():
+            HTTP_POOL_CONNECTIONS.set(entry["idle"], client="sync", host=host, state="idle")
+            HTTP_POOL_CONNECTIONS.set(entry["connections_opened"], client="sync", host=host, state="opened")
+        for host, entry in stats["async"].items():
+            HTTP_POOL_CONNECTIONS.set(entry["idle"], client="async", host=host, state="idle")
+            HTTP_POOL_CONNECTIONS.set(entry["connections"], client="async", host=host, state="open")
+
+
+# Singleton instance
+http_pool = HttpPool()
@@ -1,45 +1,198 @@
 import os
+import re
 import json
-from openai import OpenAI
-from core.config import OPENAI_API_KEY
+import math
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from openai import OpenAI, AsyncOpenAI
+from typing import Optional, Tuple, AsyncIterator, List
+from core.config import (
+    OPENAI_API_KEY,
+    LLM_MODEL,
+    LLM_CHUNK_THRESHOLD_CHARS,
+    LLM_CHUNK_MAX_CHARS,
+    LLM_CHUNK_CONCURRENCY,
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_THRESHOLD,
+)
+from core.chunking import split_text, merge_structured, chunk_summaries, SUMMARY_FIELDS
+from core.doc_types import DocumentType, parse_doc_type
+from core.metrics import track_outbound, record_mock_fallback, CLASSIFIER_DECISIONS
+
+
+class LocalDocumentClassifier:
+    """
+    In-process bag-of-words classifier for the obvious cases.
+    Weighted unigram/bigram signals per doc type (drawn from the examples in
+    AI_AGENT_DESIGN.md) form a small linear model; scores are turned into a
+    confidence with a softmax against a fixed "general" baseline, so weak or
+    mixed signals stay low and get escalated.
+    """
+
+    # How much text to look at. Signals live near the top of real inputs.
+    MAX_CHARS = 2000
+    # Score the "general" class gets for free; the winner has to beat it.
+    BASELINE = 2.0
+
+    TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+    # token or "bigram phrase" -> weight
+    SIGNALS = {
+        DocumentType.MEETING_NOTES: {
+            "meeting": 2.0, "agenda": 2.0, "attendees": 2.5, "attendee": 2.5,
+            "action items": 2.5, "action item": 2.5, "minutes": 1.5,
+            "sync": 1.5, "standup": 1.5, "retro": 1.5, "retrospective": 1.5,
+            "discussed": 1.2, "agreed": 1.2, "decided": 1.2, "key decisions": 2.0,
+            "speaker": 1.5, "to email": 1.0, "follow up": 1.0, "will review": 1.0,
+            "monday": 0.5, "tuesday": 0.5, "wednesday": 0.5, "thursday": 0.5, "friday": 0.5,
+        },
+        DocumentType.PRD: {
+            "prd": 3.0, "product requirements": 3.0, "functional requirements": 2.5,
+            "requirements": 1.2, "requirement": 1.2, "user stories": 2.5, "user story": 2.5,
+            "i want": 1.5, "problem statement": 2.5, "acceptance criteria": 2.5,
+            "mvp": 1.2, "milestones": 1.2, "roadmap": 1.2, "scope": 1.2,
+            "feature": 1.0, "features": 1.0, "latency": 0.8, "uptime": 0.8,
+            "compliant": 0.8, "goals": 0.8, "goal": 0.8,
+        },
+        DocumentType.CODE_DOCS: {
+            "def": 3.0, "class": 1.5, "import": 1.5, "function": 1.5, "functions": 1.5,
+            "module": 1.5, "returns": 1.2, "return": 1.0, "params": 1.2, "parameters": 1.2,
+            "argument": 1.2, "arguments": 1.2, "raises": 1.2, "throws": 1.2, "exception": 1.0,
+            "int": 0.8, "str": 0.8, "float": 0.8, "dict": 0.8, "bool": 0.8, "boolean": 0.8,
+            "usage example": 1.0, "api": 0.6, "endpoint": 0.6,
+        },
+    }
+
+    # Raw substrings that tokenisation would lose
+    CODE_MARKERS = {"```": 2.0, "->": 1.0, "=>": 1.0, "::": 1.0, "()": 1.0}
+
+    def __init__(self):
+        self._weights = {}
+        for doc_type, signals in self.SIGNALS.items():
+            for feature, weight in signals.items():
+                self._weights.setdefault(feature, []).append((doc_type, weight))
+
+    def scores(self, text: str) -> dict:
+        text = text[:self.MAX_CHARS]
+        tokens = self.TOKEN_RE.findall(text.lower())
+
+        counts = {}
+        for feature in tokens:
+            counts[feature] = counts.get(feature, 0) + 1
+        for first, second in zip(tokens, tokens[1:]):
+            feature = f"{first} {second}"
+            if feature in self._weights:
+                counts[feature] = counts.get(feature, 0) + 1
+
+        scores = {doc_type: 0.0 for doc_type in self.SIGNALS}
+        for feature, hits in counts.items():
+            for doc_type, weight in self._weights.get(feature, ()):
+                # Diminishing returns for repeated hits of the same signal
+                scores[doc_type] += weight * (1 + math.log(hits))
+
+        # snake_case identifiers and code punctuation
+        snake = sum(1 for token in tokens if "_" in token.strip("_"))
+        if snake:
+            scores[DocumentType.CODE_DOCS] += 0.8 * (1 + math.log(snake))
+        for marker, weight in self.CODE_MARKERS.items():
+            if marker in text:
+                scores[DocumentType.CODE_DOCS] += weight
+        return scores
+
+    def classify(self, text: str) -> Tuple[DocumentType, float]:
+        """Returns (best doc type, confidence in [0, 1])."""
+        scores = self.scores(text)
+        best = max(scores, key=scores.get)
+        top = max(scores[best], self.BASELINE)
+        denominator = math.exp(self.BASELINE - top) + sum(math.exp(s - top) for s in scores.values())
+        return best, math.exp(scores[best] - top) / denominator
+
+
+# Operations that fell back to mock output in the current request. The list
+# is shared by reference with tasks and threads started from the context, so
+# a pipeline sees fallbacks from any of its stages (see track_fallbacks).
+_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("llm_fallbacks", default=None)
+
+
+def track_fallbacks() -> List[str]:
+    """
+    Starts collecting LLM fallbacks for the current context and returns the
+    list they are appended to. A result built while it is non-empty came
+    (partly) from mock data and must not be cached.
+    """
+    fallbacks: List[str] = []
+    _fallbacks.set(fallbacks)
+    return fallbacks
+
 
 class LLMService:
     def __init__(self):
+        self.local_classifier = LocalDocumentClassifier() if LOCAL_CLASSIFIER_ENABLED else None
+        self.local_threshold = LOCAL_CLASSIFIER_THRESHOLD
+        self._classifier_counts = {"local": 0, "remote": 0}
+        self._counts_lock = threading.Lock()
+
         self.api_key = OPENAI_API_KEY
         if not self.api_key:
             print("⚠️ OpenAI API Key missing. LLM features will fail.")
             self.client = None
+            self.async_client = None
         else:
             self.client = OpenAI(api_key=self.api_key)
+            self.async_client = AsyncOpenAI(api_key=self.api_key)
 
-    def classify_text(self, text: str) -> str:
-        """
-        Classifies input text into one of: 'meeting_notes', 'prd', 'code_docs'.
-        """
-        if not self.client:
-            return "general"
+    def _classify_messages(self, text: str) -> list:
+        return [
+            {"role": "system", "content": "You are a classifier. Output ONLY one of these strings: 'meeting_notes', 'prd', 'code_docs'. If unsure, 'general'."},
+            {"role": "user", "content": f"Classify this text:\n\n{text[:1000]}"}
+        ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a classifier. Output ONLY one of these strings: 'meeting_notes', 'prd', 'code_docs'. If unsure, 'general'."},
-                    {"role": "user", "content": f"Classify this text:\n\n{text[:1000]}"}
-                ],
-                temperature=0.0
-            )
-            return response.choices[0].message.content.strip().lower()
-        except Exception as e:
-            print(f"❌ LLM Classification Failed: {e}")
-            print("⚠️ Falling back to mock classification: 'meeting_notes'")
-            return "meeting_notes"
+    def _structure_messages(self, text: str, doc_type: str) -> list:
+        from core.prompts import SYSTEM_PROMPT
 
-    def structure_text(self, text: str, doc_type: str) -> dict:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"DOCUMENT TYPE: {doc_type}\n\nINPUT TEXT:\n{text}"}
+        ]
+
+    def _single_pass_messages(self, text: str) -> list:
+        from core.prompts import SYSTEM_PROMPT, SINGLE_PASS_INSTRUCTION
+
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": SINGLE_PASS_INSTRUCTION.format(raw_text=text)}
+        ]
+
+    def _parse_single_pass(self, content: str) -> Optional[dict]:
         """
-        Extracts structured data from text based on doc_type.
+        Validates a single-pass answer. Returns None (ambiguous) unless the
+        doc_type maps onto DocumentType and a content object is present.
         """
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        doc_type = parse_doc_type(data.get("doc_type"))
+        if doc_type is None or not isinstance(data.get("content"), dict) or not data["content"]:
+            return None
+        return {"doc_type": doc_type, "structured_data": data}
+
+    @staticmethod
+    def _record_fallback(operation: str):
+        record_mock_fallback("openai", operation)
+        fallbacks = _fallbacks.get()
+        if fallbacks is not None:
+            fallbacks.append(operation)
+
+    def mock_structured_data(self, doc_type: str) -> dict:
+        self._record_fallback("structure")
         # Mock Data for Fallback
-        mock_data = {
+        return {
             "title": "Meeting Sync (Mock)",
             "date": "Oct 27, 2026",
             "doc_type": doc_type,
@@ -52,28 +205,361 @@ class LLMService:
             "key_decisions": ["Delayed Dark Mode release"]
         }
 
+    def _count_classification(self, route: str):
+        with self._counts_lock:
+            self._classifier_counts[route] += 1
+        CLASSIFIER_DECISIONS.inc(route=route)
+
+    def classifier_stats(self) -> dict:
+        """Local fast-path vs LLM escalation counters."""
+        with self._counts_lock:
+            local = self._classifier_counts["local"]
+            remote = self._classifier_counts["remote"]
+        total = local + remote
+        return {
+            "local": local,
+            "remote": remote,
+            "local_hit_rate": round(local / total, 4) if total else 0.0,
+            "threshold": self.local_threshold,
+        }
+
+    def classify_locally(self, text: str) -> Optional[str]:
+        """
+        Fast path: returns a DocumentType value when the local classifier is
+        confident enough, otherwise None (the caller escalates to the LLM).
+        """
+        if not self.local_classifier:
+            self._count_classification("remote")
+            return None
+
+        doc_type, confidence = self.local_classifier.classify(text)
+        if confidence >= self.local_threshold:
+            print(f"⚡ Local classifier: {doc_type.value} ({confidence:.2f})")
+            self._count_classification("local")
+            return doc_type.value
+
+        print(f"🔼 Local classifier unsure ({doc_type.value} {confidence:.2f}). Escalating to LLM.")
+        self._count_classification("remote")
+        return None
+
+    def classify_text(self, text: str, use_local: bool = True) -> str:
+        """
+        Classifies input text into one of: 'meeting_notes', 'prd', 'code_docs'.
+        Obvious cases are decided locally; pass use_local=False to go straight to the LLM.
+        """
+        if use_local:
+            local = self.classify_locally(text)
+            if local:
+                return local
+
         if not self.client:
-            return mock_data
+            return "general"
 
-        from core.prompts import SYSTEM_PROMPT
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"DOCUMENT TYPE: {doc_type}\n\nINPUT TEXT:\n{text}"}
-                ],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
+            with track_outbound("openai", "classify"):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._classify_messages(text),
+                    temperature=0.0
+                )
+            return response.choices[0].message.content.strip().lower()
+        except Exception as e:
+            print(f"❌ LLM Classification Failed: {e}")
+            print("⚠️ Falling back to mock classification: 'meeting_notes'")
+            self._record_fallback("classify")
+            return "meeting_notes"
+
+    async def classify_text_async(self, text: str, use_local: bool = True) -> str:
+        """
+        Async variant of classify_text using the AsyncOpenAI client.
+        """
+        if use_local:
+            local = self.classify_locally(text)
+            if local:
+                return local
+
+        if not self.async_client:
+            return "general"
+
+        try:
+            async with track_outbound("openai", "classify"):
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._classify_messages(text),
+                    temperature=0.0
+                )
+            return response.choices[0].message.content.strip().lower()
+        except Exception as e:
+            print(f"❌ LLM Classification Failed: {e}")
+            print("⚠️ Falling back to mock classification: 'meeting_notes'")
+            self._record_fallback("classify")
+            return "meeting_notes"
+
+    def needs_chunking(self, text: str) -> bool:
+        """True when text is long enough to be structured with map-reduce."""
+        return len(text) > LLM_CHUNK_THRESHOLD_CHARS
+
+    def _chunk_messages(self, text: str, doc_type: str, index: int, total: int) -> list:
+        from core.prompts import SYSTEM_PROMPT, CHUNK_INSTRUCTION
+
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": CHUNK_INSTRUCTION.format(doc_type=doc_type, index=index, total=total, raw_text=text)}
+        ]
+
+    def _summary_messages(self, summaries: List[str], doc_type: str) -> list:
+        from core.prompts import SUMMARY_PROMPT
+
+        parts = "\n\n".join(f"PART {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT.format(doc_type=doc_type)},
+            {"role": "user", "content": parts}
+        ]
+
+    def _reduce_chunks(self, parts: List[Optional[dict]], doc_type: str, summary: Optional[str]) -> dict:
+        failed = sum(1 for part in parts if not part)
+        parts = [part for part in parts if part]
+        if parts and failed:
+            # Merged from the chunks that made it; the document is incomplete
+            self._record_fallback("structure_chunk")
+        if not parts:
+            print("⚠️ All chunks failed. Falling back to mock structured data.")
+            return self.mock_structured_data(doc_type)
+
+        merged = merge_structured(parts, doc_type)
+        summaries = chunk_summaries(parts, doc_type)
+        if summary is None and summaries:
+            summary = "\n\n".join(summaries)
+        if summary:
+            merged["content"][SUMMARY_FIELDS.get(doc_type, "summary")] = summary
+        return merged
+
+    def _structure_chunk(self, text: str, doc_type: str, index: int, total: int) -> Optional[dict]:
+        try:
+            with track_outbound("openai", "structure_chunk"):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._chunk_messages(text, doc_type, index, total),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+            return json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ LLM Chunk {index}/{total} Failed: {e}")
+            return None
+
+    async def _structure_chunk_async(self, text: str, doc_type: str, index: int, total: int) -> Optional[dict]:
+        try:
+            async with track_outbound("openai", "structure_chunk"):
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._chunk_messages(text, doc_type, index, total),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+            return json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ LLM Chunk {index}/{total} Failed: {e}")
+            return None
+
+    def _summarize(self, summaries: List[str], doc_type: str) -> Optional[str]:
+        try:
+            with track_outbound("openai", "summarize"):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._summary_messages(summaries, doc_type),
+                    temperature=0.1
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"❌ LLM Summary Pass Failed: {e}")
+            return None
+
+    async def _summarize_async(self, summaries: List[str], doc_type: str) -> Optional[str]:
+        try:
+            async with track_outbound("openai", "summarize"):
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._summary_messages(summaries, doc_type),
+                    temperature=0.1
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"❌ LLM Summary Pass Failed: {e}")
+            return None
+
+    def structure_text_chunked(self, text: str, doc_type: str) -> dict:
+        """
+        Map-reduce structuring for long inputs: chunks on speaker/paragraph
+        boundaries are structured concurrently, merged deterministically,
+        then one final call writes the summary from the chunk summaries.
+        """
+        chunks = split_text(text, LLM_CHUNK_MAX_CHARS)
+        total = len(chunks)
+        print(f"✂️ Structuring {total} chunks ({len(text)} chars)...")
+
+        with ThreadPoolExecutor(max_workers=max(1, LLM_CHUNK_CONCURRENCY)) as pool:
+            parts = list(pool.map(
+                lambda item: self._structure_chunk(item[1], doc_type, item[0], total),
+                enumerate(chunks, 1),
+            ))
+
+        summaries = chunk_summaries([part for part in parts if part], doc_type)
+        summary = self._summarize(summaries, doc_type) if len(summaries) > 1 else None
+        return self._reduce_chunks(parts, doc_type, summary)
+
+    async def structure_text_chunked_async(self, text: str, doc_type: str) -> dict:
+        """
+        Async variant of structure_text_chunked.
+        """
+        chunks = split_text(text, LLM_CHUNK_MAX_CHARS)
+        total = len(chunks)
+        print(f"✂️ Structuring {total} chunks ({len(text)} chars)...")
+
+        semaphore = asyncio.Semaphore(max(1, LLM_CHUNK_CONCURRENCY))
+
+        async def run(index: int, chunk: str) -> Optional[dict]:
+            async with semaphore:
+                return await self._structure_chunk_async(chunk, doc_type, index, total)
+
+        parts = await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks, 1)))
+
+        summaries = chunk_summaries([part for part in parts if part], doc_type)
+        summary = await self._summarize_async(summaries, doc_type) if len(summaries) > 1 else None
+        return self._reduce_chunks(parts, doc_type, summary)
+
+    def structure_text(self, text: str, doc_type: str) -> dict:
+        """
+        Extracts structured data from text based on doc_type.
+        Long inputs are structured in chunks (see structure_text_chunked).
+        """
+        if not self.client:
+            return self.mock_structured_data(doc_type)
+
+        if self.needs_chunking(text):
+            return self.structure_text_chunked(text, doc_type)
+
+        try:
+            with track_outbound("openai", "structure"):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._structure_messages(text, doc_type),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+            content = response.choices[0].message.content
+            return json.loads(content)
+        except Exception as e:
+            print(f"❌ LLM Structuring Failed: {e}")
+            print("⚠️ Falling back to mock structured data.")
+            return self.mock_structured_data(doc_type)
+
+    async def structure_text_async(self, text: str, doc_type: str) -> dict:
+        """
+        Async variant of structure_text using the AsyncOpenAI client.
+        """
+        if not self.async_client:
+            return self.mock_structured_data(doc_type)
+
+        if self.needs_chunking(text):
+            return await self.structure_text_chunked_async(text, doc_type)
+
+        try:
+            async with track_outbound("openai", "structure"):
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._structure_messages(text, doc_type),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
             content = response.choices[0].message.content
             return json.loads(content)
         except Exception as e:
             print(f"❌ LLM Structuring Failed: {e}")
             print("⚠️ Falling back to mock structured data.")
-            return mock_data
+            return self.mock_structured_data(doc_type)
+
+    async def stream_structure_text_async(self, text: str, doc_type: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Streams the structured JSON as the model generates it (text deltas).
+        Without a doc_type the single-pass prompt is used and the model emits
+        doc_type itself. Falls back to the mock JSON if the call fails before
+        producing any output; output cut off later is recorded as a fallback
+        (the caller keeps what was complete).
+        """
+        messages = self._structure_messages(text, doc_type) if doc_type else self._single_pass_messages(text)
+        fallback_type = doc_type or "general"
+
+        if not self.async_client:
+            yield json.dumps(self.mock_structured_data(fallback_type))
+            return
+
+        produced = False
+        try:
+            async with track_outbound("openai", "stream"):
+                stream = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    temperature=0.1,
+                    response_format={"type": "json_object"},
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        produced = True
+                        yield delta
+        except Exception as e:
+            print(f"❌ LLM Streaming Failed: {e}")
+            if not produced:
+                print("⚠️ Falling back to mock structured data.")
+                yield json.dumps(self.mock_structured_data(fallback_type))
+            else:
+                self._record_fallback("structure_stream")
+
+    def classify_and_structure(self, text: str) -> Optional[dict]:
+        """
+        Single round trip returning {"doc_type": DocumentType, "structured_data": dict}.
+        Returns None when the answer is ambiguous so callers can fall back
+        to classify_text + structure_text.
+        """
+        if not self.client:
+            return None
+
+        try:
+            with track_outbound("openai", "single_pass"):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._single_pass_messages(text),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+            return self._parse_single_pass(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ LLM Single-Pass Failed: {e}")
+            return None
+
+    async def classify_and_structure_async(self, text: str) -> Optional[dict]:
+        """
+        Async variant of classify_and_structure.
+        """
+        if not self.async_client:
+            return None
+
+        try:
+            async with track_outbound("openai", "single_pass"):
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._single_pass_messages(text),
+                    temperature=0.1,
+                    response_format={"type": "json_object"}
+                )
+            return self._parse_single_pass(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ LLM Single-Pass Failed: {e}")
+            return None
 
 # Singleton
 llm_service = LLMService()
-
@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, TYPE_CHECKING
+
+from core.metrics import track_outbound
+from core.pdf_store import atomic_writer
+from services.pdf_local import LocalPdfRenderer
+from services.http import http_pool
+
+if TYPE_CHECKING:
+    from services.foxit import FoxitClient
+
+# ==========================================
+# 🖨 PDF backends (HTML/context -> PDF file)
+# ==========================================
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class PdfBackendError(Exception):
+    """Raised when a backend cannot produce the PDF."""
+
+
+class PdfBackend:
+    """
+    Writes the PDF for one rendered document to `output_path` (atomically).
+    `engine` is part of the output's content address, so files produced by
+    different backends never shadow each other.
+    """
+
+    name = ""
+    engine = ""
+
+    def available(self) -> bool:
+        return True
+
+    def render(self, html: str, context: Dict[str, Any], output_path: str):
+        raise NotImplementedError
+
+    async def render_async(self, html: str, context: Dict[str, Any], output_path: str):
+        await asyncio.to_thread(self.render, html, context, output_path)
+
+    def stream_async(self, html: str, context: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Yields the PDF bytes as the backend produces them (nothing is written)."""
+        raise NotImplementedError
+
+
+class LocalPdfBackend(PdfBackend):
+    """In-process layout of the template context; no network round trip."""
+
+    name = "local"
+    engine = "local-v1"
+
+    def __init__(self):
+        self.renderer = LocalPdfRenderer()
+
+    def render(self, html: str, context: Dict[str, Any], output_path: str):
+        pdf = self.renderer.render(context)
+        with atomic_writer(output_path) as f:
+            f.write(pdf)
+
+    async def stream_async(self, html: str, context: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """The layout is built in one piece (off the loop), then handed out in chunks."""
+        pdf = await asyncio.to_thread(self.renderer.render, context)
+        for start in range(0, len(pdf), STREAM_CHUNK_BYTES):
+            yield pdf[start:start + STREAM_CHUNK_BYTES]
+
+
+class FoxitDocGenBackend(PdfBackend):
+    """Foxit Doc Gen API (Chrome/blink rendering of the Jinja HTML)."""
+
+    name = "foxit"
+    engine = "foxit-blink"
+
+    def __init__(self, client: "FoxitClient", url: str):
+        self.client = client
+        self.url = url
+
+    def available(self) -> bool:
+        return self.client.has_credentials
+
+    def _request(self, html: str, token: str):
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "html": html,
+            "engine": "blink" # Uses Chrome rendering engine
+        }
+        return headers, payload
+
+    def render(self, html: str, context: Dict[str, Any], output_path: str):
+        token = self.client.get_token()
+        if not token:
+            raise PdfBackendError("Foxit auth unavailable")
+        headers, payload = self._request(html, token)
+
+        with track_outbound("foxit", "doc_gen"):
+            response = http_pool.session.post(self.url, json=payload, headers=headers, stream=True)
+            if response.status_code == 401:
+                self.client.tokens.invalidate()
+            response.raise_for_status()
+            with atomic_writer(output_path) as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+
+    async def render_async(self, html: str, context: Dict[str, Any], output_path: str):
+        """Streams the Doc Gen response to disk without blocking the event loop."""
+        with atomic_writer(output_path) as f:
+            async for chunk in self.stream_async(html, context):
+                f.write(chunk)
+
+    async def stream_async(self, html: str, context: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Relays the Doc Gen response body chunk by chunk as it arrives."""
+        token = await self.client.get_token_async()
+        if not token:
+            raise PdfBackendError("Foxit auth unavailable")
+        headers, payload = self._request(html, token)
+
+        async with track_outbound("foxit", "doc_gen"):
+            async with self.client._get_async_http().stream("POST", self.url, json=payload, headers=headers) as response:
+                if response.status_code == 401:
+                    self.client.tokens.invalidate()
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(chunk_size=8192):
+                    yield chunk
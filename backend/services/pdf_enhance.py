@@ -0,0 +1,506 @@
+import os
+import re
+import math
+import shutil
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+
+from core.pdf_store import atomic_writer
+from services.pdf_local import BOLD, MARGIN, FOOTER_Y, REGULAR, pdf_string, text_width
+
+# ==========================================
+# ✨ In-process PDF enhancement (incremental update)
+# ==========================================
+# Watermark, page numbers and metadata are appended to the original PDF as
+# one incremental update (PDF 1.4 §3.4.5): the original bytes are streamed
+# through unchanged, followed by the new/replaced objects, a new xref
+# section and a trailer whose /Prev points at the original xref. Only the
+# xref tables and the page/Info dictionaries are parsed, so memory does not
+# grow with the size of the PDF. All options are applied in a single pass.
+#
+# Files this parser does not handle (xref streams / object streams,
+# encryption) are copied through unchanged instead.
+
+TAIL_BYTES = 2048
+READ_CHUNK = 4096
+WATERMARK_OPACITY = 0.12
+WATERMARK_GRAY = 0.5
+PAGE_NUMBER_SIZE = 8
+
+_WHITESPACE = b"\x00\t\n\x0c\r "
+_DELIMITERS = b"()<>[]{}/%"
+_INHERITABLE = ("MediaBox", "Resources", "Rotate")
+_INFO_KEYS = {"title": "Title", "author": "Author", "subject": "Subject", "keywords": "Keywords", "creator": "Creator"}
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_ENTRY_RE = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+
+
+class PdfEnhanceError(Exception):
+    """Raised when a PDF cannot be enhanced in place (unsupported or malformed)."""
+
+
+class Name(str):
+    """A PDF name, stored without the leading slash."""
+
+
+class Raw(bytes):
+    """A token re-emitted verbatim (strings, booleans, null)."""
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class _Truncated(Exception):
+    """The buffer ended before the value did; read more and retry."""
+
+
+# ==========================================
+# Lexer / serializer
+# ==========================================
+
+class _Lexer:
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _peek(self, n: int = 1) -> bytes:
+        if self.pos + n > len(self.data):
+            raise _Truncated()
+        return self.data[self.pos:self.pos + n]
+
+    def skip_ws(self):
+        data = self.data
+        while True:
+            while self.pos < len(data) and data[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(data) and data[self.pos:self.pos + 1] == b"%":
+                while self.pos < len(data) and data[self.pos] not in b"\r\n":
+                    self.pos += 1
+                continue
+            if self.pos >= len(data):
+                raise _Truncated()
+            return
+
+    def token(self) -> bytes:
+        """A run of regular characters (number, keyword)."""
+        self.skip_ws()
+        start = self.pos
+        while self.pos < len(self.data) and self.data[self.pos] not in _WHITESPACE + _DELIMITERS:
+            self.pos += 1
+        if self.pos >= len(self.data):
+            raise _Truncated()
+        return self.data[start:self.pos]
+
+    def expect(self, keyword: bytes):
+        found = self.token()
+        if found != keyword:
+            raise PdfEnhanceError(f"expected {keyword!r}, found {found[:20]!r}")
+
+    def value(self) -> Any:
+        self.skip_ws()
+        head = self._peek()
+        if head == b"/":
+            self.pos += 1
+            return Name(self.token().decode("latin-1"))
+        if head == b"<":
+            if self._peek(2) == b"<<":
+                return self._dict()
+            end = self.data.find(b">", self.pos)
+            if end < 0:
+                raise _Truncated()
+            raw = Raw(self.data[self.pos:end + 1])
+            self.pos = end + 1
+            return raw
+        if head == b"[":
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_ws()
+                if self._peek() == b"]":
+                    self.pos += 1
+                    return items
+                items.append(self.value())
+        if head == b"(":
+            return self._literal()
+        if head in b")>]{}":
+            raise PdfEnhanceError(f"unexpected {head!r} at {self.pos}")
+
+        word = self.token()
+        if word in (b"true", b"false", b"null"):
+            return Raw(word)
+        number = _parse_number(word)
+        if isinstance(number, int) and number >= 0:
+            # "12 0 R" is a reference; anything else leaves the lexer at the number
+            mark = self.pos
+            gen = self.token()
+            if gen.isdigit() and self.token() == b"R":
+                return Ref(number, int(gen))
+            self.pos = mark
+        return number
+
+    def _dict(self) -> Dict[str, Any]:
+        self.pos += 2
+        result: Dict[str, Any] = {}
+        while True:
+            self.skip_ws()
+            if self._peek(2) == b">>":
+                self.pos += 2
+                return result
+            key = self.value()
+            if not isinstance(key, Name):
+                raise PdfEnhanceError(f"dictionary key is not a name at {self.pos}")
+            result[key] = self.value()
+
+    def _literal(self) -> Raw:
+        start, depth = self.pos, 0
+        while True:
+            char = self._peek()
+            self.pos += 1
+            if char == b"\\":
+                self.pos += 1
+            elif char == b"(":
+                depth += 1
+            elif char == b")":
+                depth -= 1
+                if depth == 0:
+                    return Raw(self.data[start:self.pos])
+
+
+def _parse_number(word: bytes):
+    try:
+        return int(word)
+    except ValueError:
+        pass
+    try:
+        return float(word)
+    except ValueError:
+        raise PdfEnhanceError(f"unexpected token {word[:20]!r}")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return ("%.4f" % value).rstrip("0").rstrip(".")
+
+
+def serialize(value: Any) -> bytes:
+    if isinstance(value, Name):
+        return b"/" + value.encode("latin-1")
+    if isinstance(value, Raw):
+        return bytes(value)
+    if isinstance(value, Ref):
+        return b"%d %d R" % (value.num, value.gen)
+    if isinstance(value, bool):
+        return b"true" if value else b"false"
+    if isinstance(value, (int, float)):
+        return _number(value).encode("latin-1")
+    if isinstance(value, dict):
+        return b"<< " + b" ".join(b"/" + k.encode("latin-1") + b" " + serialize(v) for k, v in value.items()) + b" >>"
+    if isinstance(value, (list, tuple)):
+        return b"[" + b" ".join(serialize(v) for v in value) + b"]"
+    if value is None:
+        return b"null"
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+
+def info_string(text: str) -> Raw:
+    """Text string for the Info dictionary (UTF-16BE when not Latin-1)."""
+    try:
+        text.encode("latin-1")
+        return Raw(pdf_string(text).encode("latin-1"))
+    except UnicodeEncodeError:
+        return Raw(b"<FEFF" + text.encode("utf-16-be").hex().upper().encode("ascii") + b">")
+
+
+# ==========================================
+# Reader (xref tables + object dictionaries)
+# ==========================================
+
+class PdfReader:
+    """
+    Random-access reader over an open PDF file. Reads only the xref tables
+    and the objects it is asked for; content streams are never loaded.
+    """
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.size = f.tell()
+        self.offsets: Dict[int, Tuple[int, int]] = {}  # num -> (offset, gen)
+        self.startxref = self._find_startxref()
+        self.trailer = self._read_xref_chain(self.startxref)
+        if "Encrypt" in self.trailer:
+            raise PdfEnhanceError("encrypted PDF")
+        if not isinstance(self.trailer.get("Root"), Ref) or not isinstance(self.trailer.get("Size"), int):
+            raise PdfEnhanceError("trailer lacks /Root or /Size")
+
+    def _read(self, offset: int, length: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def _find_startxref(self) -> int:
+        tail = self._read(max(0, self.size - TAIL_BYTES), TAIL_BYTES)
+        matches = _STARTXREF_RE.findall(tail)
+        if not matches:
+            raise PdfEnhanceError("startxref not found")
+        return int(matches[-1])
+
+    def _parse_at(self, offset: int, parse):
+        """Runs `parse(lexer)` on a window at `offset`, growing it until the value fits."""
+        chunk = READ_CHUNK
+        while True:
+            data = self._read(offset, chunk)
+            try:
+                return parse(_Lexer(data))
+            except _Truncated:
+                if offset + chunk >= self.size:
+                    raise PdfEnhanceError(f"unexpected end of file reading offset {offset}")
+                chunk *= 4
+
+    def _read_xref_chain(self, offset: int) -> Dict[str, Any]:
+        newest: Optional[Dict[str, Any]] = None
+        seen = set()
+        while offset is not None:
+            if offset in seen or not 0 <= offset < self.size:
+                raise PdfEnhanceError(f"bad xref offset {offset}")
+            seen.add(offset)
+            trailer = self._parse_at(offset, self._xref_section)
+            if "XRefStm" in trailer:
+                raise PdfEnhanceError("hybrid xref stream file")
+            newest = newest or trailer
+            offset = trailer.get("Prev")
+        return newest
+
+    def _xref_section(self, lexer: _Lexer) -> Dict[str, Any]:
+        if lexer.token() != b"xref":
+            raise PdfEnhanceError("cross-reference streams are not supported")
+        entries: Dict[int, Tuple[int, int]] = {}
+        while True:
+            word = lexer.token()
+            if word == b"trailer":
+                break
+            start, count = int(word), int(lexer.token())
+            for num in range(start, start + count):
+                lexer.skip_ws()
+                match = _ENTRY_RE.match(lexer.data, lexer.pos)
+                if not match:
+                    if lexer.pos + 20 > len(lexer.data):
+                        raise _Truncated()
+                    raise PdfEnhanceError(f"malformed xref entry for object {num}")
+                lexer.pos = match.end()
+                if match.group(3) == b"n":
+                    entries[num] = (int(match.group(1)), int(match.group(2)))
+        trailer = lexer.value()
+        # Sections are read newest first: keep entries already set by a later update
+        for num, entry in entries.items():
+            self.offsets.setdefault(num, entry)
+        return trailer
+
+    def object(self, ref: Ref) -> Any:
+        if ref.num not in self.offsets:
+            return None
+        offset, gen = self.offsets[ref.num]
+
+        def parse(lexer: _Lexer):
+            num, found_gen = int(lexer.token()), int(lexer.token())
+            lexer.expect(b"obj")
+            if (num, found_gen) != (ref.num, gen):
+                raise PdfEnhanceError(f"xref points at object {num} instead of {ref.num}")
+            return lexer.value()
+
+        return self._parse_at(offset, parse)
+
+    def resolve(self, value: Any) -> Any:
+        return self.object(value) if isinstance(value, Ref) else value
+
+    def pages(self) -> List[Tuple[Ref, Dict[str, Any], Dict[str, Any]]]:
+        """(ref, page dict, inherited attributes) for every page, in order."""
+        root = self.resolve(self.trailer["Root"])
+        if not isinstance(root, dict) or not isinstance(root.get("Pages"), Ref):
+            raise PdfEnhanceError("catalog has no page tree")
+        pages, seen = [], set()
+        stack = [(root["Pages"], {})]
+        while stack:
+            ref, inherited = stack.pop()
+            if ref in seen:
+                raise PdfEnhanceError("cycle in page tree")
+            seen.add(ref)
+            node = self.object(ref)
+            if not isinstance(node, dict):
+                raise PdfEnhanceError(f"page tree node {ref.num} is not a dictionary")
+            attrs = {**inherited, **{k: node[k] for k in _INHERITABLE if k in node}}
+            if node.get("Type") == "Pages" or "Kids" in node:
+                kids = self.resolve(node.get("Kids")) or []
+                stack.extend((kid, attrs) for kid in reversed(kids))
+            else:
+                pages.append((ref, node, attrs))
+        return pages
+
+
+# ==========================================
+# Incremental update
+# ==========================================
+
+def _page_box(reader: PdfReader, attrs: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    box = reader.resolve(attrs.get("MediaBox")) or [0, 0, 612, 792]
+    x0, y0, x1, y1 = (float(reader.resolve(v)) for v in box)
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+def _watermark_ops(text: str, box: Tuple[float, float, float, float]) -> str:
+    x0, y0, x1, y1 = box
+    width, height = x1 - x0, y1 - y0
+    angle = math.atan2(height, width)
+    size = min(96.0, 0.6 * math.hypot(width, height) / max(text_width(text, BOLD, 1), 1e-6))
+    cos, sin = math.cos(angle), math.sin(angle)
+    return (
+        f"q /DMGS gs {WATERMARK_GRAY} g "
+        f"{cos:.4f} {sin:.4f} {-sin:.4f} {cos:.4f} {x0 + width / 2:.2f} {y0 + height / 2:.2f} cm "
+        f"BT /DMF2 {size:.2f} Tf {-text_width(text, BOLD, size) / 2:.2f} {-size * 0.35:.2f} Td {pdf_string(text)} Tj ET Q"
+    )
+
+
+def _page_number_ops(index: int, total: int, box: Tuple[float, float, float, float]) -> str:
+    x0, y0, x1, _ = box
+    label = f"Page {index} of {total}"
+    x = x1 - MARGIN - text_width(label, REGULAR, PAGE_NUMBER_SIZE)
+    return f"BT /DMF1 {PAGE_NUMBER_SIZE} Tf 0.42 0.45 0.5 rg {x:.2f} {y0 + FOOTER_Y:.2f} Td {pdf_string(label)} Tj ET"
+
+
+def _stream(data: bytes) -> bytes:
+    return b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+def _merged_resources(reader: PdfReader, resources: Any, fonts: Dict[str, Ref], states: Dict[str, Ref]) -> Dict[str, Any]:
+    """The page's (possibly inherited/indirect) resources plus the overlay's."""
+    merged = dict(reader.resolve(resources) or {})
+    merged["Font"] = {**(reader.resolve(merged.get("Font")) or {}), **fonts}
+    merged["ExtGState"] = {**(reader.resolve(merged.get("ExtGState")) or {}), **states}
+    return merged
+
+
+def _content_refs(reader: PdfReader, page: Dict[str, Any]) -> List[Any]:
+    contents = page.get("Contents")
+    if contents is None:
+        return []
+    resolved = reader.resolve(contents)
+    return resolved if isinstance(resolved, list) else [contents]
+
+
+def build_update(reader: PdfReader, options: Dict[str, Any], base_offset: int) -> bytes:
+    """
+    The incremental update for `options` (watermark, page_numbers, metadata),
+    to be written at `base_offset` (the end of the original file).
+    """
+    watermark = options.get("watermark")
+    page_numbers = options.get("page_numbers")
+    pages = reader.pages()
+    next_num = reader.trailer["Size"]
+    objects: Dict[int, Tuple[int, bytes]] = {}  # num -> (gen, body)
+
+    def new_object(body: bytes) -> Ref:
+        nonlocal next_num
+        ref = Ref(next_num, 0)
+        next_num += 1
+        objects[ref.num] = (0, body)
+        return ref
+
+    if watermark or page_numbers:
+        fonts = {
+            "DMF1": new_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+            "DMF2": new_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"),
+        }
+        states = {"DMGS": new_object(f"<< /Type /ExtGState /ca {WATERMARK_OPACITY} /CA {WATERMARK_OPACITY} >>".encode("latin-1"))}
+        # Original content is wrapped in q ... Q so its graphics state cannot leak into the overlay
+        save = new_object(_stream(b"q"))
+        for index, (ref, page, attrs) in enumerate(pages, 1):
+            box = _page_box(reader, attrs)
+            ops = ["Q"]
+            if watermark:
+                ops.append(_watermark_ops(str(watermark), box))
+            if page_numbers:
+                ops.append(_page_number_ops(index, len(pages), box))
+            overlay = new_object(_stream("\n".join(ops).encode("latin-1")))
+
+            updated = {
+                **page,
+                "Contents": [save, *_content_refs(reader, page), overlay],
+                "Resources": _merged_resources(reader, attrs.get("Resources"), fonts, states),
+            }
+            if "MediaBox" not in page:
+                updated["MediaBox"] = list(_page_box(reader, attrs))
+            objects[ref.num] = (ref.gen, serialize(updated))
+
+    info_ref = reader.trailer.get("Info")
+    info = dict(reader.resolve(info_ref) or {}) if isinstance(info_ref, Ref) else {}
+    for key, value in (options.get("metadata") or {}).items():
+        if value not in (None, ""):
+            info[_INFO_KEYS.get(key, str(key))] = info_string(str(value))
+    info["Producer"] = info_string("DocuMind")
+    # No ModDate: enhanced PDFs are named by content, so the same input and
+    # options must always give the same bytes
+    if isinstance(info_ref, Ref) and info_ref.num in reader.offsets:
+        objects[info_ref.num] = (info_ref.gen, serialize(info))
+    else:
+        info_ref = new_object(serialize(info))
+
+    out = bytearray()
+    offsets: Dict[int, int] = {}
+    for num in sorted(objects):
+        gen, body = objects[num]
+        offsets[num] = base_offset + len(out)
+        out += b"%d %d obj\n" % (num, gen) + body + b"\nendobj\n"
+
+    xref_offset = base_offset + len(out)
+    # Object 0 (head of the free list) is repeated so the section is zero-indexed
+    out += b"xref\n0 1\n0000000000 65535 f \n"
+    numbers = sorted(offsets)
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        out += b"%d %d\n" % (numbers[start], end - start + 1)
+        for num in numbers[start:end + 1]:
+            out += b"%010d %05d n \n" % (offsets[num], objects[num][0])
+        start = end + 1
+
+    trailer = {"Size": next_num, "Root": reader.trailer["Root"], "Info": info_ref, "Prev": reader.startxref}
+    if "ID" in reader.trailer:
+        trailer["ID"] = reader.trailer["ID"]
+    out += b"trailer\n" + serialize(trailer) + b"\nstartxref\n%d\n%%%%EOF\n" % xref_offset
+    return bytes(out)
+
+
+def enhancement_update(f: BinaryIO, options: Dict[str, Any]) -> Optional[bytes]:
+    """
+    The bytes to append to the open PDF `f` to apply `options` (including a
+    leading newline if the file lacks one), or None if it cannot be updated
+    in place.
+    """
+    try:
+        reader = PdfReader(f)
+        prefix = b""
+        if reader.size and reader._read(reader.size - 1, 1) not in (b"\n", b"\r"):
+            prefix = b"\n"
+        return prefix + build_update(reader, options, reader.size + len(prefix))
+    except (PdfEnhanceError, ValueError, TypeError) as e:
+        print(f"⚠️ In-place enhancement unavailable, copying PDF unchanged: {e}")
+        return None
+
+
+def enhance_file(source_path: str, output_path: str, options: Dict[str, Any]) -> bool:
+    """
+    Writes `source_path` plus the enhancement update to `output_path`
+    (atomically). Returns False when the PDF could not be updated in place
+    and was copied through unchanged.
+    """
+    with open(source_path, "rb") as f_in:
+        update = enhancement_update(f_in, options)
+        f_in.seek(0)
+        with atomic_writer(output_path) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+            if update:
+                f_out.write(update)
+    return update is not None
@@ -0,0 +1,276 @@
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+# ==========================================
+# 🖨 In-process PDF renderer (no network)
+# ==========================================
+# Lays out the same context the Jinja templates receive (title, doc_type,
+# date, structured_data) with the PDF standard fonts: strings become
+# paragraphs, lists become bullets, lists of objects (action items,
+# requirements, ...) become tables. Output is plain PDF 1.4 with a classic
+# xref table.
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+MARGIN = 54
+FOOTER_HEIGHT = 28
+FOOTER_Y = MARGIN - 20
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+REGULAR = "F1"
+BOLD = "F2"
+BULLET = "•"
+
+# Standard 14 font metrics (1/1000 em) for printable ASCII, WinAnsiEncoding
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+_WIDTHS = {
+    REGULAR: {32 + i: w for i, w in enumerate(_HELVETICA)},
+    BOLD: {32 + i: w for i, w in enumerate(_HELVETICA_BOLD)},
+}
+_WIDTHS[REGULAR][0x95] = _WIDTHS[BOLD][0x95] = 350  # bullet
+_DEFAULT_WIDTH = 556
+
+TEXT_COLOR = (0.13, 0.15, 0.18)
+MUTED_COLOR = (0.42, 0.45, 0.5)
+ACCENT_COLOR = (0.12, 0.29, 0.55)
+RULE_COLOR = (0.8, 0.82, 0.86)
+HEADER_FILL = (0.93, 0.94, 0.96)
+
+
+def _encode(text: str) -> bytes:
+    return text.encode("cp1252", "replace")
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    widths = _WIDTHS[font]
+    return sum(widths.get(b, _DEFAULT_WIDTH) for b in _encode(text)) * size / 1000
+
+
+def pdf_string(text: str) -> str:
+    raw = _encode(text).replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return "(" + raw.decode("latin-1") + ")"
+
+
+def _color(rgb: Sequence[float], stroke: bool = False) -> str:
+    return "%.3f %.3f %.3f %s" % (rgb[0], rgb[1], rgb[2], "RG" if stroke else "rg")
+
+
+def wrap(text: str, font: str, size: float, max_width: float) -> List[str]:
+    """Greedy word wrap; words wider than a line are split by character."""
+    lines: List[str] = []
+    for paragraph in str(text).replace("\r", "").split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if text_width(candidate, font, size) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while text_width(word, font, size) > max_width:
+                cut = len(word) - 1
+                while cut > 1 and text_width(word[:cut], font, size) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+def _plain(value: Any) -> str:
+    """Flattens nested values into one cell/bullet line."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "; ".join(f"{_label(k)}: {_plain(v)}" for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_plain(v) for v in value)
+    return str(value)
+
+
+def _label(key: str) -> str:
+    return str(key).replace("_", " ").title()
+
+
+class _Layout:
+    """Flows blocks top to bottom, starting new pages as needed."""
+
+    def __init__(self):
+        self.pages: List[List[str]] = []
+        self._new_page()
+
+    def _new_page(self):
+        self.ops: List[str] = []
+        self.pages.append(self.ops)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def _fits(self, height: float) -> bool:
+        return self.y - height >= MARGIN + FOOTER_HEIGHT
+
+    def _ensure(self, height: float):
+        if not self._fits(height):
+            self._new_page()
+
+    def space(self, points: float):
+        if self.y < PAGE_HEIGHT - MARGIN:
+            self.y -= points
+
+    def text(self, x: float, y: float, text: str, font: str, size: float, color=TEXT_COLOR):
+        self.ops.append(f"BT /{font} {size:g} Tf {_color(color)} {x:.2f} {y:.2f} Td {pdf_string(text)} Tj ET")
+
+    def lines(self, text: str, font: str, size: float, leading: float, indent: float = 0, color=TEXT_COLOR, marker: Optional[str] = None):
+        x = MARGIN + indent
+        for i, line in enumerate(wrap(text, font, size, CONTENT_WIDTH - indent)):
+            self._ensure(leading)
+            self.y -= leading
+            if marker and i == 0:
+                self.text(x - 12, self.y, marker, REGULAR, size, ACCENT_COLOR)
+            self.text(x, self.y, line, font, size, color)
+
+    def rule(self):
+        self.y -= 8
+        self.ops.append(f"{_color(RULE_COLOR, stroke=True)} 0.75 w {MARGIN} {self.y:.2f} m {PAGE_WIDTH - MARGIN} {self.y:.2f} l S")
+        self.y -= 6
+
+    def table(self, rows: List[Dict[str, Any]]):
+        columns: List[str] = []
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        size, leading, pad = 9.5, 12, 4
+        widths = self._column_widths(columns, rows, size, pad)
+        max_lines = int((PAGE_HEIGHT - 2 * MARGIN - FOOTER_HEIGHT) / leading) - 4
+
+        header = [wrap(_label(c), BOLD, size, w - 2 * pad) for c, w in zip(columns, widths)]
+        self.space(6)
+        self._ensure(self._row_height(header, leading, pad) * 2)
+        self._row(header, widths, BOLD, size, leading, pad, fill=True)
+        for row in rows:
+            cells = [wrap(_plain(row.get(c)), REGULAR, size, w - 2 * pad)[:max_lines] for c, w in zip(columns, widths)]
+            if not self._fits(self._row_height(cells, leading, pad)):
+                self._new_page()
+                self._row(header, widths, BOLD, size, leading, pad, fill=True)
+            self._row(cells, widths, REGULAR, size, leading, pad)
+
+    def _column_widths(self, columns: List[str], rows: List[Dict[str, Any]], size: float, pad: float) -> List[float]:
+        natural = []
+        for column in columns:
+            widest = max([text_width(_label(column), BOLD, size)] + [text_width(_plain(r.get(column)), REGULAR, size) for r in rows])
+            natural.append(max(widest + 2 * pad, 48))
+        total = sum(natural)
+        if total > CONTENT_WIDTH:
+            # Shrink wide columns first: cap each at its fair share, then rescale
+            share = CONTENT_WIDTH / len(columns)
+            natural = [min(w, max(share, w * CONTENT_WIDTH / total)) for w in natural]
+            total = sum(natural)
+        return [w * CONTENT_WIDTH / total for w in natural]
+
+    @staticmethod
+    def _row_height(cells: List[List[str]], leading: float, pad: float) -> float:
+        return max(len(lines) for lines in cells) * leading + 2 * pad
+
+    def _row(self, cells: List[List[str]], widths: List[float], font: str, size: float, leading: float, pad: float, fill: bool = False):
+        height = self._row_height(cells, leading, pad)
+        top, bottom = self.y, self.y - height
+        if fill:
+            self.ops.append(f"{_color(HEADER_FILL)} {MARGIN} {bottom:.2f} {CONTENT_WIDTH} {height:.2f} re f")
+        x = MARGIN
+        for lines, width in zip(cells, widths):
+            self.ops.append(f"{_color(RULE_COLOR, stroke=True)} 0.5 w {x:.2f} {bottom:.2f} {width:.2f} {height:.2f} re S")
+            for i, line in enumerate(lines):
+                self.text(x + pad, top - pad - (i + 1) * leading + 3, line, font, size)
+            x += width
+        self.y = bottom
+
+
+class LocalPdfRenderer:
+    """Renders a template context to PDF bytes."""
+
+    def render(self, context: Dict[str, Any]) -> bytes:
+        layout = _Layout()
+        title = str(context.get("title") or "Untitled Document")
+        layout.lines(title, BOLD, 20, 24)
+        subtitle = "  •  ".join(str(part) for part in (str(context.get("doc_type") or "").upper(), context.get("date")) if part)
+        if subtitle:
+            layout.lines(subtitle, REGULAR, 9.5, 14, color=MUTED_COLOR)
+        layout.rule()
+
+        body = context.get("structured_data") or {}
+        if not isinstance(body, dict):
+            body = {"content": body}
+        for key, value in body.items():
+            layout.space(10)
+            layout.lines(_label(key), BOLD, 13, 18, color=ACCENT_COLOR)
+            layout.space(2)
+            self._value(layout, value)
+
+        return _serialize(layout.pages, title)
+
+    def _value(self, layout: _Layout, value: Any):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                layout.lines(f"{_label(key)}: {_plain(item)}", REGULAR, 10.5, 14, indent=14, marker=BULLET)
+        elif isinstance(value, (list, tuple)):
+            if value and all(isinstance(item, dict) for item in value):
+                layout.table(list(value))
+            else:
+                for item in value:
+                    layout.lines(_plain(item), REGULAR, 10.5, 14, indent=14, marker=BULLET)
+        elif value not in (None, ""):
+            layout.lines(str(value), REGULAR, 10.5, 14)
+
+
+def _footer() -> str:
+    # Page numbers are stamped by the enhancement pass (services/pdf_enhance.py)
+    return f"BT /{REGULAR} 8 Tf {_color(MUTED_COLOR)} {MARGIN} {FOOTER_Y} Td {pdf_string('Generated by DocuMind')} Tj ET"
+
+
+def _serialize(pages: List[List[str]], title: str) -> bytes:
+    objects: Dict[int, bytes] = {
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        4: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    number = 5
+    for ops in pages:
+        stream = zlib.compress("\n".join(ops + [_footer()]).encode("latin-1"))
+        objects[number] = b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[number + 1] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /{REGULAR} 3 0 R /{BOLD} 4 0 R >> >> /Contents {number} 0 R >>"
+        ).encode("latin-1")
+        kids.append(f"{number + 1} 0 R")
+        number += 2
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+    info = number
+    objects[info] = f"<< /Title {pdf_string(title)} /Producer (DocuMind) >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for num in range(1, info + 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + objects[num] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (info + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (info + 1, info, xref)
+    return bytes(out)
@@ -1,8 +1,10 @@
-import requests
+import httpx
 import json
 import uuid
 from datetime import datetime
 from core.config import SANITY_PROJECT_ID, SANITY_DATASET, SANITY_TOKEN
+from core.metrics import track_outbound, record_mock_fallback
+from services.http import http_pool
 
 class SanityClient:
     def __init__(self):
@@ -10,6 +12,7 @@ class SanityClient:
         self.dataset = SANITY_DATASET
         self.token = SANITY_TOKEN
         self.base_url = f"https://{self.project_id}.api.sanity.io/v2021-06-07/data"
+        self._async_http = None
 
     def _headers(self):
         return {
@@ -17,18 +20,34 @@ class SanityClient:
             "Content-Type": "application/json"
         }
 
-    def create_document(self, doc_type: str, title: str, structured_data: dict, pdf_path: str):
-        """
-        Creates a new 'generatedDocument' in Sanity.
-        """
+    def _get_async_http(self) -> httpx.AsyncClient:
+        """The shared pooled async client (or one pinned on `_async_http`, e.g. in tests)."""
+        return self._async_http or http_pool.async_client()
+
+    async def aclose(self):
+        """Closes a pinned async client; the shared pool is closed at app shutdown."""
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+
+    async def warm_async(self):
+        """Opens the pooled connection (DNS + TLS) before the first real write."""
         if not self.token:
-            print("⚠️ Sanity token missing. Skipping storage.")
-            return None
+            return False
+        try:
+            async with track_outbound("sanity", "warmup"):
+                await self._get_async_http().get(
+                    f"{self.base_url}/query/{self.dataset}",
+                    headers=self._headers(),
+                    params={"query": "count(*[_id == 'documind.warmup'])"},
+                )
+            return True
+        except Exception as e:
+            print(f"⚠️ Sanity warmup failed (Non-blocking): {e}")
+            return False
 
-        doc_id = str(uuid.uuid4())
-        
-        # Prepare mutations
-        mutations = [
+    def _build_mutations(self, doc_id: str, doc_type: str, title: str, structured_data: dict, pdf_path: str) -> list:
+        return [
             {
                 "create": {
                     "_id": doc_id,
@@ -47,29 +66,88 @@ class SanityClient:
             }
         ]
 
+    def create_document(self, doc_type: str, title: str, structured_data: dict, pdf_path: str):
+        """
+        Creates a new 'generatedDocument' in Sanity.
+        """
+        if not self.token:
+            print("⚠️ Sanity token missing. Skipping storage.")
+            record_mock_fallback("sanity", "mutate")
+            return None
+
+        doc_id = str(uuid.uuid4())
+        
+        # Prepare mutations
+        mutations = self._build_mutations(doc_id, doc_type, title, structured_data, pdf_path)
+
         url = f"{self.base_url}/mutate/{self.dataset}"
         
         try:
-            response = requests.post(url, headers=self._headers(), json={"mutations": mutations})
-            response.raise_for_status()
+            with track_outbound("sanity", "mutate"):
+                response = http_pool.session.post(url, headers=self._headers(), json={"mutations": mutations})
+                response.raise_for_status()
             print(f"✅ Saved to Sanity: {doc_id}")
             return response.json()
         except Exception as e:
             print(f"❌ Sanity Save Failed: {e}")
             return None
 
-    def get_documents(self, doc_type: str = None):
+    async def create_document_async(self, doc_type: str, title: str, structured_data: dict, pdf_path: str):
         """
-        Fetches documents using GROQ.
+        Async variant of create_document.
         """
         if not self.token:
-            return []
+            print("⚠️ Sanity token missing. Skipping storage.")
+            record_mock_fallback("sanity", "mutate")
+            return None
+
+        doc_id = str(uuid.uuid4())
+        mutations = self._build_mutations(doc_id, doc_type, title, structured_data, pdf_path)
+
+        url = f"{self.base_url}/mutate/{self.dataset}"
+
+        try:
+            async with track_outbound("sanity", "mutate"):
+                response = await self._get_async_http().post(url, headers=self._headers(), json={"mutations": mutations})
+                response.raise_for_status()
+            print(f"✅ Saved to Sanity: {doc_id}")
+            return response.json()
+        except Exception as e:
+            print(f"❌ Sanity Save Failed: {e}")
+            return None
 
+    def _documents_query(self, doc_type: str = None) -> str:
         query = '*[_type == "generatedDocument"] | order(createdAt desc)'
         if doc_type:
             query = f'*[_type == "generatedDocument" && docType == "{doc_type}"] | order(createdAt desc)'
-        
-        return self._run_query(query)
+        return query
+
+    # This GROQ query assumes actionItems are objects inside the document
+    OPEN_TASKS_QUERY = """
+        *[_type == "generatedDocument" && count(actionItems) > 0] {
+            _id,
+            title,
+            "tasks": actionItems
+        }
+        """
+
+    def get_documents(self, doc_type: str = None):
+        """
+        Fetches documents using GROQ.
+        """
+        if not self.token:
+            return []
+
+        return self._run_query(self._documents_query(doc_type))
+
+    async def get_documents_async(self, doc_type: str = None):
+        """
+        Async variant of get_documents.
+        """
+        if not self.token:
+            return []
+
+        return await self._run_query_async(self._documents_query(doc_type))
 
     def get_open_tasks(self):
         """
@@ -79,21 +157,34 @@ class SanityClient:
         if not self.token:
             return []
 
-        # This GROQ query assumes actionItems are objects inside the document
-        query = """
-        *[_type == "generatedDocument" && count(actionItems) > 0] {
-            _id,
-            title,
-            "tasks": actionItems
-        }
+        return self._run_query(self.OPEN_TASKS_QUERY)
+
+    async def get_open_tasks_async(self):
+        """
+        Async variant of get_open_tasks.
         """
-        return self._run_query(query)
+        if not self.token:
+            return []
+
+        return await self._run_query_async(self.OPEN_TASKS_QUERY)
 
     def _run_query(self, query: str):
         url = f"{self.base_url}/query/{self.dataset}"
         try:
-            response = requests.get(url, headers=self._headers(), params={"query": query})
-            response.raise_for_status()
+            with track_outbound("sanity", "query"):
+                response = http_pool.session.get(url, headers=self._headers(), params={"query": query})
+                response.raise_for_status()
+            return response.json().get("result", [])
+        except Exception as e:
+             print(f"❌ Sanity Query Failed: {e}")
+             return []
+
+    async def _run_query_async(self, query: str):
+        url = f"{self.base_url}/query/{self.dataset}"
+        try:
+            async with track_outbound("sanity", "query"):
+                response = await self._get_async_http().get(url, headers=self._headers(), params={"query": query})
+                response.raise_for_status()
             return response.json().get("result", [])
         except Exception as e:
              print(f"❌ Sanity Query Failed: {e}")
@@ -0,0 +1,238 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from array import array
+import threading
+import tempfile
+import asyncio
+import time
+import sys
+import os
+
+import httpx
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.audio import AudioSegment, WavInfo, plan_segments, quietest_point, read_wav_info, stitch_segments, wav_header, wav_segment
+from services.deepgram import DeepgramClient
+
+RATE = 8000
+WORD_SECONDS = 0.4
+PAUSE_SECONDS = 0.3
+TURN_PAUSE_SECONDS = 1.0
+WORDS_PER_TURN = 5
+
+
+def _recording(count):
+    """
+    A PCM WAV 'recording' of `count` words: word i is a square-wave burst of
+    amplitude 1000 + 20 * i, separated by silence, with two speakers
+    alternating every WORDS_PER_TURN words. Returns (wav bytes, expected words).
+    """
+    samples = array("h")
+    expected = []
+    for i in range(count):
+        start = len(samples) / RATE
+        amplitude = 1000 + 20 * i
+        samples.extend((amplitude if n % 2 else -amplitude) for n in range(int(WORD_SECONDS * RATE)))
+        expected.append({"word": f"w{i}", "start": start, "end": start + WORD_SECONDS, "speaker": (i // WORDS_PER_TURN) % 2})
+        pause = TURN_PAUSE_SECONDS if (i + 1) % WORDS_PER_TURN == 0 else PAUSE_SECONDS
+        samples.extend([0] * int(pause * RATE))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    data = samples.tobytes()
+    info = WavInfo(channels=1, sample_rate=RATE, bits=16, block_align=2, data_offset=44, data_size=len(data))
+    return wav_header(info, len(data)) + data, expected
+
+
+def fake_deepgram(wav):
+    """
+    Stand-in for Deepgram's prerecorded API: 'hears' the bursts in a WAV
+    segment (partial ones at the edges too), with times relative to the
+    segment and speakers numbered in order of appearance, the way diarization
+    labels each request independently.
+    """
+    info = read_wav_info(wav)
+    samples = array("h")
+    samples.frombytes(wav[info.data_offset:info.data_offset + info.data_size])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    words, labels = [], {}
+    i = 0
+    while i < len(samples):
+        if not samples[i]:
+            i += 1
+            continue
+        j = i
+        while j < len(samples) and samples[j]:
+            j += 1
+        index = (abs(samples[i]) - 1000) // 20
+        speaker = labels.setdefault((index // WORDS_PER_TURN) % 2, len(labels))
+        words.append({"word": f"w{index}", "punctuated_word": f"w{index}", "start": i / RATE, "end": j / RATE,
+                      "confidence": 0.9, "speaker": speaker})
+        i = j
+    return {"results": {"channels": [{"alternatives": [{
+        "transcript": " ".join(w["word"] for w in words), "confidence": 0.9, "words": words,
+    }]}]}}
+
+
+class TestSegmentPlanning(unittest.TestCase):
+    def test_wav_info(self):
+        wav, _ = _recording(3)
+        info = read_wav_info(wav)
+        self.assertEqual((info.channels, info.sample_rate, info.bits, info.data_offset), (1, RATE, 16, 44))
+        self.assertAlmostEqual(info.duration, 3 * (WORD_SECONDS + PAUSE_SECONDS))
+        self.assertIsNone(read_wav_info(b"ID3\x03" + b"\x00" * 100))
+
+    def test_cuts_land_in_silence(self):
+        wav, expected = _recording(60)
+        info = read_wav_info(wav)
+
+        segments = plan_segments(wav, info, segment_seconds=10, overlap_seconds=2, search_seconds=2)
+
+        self.assertGreater(len(segments), 3)
+        self.assertEqual((segments[0].core_start, segments[-1].core_end), (0.0, info.duration))
+        for before, after in zip(segments, segments[1:]):
+            cut = after.core_start
+            self.assertEqual(before.core_end, cut)
+            self.assertAlmostEqual(after.start, cut - 1)
+            self.assertAlmostEqual(before.end, cut + 1)
+            self.assertFalse(any(w["start"] < cut < w["end"] for w in expected), f"cut at {cut} splits a word")
+
+    def test_quietest_point_prefers_the_longest_pause(self):
+        wav, _ = _recording(10)
+        info = read_wav_info(wav)
+        # Words 0-4 end at 3.2s, then a 1.0s turn pause
+        point = quietest_point(wav, info, 2.0, 5.0)
+        self.assertTrue(3.2 < point < 4.2, point)
+
+    def test_segments_stream_in_bounded_reads(self):
+        wav, _ = _recording(10)
+        info = read_wav_info(wav)
+        segment = AudioSegment(1, 1.0, 3.0, 1.0, 3.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rec.wav")
+            with open(path, "wb") as f:
+                f.write(wav)
+            for source in (wav, path):
+                chunks = list(wav_segment(source, info, segment, chunk_bytes=1000))
+                body = b"".join(chunks)
+                self.assertTrue(all(len(chunk) <= 1000 for chunk in chunks[1:]))
+                self.assertEqual(read_wav_info(body).data_size, 2 * RATE * info.block_align)
+                start = info.data_offset + info.byte_offset(1.0)
+                self.assertEqual(body[44:], wav[start:start + 2 * RATE * info.block_align])
+
+    def test_short_recordings_are_not_split(self):
+        wav, _ = _recording(10)
+        info = read_wav_info(wav)
+        self.assertEqual(len(plan_segments(wav, info, segment_seconds=info.duration, overlap_seconds=2, search_seconds=2)), 1)
+
+
+class TestStitching(unittest.TestCase):
+    def test_overlap_is_deduplicated_and_speakers_reconciled(self):
+        segments = [AudioSegment(0, 0.0, 6.0, 0.0, 5.0), AudioSegment(1, 4.0, 10.0, 5.0, 10.0)]
+        first = {"confidence": 0.8, "words": [
+            {"word": "a", "start": 1.0, "end": 1.5, "speaker": 0},
+            {"word": "b", "start": 4.2, "end": 4.6, "speaker": 1},
+            {"word": "c", "start": 5.2, "end": 5.6, "speaker": 0},
+        ]}
+        # Second request hears b and c again (relative times), with its own labels
+        second = {"confidence": 1.0, "words": [
+            {"word": "b", "start": 0.2, "end": 0.6, "speaker": 0},
+            {"word": "c", "start": 1.2, "end": 1.6, "speaker": 1},
+            {"word": "d", "start": 3.0, "end": 3.5, "speaker": 2},
+        ]}
+
+        stitched = stitch_segments(segments, [first, second])
+
+        self.assertEqual([(w["word"], w["start"], w["speaker"]) for w in stitched["words"]],
+                         [("a", 1.0, 0), ("b", 4.2, 1), ("c", 5.2, 0), ("d", 7.0, 2)])
+        self.assertEqual(stitched["transcript"], "a b c d")
+        self.assertAlmostEqual(stitched["confidence"], (0.8 * 2 + 1.0 * 2) / 4)
+
+
+class TestSegmentedTranscription(unittest.IsolatedAsyncioTestCase):
+    REQUEST_SECONDS = 0.1
+
+    def setUp(self):
+        self.client = DeepgramClient()
+        self.client.api_key = "fake-key"
+        self.client.cache = None
+        self.client.segment_seconds = 10
+        self.client.segment_overlap_seconds = 2
+        self.client.segment_search_seconds = 2
+        self.wav, self.expected = _recording(60)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def _post(self, url, params=None, headers=None, data=None):
+        self._enter()
+        try:
+            time.sleep(self.REQUEST_SECONDS)
+            response = MagicMock()
+            response.json.return_value = fake_deepgram(data if isinstance(data, bytes) else b"".join(data))
+            return response
+        finally:
+            self._exit()
+
+    async def _handler(self, request: httpx.Request) -> httpx.Response:
+        self._enter()
+        try:
+            await asyncio.sleep(self.REQUEST_SECONDS)
+            return httpx.Response(200, json=fake_deepgram(await request.aread()))
+        finally:
+            self._exit()
+
+    def _assert_matches_recording(self, result):
+        words = result["words"]
+        self.assertEqual([w["word"] for w in words], [w["word"] for w in self.expected])
+        for got, want in zip(words, self.expected):
+            self.assertAlmostEqual(got["start"], want["start"], places=3)
+            self.assertAlmostEqual(got["end"], want["end"], places=3)
+            self.assertEqual(got["speaker"], want["speaker"], got["word"])
+        self.assertEqual(len(result["speaker_turns"]), 60 // WORDS_PER_TURN)
+
+    def test_transcribe_bytes_splits_long_wav_and_runs_segments_concurrently(self):
+        with patch('services.deepgram.http_pool.session.post', side_effect=self._post):
+            result = self.client.transcribe_bytes(self.wav, "long.wav")
+
+        self._assert_matches_recording(result)
+        self.assertGreater(self.requests, 3)
+        # All segments in flight at once: wall-clock time is one segment's
+        self.assertEqual(self.max_in_flight, self.requests)
+
+    async def test_transcribe_file_async_splits_long_wav(self):
+        self.client.segment_concurrency = 2
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self._handler))
+        with tempfile.TemporaryDirectory() as tmp, patch('services.deepgram.http_pool.async_client', return_value=http):
+            path = os.path.join(tmp, "long.wav")
+            with open(path, "wb") as f:
+                f.write(self.wav)
+            result = await self.client.transcribe_file_async(path, "audio/wav", "full")
+        await http.aclose()
+
+        self._assert_matches_recording(result)
+        self.assertGreater(self.requests, 3)
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_compressed_audio_is_sent_whole(self):
+        with patch('services.deepgram.http_pool.session.post') as post:
+            post.return_value.json.return_value = {"results": {"channels": [{"alternatives": [{"transcript": "mp3"}]}]}}
+            result = self.client.transcribe_bytes(b"ID3\x03" + b"\x00" * 1000)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(result["transcript"], "mp3")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.cache import LRUCache, DiskCache, ResultCache, content_key
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ttl_expiry(self):
+        cache = DiskCache(self.tmp.name, ttl_seconds=60, max_bytes=0)
+        cache.set("k", {"v": 1})
+        self.assertEqual(cache.get("k"), {"v": 1})
+
+        old = time.time() - 120
+        os.utime(os.path.join(self.tmp.name, "k.json"), (old, old))
+        self.assertIsNone(cache.get("k"))
+
+    def test_size_eviction_drops_oldest(self):
+        cache = DiskCache(self.tmp.name, ttl_seconds=0, max_bytes=300)
+        cache.set("old", {"v": "x" * 100})
+        old = time.time() - 10
+        os.utime(os.path.join(self.tmp.name, "old.json"), (old, old))
+        cache.set("new", {"v": "y" * 100})
+        cache.set("newer", {"v": "z" * 100})
+
+        self.assertIsNone(cache.get("old"))
+        self.assertIsNotNone(cache.get("newer"))
+
+    def test_lookups_and_writes_below_quota_do_not_scan(self):
+        cache = DiskCache(self.tmp.name, ttl_seconds=60, max_bytes=10_000, attachments=("pdf",))
+        cache.set("first", {"v": 0})  # the first write takes the byte count
+        attachment = os.path.join(self.tmp.name, "doc.pdf")
+        with open(attachment, "wb") as f:
+            f.write(b"%PDF" * 10)
+
+        with patch("core.cache.os.listdir", wraps=os.listdir) as listdir:
+            for i in range(20):
+                cache.set(f"k{i}", {"v": i}, attachments={"pdf": attachment})
+                self.assertEqual(cache.get(f"k{i}"), {"v": i})
+                self.assertIsNone(cache.get(f"missing{i}"))
+            cache.delete("k0")
+        self.assertEqual(listdir.call_count, 0)
+        self.assertFalse(os.path.exists(cache.attachment_path("k0", "pdf")))
+
+        with patch("core.cache.os.listdir", wraps=os.listdir) as listdir:
+            cache.set("big", {"v": "x" * 20_000})
+        self.assertEqual(listdir.call_count, 1)
+        self.assertIsNone(cache.get("k1"))
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp.name, "out", "doc.pdf")
+        os.makedirs(os.path.dirname(self.pdf_path))
+        with open(self.pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4 test")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_disk_hit_restores_missing_pdf(self):
+        key = content_key("1", "gpt-4o", "text", "notes")
+        cache = ResultCache(os.path.join(self.tmp.name, "cache"), ttl_seconds=60, max_bytes=0, memory_entries=8)
+        cache.set(key, {"doc_type": "general", "pdf_path": self.pdf_path})
+
+        os.remove(self.pdf_path)
+        fresh = ResultCache(os.path.join(self.tmp.name, "cache"), ttl_seconds=60, max_bytes=0, memory_entries=8)
+        result = fresh.get(key)
+
+        self.assertEqual(result["pdf_path"], self.pdf_path)
+        with open(self.pdf_path, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.4 test")
+
+    def test_key_depends_on_all_parts(self):
+        self.assertNotEqual(content_key("1", "gpt-4o", "text", "a"), content_key("2", "gpt-4o", "text", "a"))
+        self.assertNotEqual(content_key("1", "gpt-4o", "text", "a"), content_key("1", "gpt-4o", "voice", "a"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.chunking import split_text, merge_structured, chunk_summaries
+
+class TestSplitText(unittest.TestCase):
+    def test_splits_on_speaker_turns(self):
+        turns = [f"Speaker {i % 2}: " + ("word " * 40).strip() for i in range(10)]
+        text = "\n".join(turns)
+
+        chunks = split_text(text, max_chars=500)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 500 for chunk in chunks))
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith("Speaker "))
+        self.assertEqual(sum(chunk.count("Speaker ") for chunk in chunks), 10)
+
+    def test_oversized_paragraph_is_split_on_sentences(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(100))
+        chunks = split_text(text, max_chars=200)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+        self.assertTrue(all(chunk.endswith(".") for chunk in chunks))
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_text("short", 100), ["short"])
+
+class TestMergeStructured(unittest.TestCase):
+    def test_meeting_notes_merge(self):
+        parts = [
+            {"title": "Weekly Sync", "content": {
+                "summary": "Part one.",
+                "attendees": ["Alice", "Bob"],
+                "action_items": [{"owner": "Alice", "task": "Fix login bug", "due_date": None}],
+                "key_decisions": ["Ship Friday"],
+            }},
+            {"title": "Sync (cont.)", "content": {
+                "summary": "Part two.",
+                "attendees": ["bob", "Carol"],
+                "action_items": [
+                    {"owner": "alice", "task": "Fix  login bug", "due_date": "Friday"},
+                    {"owner": "Carol", "task": "Write docs", "due_date": None},
+                ],
+                "key_decisions": ["Delay dark mode"],
+            }},
+        ]
+
+        merged = merge_structured(parts, "meeting_notes")
+        content = merged["content"]
+
+        self.assertEqual(merged["title"], "Weekly Sync")
+        self.assertEqual(content["attendees"], ["Alice", "Bob", "Carol"])
+        self.assertEqual(content["action_items"], [
+            {"owner": "Alice", "task": "Fix login bug", "due_date": "Friday"},
+            {"owner": "Carol", "task": "Write docs", "due_date": None},
+        ])
+        self.assertEqual(content["key_decisions"], ["Ship Friday", "Delay dark mode"])
+        self.assertEqual(chunk_summaries(parts, "meeting_notes"), ["Part one.", "Part two."])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,27 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import asyncio
+import json
 import sys
 import os
 
+import httpx
+import hashlib
+import tempfile
+
 sys.path.append(os.path.join(os.getcwd()))
-from services.deepgram import DeepgramClient
+from services.deepgram import DeepgramClient, columnar_words, expand_columnar_words
+from core.uploads import UploadTooLargeError
+from core.cache import DiskCache
+from core.metrics import TRANSCRIPT_CACHE_LOOKUPS
 
 class TestDeepgramClient(unittest.TestCase):
     def setUp(self):
         self.client = DeepgramClient()
         self.client.api_key = "fake-key"
+        self.client.cache = None
 
-    @patch('services.deepgram.requests.post')
+    @patch('services.deepgram.http_pool.session.post')
     def test_transcribe_bytes(self, mock_post):
         # Mock successful response
         mock_post.return_value.status_code = 200
@@ -36,7 +46,7 @@ class TestDeepgramClient(unittest.TestCase):
         self.assertEqual(result["transcript"], "Hello world.")
         self.assertEqual(result["formatted_transcript"], "Speaker 0: Hello world.")
 
-    @patch('services.deepgram.requests.post')
+    @patch('services.deepgram.http_pool.session.post')
     def test_transcribe_file(self, mock_post):
         # Mock successful response
         mock_post.return_value.status_code = 200
@@ -63,5 +73,203 @@ class TestDeepgramClient(unittest.TestCase):
             if os.path.exists(dummy_file):
                 os.remove(dummy_file)
 
+VOCABULARY = "we should ship the new release next week once the tests pass and docs are ready".split()
+
+def _words(count, speakers=3, words_per_turn=40):
+    """Word objects shaped like Deepgram's (diarized, smart formatted)."""
+    return [{
+        "word": VOCABULARY[i % len(VOCABULARY)],
+        "start": i * 0.3471 + 0.0123,
+        "end": i * 0.3471 + 0.2987,
+        "confidence": 0.99853516 - (i % 7) * 0.0371,
+        "speaker": (i // words_per_turn) % speakers,
+        "speaker_confidence": 0.5830078,
+        "punctuated_word": VOCABULARY[i % len(VOCABULARY)] + ("." if i % 10 == 9 else ""),
+    } for i in range(count)]
+
+class TestTranscriptAssembly(unittest.TestCase):
+    def setUp(self):
+        self.client = DeepgramClient()
+
+    def _response(self, words):
+        transcript = " ".join(w["punctuated_word"] for w in words)
+        return {"results": {"channels": [{"alternatives": [{"transcript": transcript, "confidence": 0.9, "words": words}]}]}}
+
+    def test_words_are_grouped_into_speaker_turns(self):
+        words = _words(100, words_per_turn=40)
+        result = self.client._process_response(self._response(words))
+
+        turns = result["speaker_turns"]
+        self.assertEqual([(t["speaker"], t["words"]) for t in turns], [(0, 40), (1, 40), (2, 20)])
+        self.assertEqual(turns[1]["start"], words[40]["start"])
+        self.assertEqual(turns[1]["end"], words[79]["end"])
+        paragraphs = result["formatted_transcript"].split("\n\n")
+        self.assertEqual(len(paragraphs), 3)
+        self.assertEqual(paragraphs[2], "Speaker 2: " + " ".join(w["punctuated_word"] for w in words[80:]))
+
+    def test_columnar_word_timings_round_trip_and_are_compact(self):
+        words = _words(10000)  # about an hour of speech
+        timings = columnar_words(words)
+
+        expanded = expand_columnar_words(timings)
+        self.assertEqual(len(expanded), len(words))
+        for original, restored in zip(words[::997], expanded[::997]):
+            self.assertEqual(restored["punctuated_word"], original["punctuated_word"])
+            self.assertAlmostEqual(restored["start"], original["start"], delta=0.001)
+            self.assertAlmostEqual(restored["end"], original["end"], delta=0.001)
+            self.assertEqual(restored["speaker"], original["speaker"])
+        # As serialized in responses (compact separators)
+        compact = lambda value: len(json.dumps(value, separators=(",", ":")))
+        self.assertLess(compact(timings) * 9, compact(words))
+
+    def test_word_format_selects_the_payload(self):
+        response = self._response(_words(5))
+        self.assertEqual(len(self.client._process_response(response)["words"]), 5)
+        self.assertEqual(self.client._process_response(response, "columnar")["word_timings"]["count"], 5)
+        minimal = self.client._process_response(response, "none")
+        self.assertNotIn("words", minimal)
+        self.assertNotIn("word_timings", minimal)
+
+class TestDeepgramStreaming(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = DeepgramClient()
+        self.client.api_key = "fake-key"
+        self.client.cache = None
+        self.received = []
+
+    async def _handler(self, request: httpx.Request) -> httpx.Response:
+        self.received.append((request.headers, [chunk async for chunk in request.stream]))
+        return httpx.Response(200, json={
+            "results": {"channels": [{"alternatives": [{"transcript": "Streamed.", "words": []}]}]}
+        })
+
+    async def _transcribe(self, chunks, content_type=None):
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self._handler))
+        with patch('services.deepgram.http_pool.async_client', return_value=http):
+            try:
+                return await self.client.transcribe_stream_async(chunks, content_type)
+            finally:
+                await http.aclose()
+
+    async def test_chunks_are_sent_as_a_streamed_body(self):
+        async def chunks():
+            for i in range(5):
+                yield b"audio-%d" % i
+
+        result = await self._transcribe(chunks(), "audio/wav")
+
+        headers, body = self.received[0]
+        self.assertEqual(result["transcript"], "Streamed.")
+        self.assertEqual(b"".join(body), b"audio-0audio-1audio-2audio-3audio-4")
+        self.assertEqual(headers["content-type"], "audio/wav")
+        self.assertEqual(headers["transfer-encoding"], "chunked")
+
+    async def test_upload_errors_propagate(self):
+        async def chunks():
+            yield b"audio"
+            raise UploadTooLargeError(5)
+
+        with self.assertRaises(UploadTooLargeError):
+            await self._transcribe(chunks(), "application/octet-stream")
+
+class TestTranscriptCache(unittest.IsolatedAsyncioTestCase):
+    RESPONSE = {"results": {"channels": [{"alternatives": [{
+        "transcript": "Hello again.", "confidence": 0.9,
+        "words": [{"word": "hello", "punctuated_word": "Hello", "start": 0.0, "end": 0.4, "speaker": 0},
+                  {"word": "again", "punctuated_word": "again.", "start": 0.5, "end": 0.9, "speaker": 0}],
+    }]}]}}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = DeepgramClient()
+        self.client.api_key = "fake-key"
+        self.client.cache = DiskCache(self.tmp.name, ttl_seconds=60, max_bytes=0)
+        self.requests = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def _handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(await request.aread())
+        return httpx.Response(200, json=self.RESPONSE)
+
+    @patch('services.deepgram.http_pool.session.post')
+    def test_repeated_audio_is_served_from_cache(self, mock_post):
+        mock_post.return_value.json.return_value = self.RESPONSE
+        hits, misses = TRANSCRIPT_CACHE_LOOKUPS.value(result="hit"), TRANSCRIPT_CACHE_LOOKUPS.value(result="miss")
+
+        first = self.client.transcribe_bytes(b"same-audio")
+        second = self.client.transcribe_bytes(b"same-audio")
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual((first["cached"], second["cached"]), (False, True))
+        self.assertEqual(second["formatted_transcript"], first["formatted_transcript"])
+        self.assertEqual(second["words"], first["words"])
+        self.assertEqual(TRANSCRIPT_CACHE_LOOKUPS.value(result="hit"), hits + 1)
+        self.assertEqual(TRANSCRIPT_CACHE_LOOKUPS.value(result="miss"), misses + 1)
+
+    @patch('services.deepgram.http_pool.session.post')
+    def test_key_covers_audio_and_settings(self, mock_post):
+        mock_post.return_value.json.return_value = self.RESPONSE
+        self.client.transcribe_bytes(b"same-audio")
+        self.client.transcribe_bytes(b"other-audio")
+        with patch.object(self.client, "_get_params", return_value={"model": "nova-2", "language": "de"}):
+            self.client.transcribe_bytes(b"same-audio")
+        self.assertEqual(mock_post.call_count, 3)
+
+    @patch('services.deepgram.http_pool.session.post')
+    def test_failures_are_not_cached(self, mock_post):
+        mock_post.return_value.raise_for_status.side_effect = Exception("502 Bad Gateway")
+        self.assertIn("error", self.client.transcribe_bytes(b"same-audio"))
+        mock_post.return_value.raise_for_status.side_effect = None
+        mock_post.return_value.json.return_value = self.RESPONSE
+        self.assertFalse(self.client.transcribe_bytes(b"same-audio")["cached"])
+
+    async def test_upload_is_fingerprinted_while_spooled(self):
+        async def chunks():
+            for i in range(4):
+                yield b"chunk-%d" % i
+
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self._handler))
+        with patch('services.deepgram.http_pool.async_client', return_value=http):
+            first = await self.client.transcribe_upload_async(chunks(), "audio/mpeg", "talk.mp3")
+            second = await self.client.transcribe_upload_async(chunks(), "audio/mpeg", "talk.mp3", word_format="columnar")
+        await http.aclose()
+
+        self.assertEqual(self.requests, [b"chunk-0chunk-1chunk-2chunk-3"])
+        self.assertEqual((first["cached"], second["cached"]), (False, True))
+        self.assertEqual([w["punctuated_word"] for w in first["words"]], ["Hello", "again."])
+        self.assertEqual(second["word_timings"]["text"], "Hello again.")
+        digest = hashlib.sha256(b"chunk-0chunk-1chunk-2chunk-3").hexdigest()
+        self.assertIsNotNone(self.client.cache.get(self.client._cache_key(digest)))
+
+    async def test_large_uploads_are_spooled_in_blocks(self):
+        parts = [bytes([i]) * 50000 for i in range(5)]
+
+        async def chunks():
+            for part in parts:
+                yield part
+
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self._handler))
+        with patch('services.deepgram.http_pool.async_client', return_value=http), \
+                patch('services.deepgram.asyncio.to_thread', wraps=asyncio.to_thread) as to_thread:
+            result = await self.client.transcribe_upload_async(chunks(), "audio/mpeg", "talk.mp3")
+        await http.aclose()
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.requests, [b"".join(parts)])
+        spooled = [c.args[1] for c in to_thread.call_args_list if getattr(c.args[0], "__name__", "") == "spool_block"]
+        self.assertEqual(b"".join(spooled), b"".join(parts))
+        self.assertEqual(len(spooled), 3)
+
+    async def test_upload_errors_propagate_before_any_request(self):
+        async def chunks():
+            yield b"audio"
+            raise UploadTooLargeError(5)
+
+        with self.assertRaises(UploadTooLargeError):
+            await self.client.transcribe_upload_async(chunks(), "audio/mpeg")
+        self.assertEqual(self.requests, [])
+
 if __name__ == '__main__':
     unittest.main()
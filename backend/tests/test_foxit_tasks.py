@@ -0,0 +1,204 @@
+import unittest
+import tempfile
+import asyncio
+import threading
+import json
+import time
+import sys
+import os
+
+import httpx
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.foxit import FoxitClient, FoxitTaskEngine, FoxitTaskError
+
+BASE = "https://foxit.test/pdf-services"
+
+class FakeFoxitServer:
+    """
+    In-memory PDF Services: uploads become documents, tasks complete after
+    `polls_to_complete` status checks and produce "<input>+enhanced".
+    """
+
+    def __init__(self, polls_to_complete=3, batch=True, fail_tasks=(), rate_limit_once=False):
+        self.polls_to_complete = polls_to_complete
+        self.batch = batch
+        self.fail_tasks = set(fail_tasks)
+        self.rate_limit_once = rate_limit_once
+        self.documents = {}
+        self.tasks = {}
+        self.requests = {"upload": 0, "submit": 0, "batch_status": 0, "status": 0, "download": 0}
+
+    def _status(self, task_id):
+        task = self.tasks[task_id]
+        task["polls"] += 1
+        if task_id in self.fail_tasks:
+            return {"taskId": task_id, "status": "FAILED", "message": "bad input"}
+        if task["polls"] < self.polls_to_complete:
+            return {"taskId": task_id, "status": "PROCESSING"}
+        result_id = f"result-{task_id}"
+        self.documents[result_id] = self.documents[task["documentId"]] + b"+enhanced"
+        return {"taskId": task_id, "status": "COMPLETED", "resultDocumentId": result_id}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.replace("/pdf-services/", "", 1)
+        if path == "documents/upload":
+            self.requests["upload"] += 1
+            body = request.read()
+            document_id = f"doc-{len(self.documents)}"
+            # The multipart body carries the file bytes between its headers and the boundary
+            self.documents[document_id] = body.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n--", 1)[0]
+            return httpx.Response(200, json={"documentId": document_id})
+        if path.startswith("documents/") and path.endswith("/download"):
+            self.requests["download"] += 1
+            return httpx.Response(200, content=self.documents[path.split("/")[1]])
+        if path == "tasks":
+            # Counts attempts, including the ones refused below
+            self.requests["batch_status"] += 1
+            if not self.batch:
+                return httpx.Response(404)
+            if self.rate_limit_once:
+                self.rate_limit_once = False
+                return httpx.Response(429, headers={"Retry-After": "0.05"})
+            ids = request.url.params["taskIds"].split(",")
+            return httpx.Response(200, json={"tasks": [self._status(t) for t in ids]})
+        if path.startswith("tasks/"):
+            self.requests["status"] += 1
+            return httpx.Response(200, json=self._status(path.split("/", 1)[1]))
+        self.requests["submit"] += 1
+        task_id = f"task-{len(self.tasks)}"
+        self.tasks[task_id] = {"documentId": json.loads(request.read())["documentId"], "polls": 0}
+        return httpx.Response(200, json={"taskId": task_id})
+
+class HeldClock:
+    """
+    Monotonic clock that stands still until `release()`, then resumes from
+    `hold_for` later: tasks that start waiting while it is held all come due
+    at the same instant, whatever the scheduling.
+    """
+
+    def __init__(self, hold_for):
+        self.held_at = time.monotonic()
+        self.hold_for = hold_for
+        self.released_at = None
+
+    def release(self):
+        self.released_at = time.monotonic()
+
+    def __call__(self):
+        if self.released_at is None:
+            return self.held_at
+        return self.held_at + self.hold_for + time.monotonic() - self.released_at
+
+def _engine(server, **kwargs):
+    client = FoxitClient()
+    client._async_http = httpx.AsyncClient(transport=httpx.MockTransport(server))
+    kwargs.setdefault("poll_initial", 0.01)
+    kwargs.setdefault("poll_max", 0.04)
+    kwargs.setdefault("timeout", 5)
+    return client, FoxitTaskEngine(client, BASE, **kwargs)
+
+class TestFoxitTaskEngine(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _pdf(self, index):
+        path = os.path.join(self.tmp.name, f"in-{index}.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%%PDF-%d" % index)
+        return path
+
+    async def test_run_uploads_polls_and_downloads(self):
+        server = FakeFoxitServer(polls_to_complete=3)
+        client, engine = _engine(server)
+        output = os.path.join(self.tmp.name, "out.pdf")
+
+        await engine.run(self._pdf(1), output, "documents/enhance/pdf-watermark", {"watermark": "X"})
+        await client.aclose()
+
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1+enhanced")
+        self.assertEqual(server.tasks["task-0"]["polls"], 3)
+        self.assertEqual(engine.outstanding, 0)
+
+    async def test_many_tasks_share_batched_status_checks_on_one_thread(self):
+        server = FakeFoxitServer(polls_to_complete=4)
+        client, engine = _engine(server, batch_size=100)
+        threads_before = threading.active_count()
+
+        outputs = [os.path.join(self.tmp.name, f"out-{i}.pdf") for i in range(200)]
+        await asyncio.gather(*(engine.run(self._pdf(i), out, "op") for i, out in enumerate(outputs)))
+        await client.aclose()
+
+        for i, out in enumerate(outputs):
+            with open(out, "rb") as f:
+                self.assertEqual(f.read(), b"%%PDF-%d+enhanced" % i)
+        self.assertEqual(threading.active_count(), threads_before)
+        # 800 task polls folded into far fewer status requests
+        self.assertGreater(server.requests["batch_status"], 0)
+        self.assertLess(server.requests["batch_status"] + server.requests["status"], 200)
+
+    async def test_falls_back_to_single_status_requests(self):
+        server = FakeFoxitServer(polls_to_complete=2, batch=False)
+        clock = HeldClock(hold_for=0.01)
+        client, engine = _engine(server, clock=clock)
+
+        outputs = [os.path.join(self.tmp.name, f"out-{i}.pdf") for i in range(3)]
+        runs = asyncio.gather(*(engine.run(self._pdf(i), out, "op") for i, out in enumerate(outputs)))
+        while engine.outstanding < 3:
+            await asyncio.sleep(0.001)
+        clock.release()
+        await runs
+        await client.aclose()
+
+        # The first poll covers all three tasks: one batch attempt, then single requests only
+        self.assertEqual(server.requests["batch_status"], 1)
+        self.assertFalse(engine.batch_supported)
+        self.assertEqual(server.requests["status"], 6)
+        self.assertTrue(all(os.path.exists(out) for out in outputs))
+
+    async def test_failed_task_raises_without_affecting_others(self):
+        server = FakeFoxitServer(polls_to_complete=2, fail_tasks={"task-0"})
+        client, engine = _engine(server)
+
+        results = await asyncio.gather(
+            engine.run(self._pdf(0), os.path.join(self.tmp.name, "a.pdf"), "op"),
+            engine.run(self._pdf(1), os.path.join(self.tmp.name, "b.pdf"), "op"),
+            return_exceptions=True,
+        )
+        await client.aclose()
+
+        self.assertEqual(sum(isinstance(r, FoxitTaskError) for r in results), 1)
+        self.assertEqual(sum(isinstance(r, str) for r in results), 1)
+
+    async def test_timeout_and_rate_limit(self):
+        server = FakeFoxitServer(polls_to_complete=1000, rate_limit_once=True)
+        client, engine = _engine(server, timeout=0.2)
+
+        results = await asyncio.gather(
+            *(engine.run(self._pdf(i), os.path.join(self.tmp.name, f"{i}.pdf"), "op") for i in range(2)),
+            return_exceptions=True,
+        )
+        await client.aclose()
+
+        self.assertTrue(all(isinstance(r, FoxitTaskError) for r in results))
+        self.assertFalse(any(name.endswith(".pdf") and not name.startswith("in-") for name in os.listdir(self.tmp.name)))
+
+    async def test_backoff_grows_to_the_cap(self):
+        server = FakeFoxitServer()
+        client, engine = _engine(server, poll_initial=0.1, poll_max=0.5)
+        pending = type("P", (), {"interval": 0.1, "started": 0.0})()
+
+        intervals = [engine._next_interval(pending, {"status": "PROCESSING"}, 1.0) for _ in range(5)]
+        await client.aclose()
+
+        self.assertLessEqual(intervals[0], 0.2 * 1.2)
+        self.assertEqual(pending.interval, 0.5)
+        # A progress report replaces backoff with the extrapolated remaining time
+        self.assertAlmostEqual(engine._next_interval(pending, {"progress": 75}, 0.3), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
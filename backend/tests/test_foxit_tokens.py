@@ -0,0 +1,139 @@
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.foxit import FoxitTokenManager
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeAuth:
+    """Counts fetches; each fetch returns a new token with the given lifetime."""
+
+    def __init__(self, expires_in=3600, delay=0.0, fail=False):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.fail:
+            raise RuntimeError("auth down")
+        return f"token-{calls}", self.expires_in
+
+    def fetch(self):
+        time.sleep(self.delay)
+        return self._next()
+
+    async def fetch_async(self):
+        await asyncio.sleep(self.delay)
+        return self._next()
+
+def _manager(auth, clock=None, **kwargs):
+    kwargs.setdefault("refresh_margin", 60)
+    kwargs.setdefault("retry_seconds", 5)
+    return FoxitTokenManager(auth.fetch, auth.fetch_async, clock=clock or FakeClock(), **kwargs)
+
+class TestFoxitTokenManager(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_refresh(self):
+        auth = FakeAuth(delay=0.05)
+        manager = _manager(auth)
+
+        tokens = await asyncio.gather(*(manager.get_token_async() for _ in range(20)))
+
+        self.assertEqual(auth.calls, 1)
+        self.assertEqual(set(tokens), {"token-1"})
+
+    async def test_token_is_cached_until_refresh_window(self):
+        auth = FakeAuth(expires_in=600)
+        clock = FakeClock()
+        manager = _manager(auth, clock)
+
+        self.assertEqual(await manager.get_token_async(), "token-1")
+        clock.now += 500
+        self.assertEqual(await manager.get_token_async(), "token-1")
+        self.assertEqual(auth.calls, 1)
+
+    async def test_refresh_window_serves_cached_token_while_refreshing(self):
+        auth = FakeAuth(expires_in=600)
+        clock = FakeClock()
+        manager = _manager(auth, clock)
+        await manager.get_token_async()
+
+        clock.now += 570  # inside the 60s margin, not yet expired
+        self.assertEqual(await manager.get_token_async(), "token-1")
+        await asyncio.sleep(0)
+        await manager._refresh_task
+        self.assertEqual(await manager.get_token_async(), "token-2")
+
+    async def test_expired_token_is_never_served(self):
+        auth = FakeAuth(expires_in=600)
+        clock = FakeClock()
+        manager = _manager(auth, clock)
+        await manager.get_token_async()
+
+        clock.now += 601
+        self.assertIsNone(manager.token)
+        self.assertEqual(await manager.get_token_async(), "token-2")
+
+    async def test_failed_fetch_waits_before_retrying(self):
+        auth = FakeAuth(fail=True)
+        clock = FakeClock()
+        manager = _manager(auth, clock)
+
+        self.assertIsNone(await manager.get_token_async())
+        self.assertIsNone(await manager.get_token_async())
+        self.assertEqual(auth.calls, 1)
+
+        clock.now += 6
+        auth.fail = False
+        self.assertEqual(await manager.get_token_async(), "token-2")
+
+    async def test_background_loop_refreshes_ahead_of_expiry(self):
+        auth = FakeAuth(expires_in=0.2)
+        manager = FoxitTokenManager(auth.fetch, auth.fetch_async, refresh_margin=60, retry_seconds=1)
+
+        await manager.start()
+        await asyncio.sleep(0.35)
+        await manager.stop()
+
+        # Short-lived tokens refresh at half-life, before they run out
+        self.assertGreaterEqual(auth.calls, 3)
+        self.assertIsNotNone(manager.token)
+
+    async def test_invalidate_forces_refresh(self):
+        auth = FakeAuth()
+        manager = _manager(auth)
+        await manager.get_token_async()
+        manager.invalidate()
+        self.assertEqual(await manager.get_token_async(), "token-2")
+
+class TestFoxitTokenManagerSync(unittest.TestCase):
+    def test_threads_share_one_refresh(self):
+        auth = FakeAuth(delay=0.05)
+        manager = _manager(auth)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(manager.get_token())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(auth.calls, 1)
+        self.assertEqual(set(results), {"token-1"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import threading
+import asyncio
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from requests.adapters import BaseAdapter
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.http import HttpPool
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def _reply(self):
+        server = self.server
+        server.requests += 1
+        server.clients.add(self.client_address)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        status = 503 if server.failures > 0 else 200
+        server.failures -= 1
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+class _PlainAdapter(BaseAdapter):
+    """Transport adapter without a urllib3 pool manager."""
+
+    def close(self):
+        pass
+
+class TestHttpPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = 0
+        self.server.failures = 0
+        self.server.clients = set()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pool = HttpPool(hosts=2, per_host=4, retries=2, backoff=0.01)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sync_requests_reuse_one_connection(self):
+        for _ in range(5):
+            self.assertEqual(self.pool.session.get(self.url).status_code, 200)
+
+        stats = self.pool.stats()["sync"][f"http://127.0.0.1:{self.server.server_port}"]
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["idle"], 1)
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_idempotent_requests_retry_but_posts_do_not(self):
+        self.server.failures = 2
+        self.assertEqual(self.pool.session.get(self.url).status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+
+        self.server.failures = 1
+        self.assertEqual(self.pool.session.post(self.url, json={}).status_code, 503)
+        self.assertEqual(self.server.requests, 4)
+
+    async def test_async_client_is_shared_and_keeps_connections_alive(self):
+        client = self.pool.async_client()
+        self.assertIs(client, self.pool.async_client())
+
+        self.server.failures = 1
+        for _ in range(4):
+            self.assertEqual((await client.get(self.url)).status_code, 200)
+        self.assertEqual(self.server.requests, 5)  # one retried 503
+        self.assertEqual((await client.post(self.url, json={})).status_code, 200)
+
+        stats = self.pool.stats()["async"][f"http://127.0.0.1:{self.server.server_port}"]
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(len(self.server.clients), 1)
+
+    async def test_stats_tolerate_clients_without_pool_internals(self):
+        self.pool.session.mount("custom://", _PlainAdapter())
+        self.pool._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+        self.pool.session.get(self.url)
+
+        stats = self.pool.stats()
+        self.assertIn(f"http://127.0.0.1:{self.server.server_port}", stats["sync"])
+        self.assertEqual(stats["async"], {})
+
+    async def test_close_releases_both_clients(self):
+        client = self.pool.async_client()
+        await client.get(self.url)
+        session = self.pool.session
+
+        await self.pool.close()
+
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(self.pool.session, session)
+        self.assertIsNot(self.pool.async_client(), client)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.jobs import JobStore, JobQueue, QueueFullError, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_interrupted_jobs_survive_restart(self):
+        store = JobStore(self.db_path)
+        queued = store.create("notes 1", "text")
+        running = store.create("notes 2", "text")
+        store.update(running["job_id"], status=JOB_RUNNING, stages={**running["stages"], "classify": "done"})
+        store.close()
+
+        reopened = JobStore(self.db_path)
+        self.assertEqual(reopened.recover(), [queued["job_id"], running["job_id"]])
+        job = reopened.get(running["job_id"])
+        self.assertEqual(job["status"], JOB_QUEUED)
+        self.assertEqual(job["stages"]["classify"], "pending")
+        reopened.close()
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.tmp.name, "jobs.sqlite3"))
+
+    async def asyncTearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    async def _wait_for(self, queue, job_id, statuses=(JOB_SUCCEEDED, JOB_FAILED)):
+        for _ in range(100):
+            job = await queue.get(job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.01)
+        self.fail("job did not finish")
+
+    async def test_job_reports_stages_and_result(self):
+        async def fake_pipeline(text, source_type, on_stage=None):
+            for stage in ("classify", "structure", "render", "enhance", "store"):
+                await on_stage(stage, "running")
+                await on_stage(stage, "done")
+            return {"doc_type": "general", "title": "T", "structured_data": {}, "pdf_path": "output/x.pdf", "cached": False}
+
+        queue = JobQueue(self.store, workers=2, max_pending=10)
+        with patch("core.jobs.process_document_pipeline_async", fake_pipeline):
+            await queue.start()
+            job = await queue.submit("hello", "text")
+            job = await self._wait_for(queue, job["job_id"])
+            await queue.stop()
+
+        self.assertEqual(job["status"], JOB_SUCCEEDED)
+        self.assertTrue(all(status == "done" for status in job["stages"].values()))
+        self.assertEqual(job["result"]["pdf_path"], "output/x.pdf")
+
+    async def test_failed_stage_is_marked(self):
+        async def failing_pipeline(text, source_type, on_stage=None):
+            await on_stage("classify", "running")
+            raise RuntimeError("boom")
+
+        queue = JobQueue(self.store, workers=1, max_pending=10)
+        with patch("core.jobs.process_document_pipeline_async", failing_pipeline):
+            await queue.start()
+            job = await queue.submit("hello", "text")
+            job = await self._wait_for(queue, job["job_id"])
+            await queue.stop()
+
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertEqual(job["stages"]["classify"], "failed")
+        self.assertEqual(job["error"], "boom")
+
+    async def test_store_is_opened_on_start_and_closed_on_stop(self):
+        db_path = os.path.join(self.tmp.name, "lifespan", "jobs.sqlite3")
+        queue = JobQueue(workers=0, db_path=db_path)
+        self.assertFalse(os.path.exists(db_path))
+
+        await queue.start()
+        job = await queue.submit("hello", "text")
+        await queue.stop()
+
+        self.assertIsNone(queue.store)
+        reopened = JobStore(db_path)
+        self.assertEqual(reopened.get(job["job_id"])["status"], JOB_QUEUED)
+        reopened.close()
+
+    async def test_sweep_deletes_only_old_finished_jobs(self):
+        old_done, old_failed, old_queued, recent = (self.store.create(f"notes {i}", "text") for i in range(4))
+        self.store.update(old_done["job_id"], status=JOB_SUCCEEDED)
+        self.store.update(old_failed["job_id"], status=JOB_FAILED)
+        self.store.update(recent["job_id"], status=JOB_SUCCEEDED)
+        long_ago = "2000-01-01T00:00:00"
+        with self.store._lock, self.store._conn:
+            self.store._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id IN (?, ?, ?)",
+                (long_ago, old_done["job_id"], old_failed["job_id"], old_queued["job_id"]),
+            )
+
+        queue = JobQueue(self.store, workers=0, retention_seconds=3600)
+        self.assertEqual(await queue.sweep(), 2)
+
+        self.assertIsNone(self.store.get(old_done["job_id"]))
+        self.assertIsNone(self.store.get(old_failed["job_id"]))
+        self.assertIsNotNone(self.store.get(old_queued["job_id"]))
+        self.assertIsNotNone(self.store.get(recent["job_id"]))
+
+    async def test_rejects_when_full(self):
+        queue = JobQueue(self.store, workers=0, max_pending=1)
+        await queue.start()
+        await queue.submit("one", "text")
+        with self.assertRaises(QueueFullError):
+            await queue.submit("two", "text")
+        await queue.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import json
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.json_stream import JSONSectionStream
+
+DOC = {
+    "doc_type": "meeting_notes",
+    "title": "Sync, \"quoted\" {braces}",
+    "content": {
+        "summary": "a, b } c",
+        "attendees": ["Alice", "Bob"],
+        "action_items": [{"owner": "Alice", "task": "Fix {x}, y", "due_date": None}],
+        "key_decisions": []
+    }
+}
+
+class TestJSONSectionStream(unittest.TestCase):
+    def _feed_in_chunks(self, text, size):
+        parser = JSONSectionStream()
+        events = []
+        for i in range(0, len(text), size):
+            events.extend(parser.feed(text[i:i + size]))
+        return parser, events
+
+    def test_emits_each_section_once_complete(self):
+        expected = [
+            (("doc_type",), "meeting_notes"),
+            (("title",), DOC["title"]),
+        ] + [(("content", key), value) for key, value in DOC["content"].items()]
+
+        for indent in (None, 2):
+            for size in (1, 3, 17):
+                parser, events = self._feed_in_chunks(json.dumps(DOC, indent=indent), size)
+                self.assertEqual(events, expected)
+                self.assertEqual(parser.result(), DOC)
+
+    def test_section_not_emitted_before_it_is_complete(self):
+        parser = JSONSectionStream()
+        events = parser.feed('{"doc_type": "prd", "content": {"overview": "Search", "goals": ["a", "b"')
+        self.assertEqual(events, [(("doc_type",), "prd"), (("content", "overview"), "Search")])
+        self.assertIsNone(parser.result())
+
+        events = parser.feed("]}}")
+        self.assertEqual(events, [(("content", "goals"), ["a", "b"])])
+
+    def test_output_after_the_root_object_is_ignored(self):
+        parser = JSONSectionStream()
+        self.assertEqual(parser.feed('{"a": 1}'), [(("a",), 1)])
+        self.assertEqual(parser.feed('}'), [])
+        self.assertEqual(parser.feed(']} {"b": 2}'), [])
+        self.assertEqual(parser.result(), {"a": 1})
+
+        stray = JSONSectionStream()
+        self.assertEqual(stray.feed('} {"a": 1}'), [(("a",), 1)])
+        self.assertEqual(stray.result(), {"a": 1})
+
+if __name__ == '__main__':
+    unittest.main()
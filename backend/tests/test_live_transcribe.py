@@ -0,0 +1,240 @@
+import unittest
+import threading
+import asyncio
+import json
+import time
+import io
+import sys
+import os
+from unittest.mock import patch
+from contextlib import redirect_stdout
+
+from websockets.asyncio.server import serve
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.getcwd()))
+import main
+from services.deepgram import DeepgramClient, live_segments
+from core.metrics import DEEPGRAM_LIVE_SESSIONS
+
+class FakeDeepgramLive:
+    """
+    Local stand-in for Deepgram's live API, on its own thread and loop.
+    Each audio message is one word, b"<word>:<speaker>". Every audio message
+    gets an interim result for the words not yet final; every second word
+    (and CloseStream) settles them in a final result.
+    """
+
+    def __init__(self):
+        self.audio = []
+        self.control = []
+        self.requests = []
+        self.connections = []
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), daemon=True).start()
+        ready.wait()
+        self.url = f"ws://127.0.0.1:{self.port}/v1/listen"
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+
+        async def start():
+            self.server = await serve(self._handle, "127.0.0.1", 0)
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+
+        self.loop.run_until_complete(start())
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+
+    async def hang_up(self):
+        """Closes every connection from the server side, like Deepgram's idle timeout."""
+        await asyncio.gather(*(
+            asyncio.wrap_future(asyncio.run_coroutine_threadsafe(connection.close(), self.loop))
+            for connection in self.connections
+        ))
+
+    @staticmethod
+    def _results(words, is_final, speech_final=False):
+        return json.dumps({
+            "type": "Results",
+            "is_final": is_final,
+            "speech_final": speech_final,
+            "start": words[0]["start"] if words else 0,
+            "duration": 1.0,
+            "channel": {"alternatives": [{
+                "transcript": " ".join(w["punctuated_word"] for w in words),
+                "confidence": 0.9,
+                "words": words,
+            }]},
+        })
+
+    async def _handle(self, connection):
+        self.requests.append((connection.request.path, connection.request.headers.get("Authorization")))
+        self.connections.append(connection)
+        pending = []
+        async for message in connection:
+            if isinstance(message, bytes):
+                word, speaker = message.decode().split(":")
+                self.audio.append(message)
+                index = len(self.audio) - 1
+                pending.append({"word": word.lower(), "punctuated_word": word, "speaker": int(speaker),
+                                "start": float(index), "end": index + 0.5, "confidence": 0.9})
+                await connection.send(self._results(pending, is_final=False))
+                if len(pending) == 2:
+                    await connection.send(self._results(pending, is_final=True))
+                    pending = []
+                continue
+            control = json.loads(message)["type"]
+            self.control.append(control)
+            if control == "CloseStream":
+                if pending:
+                    await connection.send(self._results(pending, is_final=True, speech_final=True))
+                await connection.send(json.dumps({"type": "Metadata", "duration": len(self.audio)}))
+                await connection.close()
+                return
+
+class TestLiveSegments(unittest.TestCase):
+    def test_results_are_split_into_speaker_runs(self):
+        message = json.loads(FakeDeepgramLive._results([
+            {"word": "hi", "punctuated_word": "Hi,", "speaker": 0, "start": 0.0, "end": 0.3},
+            {"word": "there", "punctuated_word": "there.", "speaker": 0, "start": 0.3, "end": 0.6},
+            {"word": "hello", "punctuated_word": "Hello.", "speaker": 1, "start": 0.8, "end": 1.1},
+        ], is_final=True, speech_final=True))
+
+        segments = live_segments(message)
+
+        self.assertEqual([(s["type"], s["speaker"], s["text"]) for s in segments],
+                         [("final", 0, "Hi, there."), ("final", 1, "Hello.")])
+        self.assertEqual((segments[1]["start"], segments[1]["end"]), (0.8, 1.1))
+        self.assertEqual([s["speech_final"] for s in segments], [False, True])
+        self.assertEqual(live_segments({"type": "Metadata"}), [])
+
+class TestDeepgramLiveSession(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeDeepgramLive()
+        self.client = DeepgramClient()
+        self.client.api_key = "fake-key"
+        self.client.live_url = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def test_audio_in_segments_out(self):
+        session = await self.client.open_live_async()
+        for chunk in (b"Hello:0", b"there.:0", b"Hi.:1"):
+            await session.send(chunk)
+        await session.finish()
+        segments = [segment async for segment in session.segments()]
+        await session.aclose()
+
+        path, auth = self.server.requests[0]
+        self.assertIn("interim_results=true", path)
+        self.assertIn("diarize=true", path)
+        self.assertEqual(auth, "Token fake-key")
+        self.assertEqual(self.server.control, ["CloseStream"])
+        finals = [s["text"] for s in segments if s["type"] == "final"]
+        self.assertEqual(finals, ["Hello there.", "Hi."])
+        self.assertIn("interim", {s["type"] for s in segments})
+
+        result = session.result()
+        self.assertEqual(result["transcript"], "Hello there. Hi.")
+        self.assertEqual([line.strip() for line in result["formatted_transcript"].split("\n\n")],
+                         ["Speaker 0: Hello there.", "Speaker 1: Hi."])
+
+    async def test_keepalive_while_no_audio_is_sent(self):
+        session = await self.client.open_live_async()
+        session._keepalive.cancel()
+        session._keepalive = asyncio.create_task(session._keepalive_loop(0.05))
+        await asyncio.sleep(0.2)
+        await session.finish()
+        [segment async for segment in session.segments()]
+        await session.aclose()
+
+        self.assertGreaterEqual(self.server.control.count("KeepAlive"), 2)
+        self.assertEqual(self.server.control[-1], "CloseStream")
+
+    async def test_server_hang_up_ends_keepalive_and_finish_quietly(self):
+        session = await self.client.open_live_async()
+        session._keepalive.cancel()
+        session._keepalive = asyncio.create_task(session._keepalive_loop(0.05))
+        await self.server.hang_up()
+        await asyncio.wait_for(asyncio.shield(session._keepalive), timeout=1)
+
+        self.assertIsNone(session._keepalive.exception())
+        await session.finish()
+        self.assertEqual([segment async for segment in session.segments()], [])
+        await session.aclose()
+
+class TestTranscribeWebSocket(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeDeepgramLive()
+        self.client = DeepgramClient()
+        self.client.api_key = "fake-key"
+        self.client.live_url = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_segments_are_pushed_as_they_arrive(self):
+        with patch.object(main, "deepgram_client", self.client), TestClient(main.app) as app:
+            with app.websocket_connect("/ws/transcribe") as ws:
+                ws.send_bytes(b"Ship:0")
+                self.assertEqual(ws.receive_json()["type"], "interim")
+                ws.send_bytes(b"it.:0")
+                ws.receive_json()
+                self.assertEqual(ws.receive_json(), {
+                    "type": "final", "speaker": 0, "text": "Ship it.", "start": 0.0, "end": 1.5, "speech_final": False,
+                })
+                ws.send_bytes(b"Agreed.:1")
+                ws.send_text(json.dumps({"type": "stop"}))
+                messages = []
+                while not messages or messages[-1]["type"] != "transcript":
+                    messages.append(ws.receive_json())
+
+        self.assertEqual(messages[-2]["text"], "Agreed.")
+        self.assertEqual([line.strip() for line in messages[-1]["formatted_transcript"].split("\n\n")],
+                         ["Speaker 0: Ship it.", "Speaker 1: Agreed."])
+
+    def test_malformed_control_messages_are_ignored(self):
+        with patch.object(main, "deepgram_client", self.client), TestClient(main.app) as app:
+            with app.websocket_connect("/ws/transcribe") as ws:
+                ws.send_text("not json")
+                ws.send_text("[1, 2]")
+                ws.send_bytes(b"Still:0")
+                ws.send_bytes(b"here.:0")
+                ws.send_text(json.dumps({"type": "stop"}))
+                messages = []
+                while not messages or messages[-1]["type"] not in ("transcript", "error"):
+                    messages.append(ws.receive_json())
+
+        self.assertEqual(messages[-1]["type"], "transcript")
+        self.assertEqual(messages[-1]["transcript"], "Still here.")
+
+    def test_client_disconnect_closes_the_stream_without_flushing(self):
+        output = io.StringIO()
+        with patch.object(main, "deepgram_client", self.client), TestClient(main.app) as app, redirect_stdout(output):
+            with app.websocket_connect("/ws/transcribe") as ws:
+                ws.send_bytes(b"Going:0")
+                self.assertEqual(ws.receive_json()["type"], "interim")
+            for _ in range(100):
+                if not DEEPGRAM_LIVE_SESSIONS.value():
+                    break
+                time.sleep(0.01)
+
+        self.assertEqual(DEEPGRAM_LIVE_SESSIONS.value(), 0)
+        self.assertNotIn("CloseStream", self.server.control)
+        self.assertNotIn("Live transcription error", output.getvalue())
+
+    def test_missing_key_reports_an_error(self):
+        self.client.api_key = None
+        with patch.object(main, "deepgram_client", self.client), TestClient(main.app) as app:
+            with app.websocket_connect("/ws/transcribe") as ws:
+                message = ws.receive_json()
+        self.assertEqual(message["type"], "error")
+
+if __name__ == '__main__':
+    unittest.main()
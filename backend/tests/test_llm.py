@@ -0,0 +1,162 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import json
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.llm import LLMService, LocalDocumentClassifier, track_fallbacks
+from core.doc_types import DocumentType, parse_doc_type
+
+def _completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+class TestSinglePass(unittest.TestCase):
+    def setUp(self):
+        self.service = LLMService()
+        self.service.client = MagicMock()
+
+    def test_returns_doc_type_and_structure_in_one_call(self):
+        self.service.client.chat.completions.create.return_value = _completion(json.dumps({
+            "doc_type": "prd",
+            "title": "PRD: Smart Search",
+            "content": {"overview": "Search"}
+        }))
+
+        result = self.service.classify_and_structure("We need smart search")
+
+        self.assertEqual(result["doc_type"], DocumentType.PRD)
+        self.assertEqual(result["structured_data"]["title"], "PRD: Smart Search")
+        self.service.client.chat.completions.create.assert_called_once()
+
+    def test_unknown_doc_type_is_ambiguous(self):
+        self.service.client.chat.completions.create.return_value = _completion(json.dumps({
+            "doc_type": "meeting_notes or prd",
+            "content": {"summary": "x"}
+        }))
+        self.assertIsNone(self.service.classify_and_structure("text"))
+
+    def test_missing_content_is_ambiguous(self):
+        self.service.client.chat.completions.create.return_value = _completion(json.dumps({
+            "doc_type": "meeting_notes"
+        }))
+        self.assertIsNone(self.service.classify_and_structure("text"))
+
+    def test_parse_doc_type_aliases(self):
+        self.assertEqual(parse_doc_type("code_docs"), DocumentType.CODE_DOCS)
+        self.assertEqual(parse_doc_type("'Meeting_Notes'"), DocumentType.MEETING_NOTES)
+        self.assertEqual(parse_doc_type("product_requirements"), DocumentType.PRD)
+        self.assertIsNone(parse_doc_type(None))
+
+class TestLocalClassifier(unittest.TestCase):
+    def setUp(self):
+        self.service = LLMService()
+        self.service.client = MagicMock()
+        self.service.local_threshold = 0.85
+
+    def test_obvious_meeting_notes_decided_locally(self):
+        text = "Team Meeting - Oct 27\nAgenda:\n1. Review Q3 metrics\nAction Items:\n- Sarah to email stakeholders"
+        self.assertEqual(self.service.classify_text(text), "meeting_notes")
+        self.service.client.chat.completions.create.assert_not_called()
+        self.assertEqual(self.service.classifier_stats()["local"], 1)
+
+    def test_code_docs_confidence(self):
+        doc_type, confidence = LocalDocumentClassifier().classify(
+            "I wrote a python function called calculate_risk. It takes a user_profile dict "
+            "and a credit_score int. Returns a float risk_factor. It raises a ValueError."
+        )
+        self.assertEqual(doc_type, DocumentType.CODE_DOCS)
+        self.assertGreater(confidence, 0.9)
+
+    def test_low_confidence_escalates_to_llm(self):
+        self.service.client.chat.completions.create.return_value = _completion("prd")
+
+        self.assertEqual(self.service.classify_text("Buy milk and eggs."), "prd")
+        self.service.client.chat.completions.create.assert_called_once()
+        stats = self.service.classifier_stats()
+        self.assertEqual((stats["local"], stats["remote"]), (0, 1))
+
+class TestAsyncCalls(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = LLMService()
+        self.service.client = MagicMock()
+        self.service.async_client = MagicMock()
+        self.service.async_client.chat.completions.create = AsyncMock()
+        self.service.local_threshold = 0.85
+
+    async def test_classify_decides_obvious_cases_locally(self):
+        text = "Team Meeting - Oct 27\nAgenda:\n1. Review Q3 metrics\nAction Items:\n- Sarah to email stakeholders"
+        self.assertEqual(await self.service.classify_text_async(text), "meeting_notes")
+        self.service.async_client.chat.completions.create.assert_not_awaited()
+
+    async def test_classify_escalates_to_the_async_client(self):
+        self.service.async_client.chat.completions.create.return_value = _completion(" PRD\n")
+
+        self.assertEqual(await self.service.classify_text_async("Buy milk and eggs."), "prd")
+        self.service.async_client.chat.completions.create.assert_awaited_once()
+        self.service.client.chat.completions.create.assert_not_called()
+
+    async def test_classify_failure_falls_back_and_is_recorded(self):
+        self.service.async_client.chat.completions.create.side_effect = RuntimeError("timeout")
+        fallbacks = track_fallbacks()
+
+        self.assertEqual(await self.service.classify_text_async("Buy milk.", use_local=False), "meeting_notes")
+        self.assertEqual(fallbacks, ["classify"])
+
+    async def test_structure_returns_the_parsed_json(self):
+        self.service.async_client.chat.completions.create.return_value = _completion(json.dumps({
+            "title": "PRD: Smart Search", "content": {"overview": "Search"}
+        }))
+
+        result = await self.service.structure_text_async("We need smart search", "prd")
+
+        self.assertEqual(result["title"], "PRD: Smart Search")
+        kwargs = self.service.async_client.chat.completions.create.await_args.kwargs
+        self.assertEqual(kwargs["response_format"], {"type": "json_object"})
+        self.service.client.chat.completions.create.assert_not_called()
+
+    async def test_structure_failure_falls_back_to_mock_data(self):
+        self.service.async_client.chat.completions.create.return_value = _completion("not json")
+        fallbacks = track_fallbacks()
+
+        result = await self.service.structure_text_async("We need smart search", "prd")
+
+        self.assertEqual(fallbacks, ["structure"])
+        self.assertEqual(result, self.service.mock_structured_data("prd"))
+
+class TestChunkedStructuring(unittest.IsolatedAsyncioTestCase):
+    async def test_chunks_run_concurrently_and_merge(self):
+        service = LLMService()
+        in_flight = {"now": 0, "max": 0}
+
+        async def create(**kwargs):
+            prompt = kwargs["messages"][-1]["content"]
+            if "response_format" not in kwargs:
+                return _completion("Whole meeting summary.")
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            speaker = "Alice" if "Speaker 0" in prompt else "Bob"
+            return _completion(json.dumps({
+                "doc_type": "meeting_notes",
+                "title": "Long Sync",
+                "content": {"summary": f"{speaker} talked.", "attendees": [speaker, "Alice"]}
+            }))
+
+        service.async_client = MagicMock()
+        service.async_client.chat.completions.create = create
+        text = "\n".join(f"Speaker {i % 2}: " + "blah " * 50 for i in range(8))
+
+        with patch("services.llm.LLM_CHUNK_THRESHOLD_CHARS", 300), patch("services.llm.LLM_CHUNK_MAX_CHARS", 300):
+            result = await service.structure_text_async(text, "meeting_notes")
+
+        self.assertGreater(in_flight["max"], 1)
+        self.assertEqual(result["content"]["attendees"], ["Alice", "Bob"])
+        self.assertEqual(result["content"]["summary"], "Whole meeting summary.")
+
+if __name__ == '__main__':
+    unittest.main()
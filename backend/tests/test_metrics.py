@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.metrics import MetricsRegistry, Timer, QUANTILE_WINDOW
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge_render(self):
+        counter = self.registry.counter("test_fallbacks_total", "Fallbacks", ("service",))
+        gauge = self.registry.gauge("test_in_flight", "In flight")
+        counter.inc(service="foxit")
+        counter.inc(2, service="foxit")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        text = self.registry.render()
+        self.assertIn("# TYPE test_fallbacks_total counter", text)
+        self.assertIn('test_fallbacks_total{service="foxit"} 3', text)
+        self.assertIn("test_in_flight 1", text)
+
+    def test_labels_must_match(self):
+        counter = self.registry.counter("test_errors_total", "Errors", ("service",))
+        with self.assertRaises(ValueError):
+            counter.inc(stage="render")
+
+    def test_histogram_buckets_and_quantiles(self):
+        histogram = self.registry.histogram("test_latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        for i in range(1, 101):
+            histogram.observe(i / 100, stage="render")
+
+        text = self.registry.render()
+        self.assertIn('test_latency_seconds_bucket{stage="render",le="0.1"} 10', text)
+        self.assertIn('test_latency_seconds_bucket{stage="render",le="1"} 100', text)
+        self.assertIn('test_latency_seconds_bucket{stage="render",le="+Inf"} 100', text)
+        self.assertIn('test_latency_seconds_count{stage="render"} 100', text)
+        self.assertAlmostEqual(histogram.quantile(0.5, stage="render"), 0.51)
+        self.assertAlmostEqual(histogram.quantile(0.99, stage="render"), 1.0)
+        self.assertIn('test_latency_seconds_quantile{stage="render",quantile="0.95"}', text)
+
+    def test_quantile_window_is_bounded(self):
+        histogram = self.registry.histogram("test_window_seconds", "Latency")
+        for _ in range(QUANTILE_WINDOW * 3):
+            histogram.observe(0.5)
+        self.assertEqual(histogram.count(), QUANTILE_WINDOW * 3)
+        self.assertEqual(len(histogram._states[()].window), QUANTILE_WINDOW)
+
+    def test_timer_tracks_in_flight_and_errors(self):
+        histogram = self.registry.histogram("test_call_seconds", "Latency", ("service",))
+        in_flight = self.registry.gauge("test_calls_in_flight", "In flight", ("service",))
+        errors = self.registry.counter("test_call_errors_total", "Errors", ("service",))
+
+        def timer():
+            return Timer(histogram, {"service": "sanity"}, in_flight, {"service": "sanity"}, errors)
+
+        with timer():
+            self.assertEqual(in_flight.value(service="sanity"), 1)
+        with self.assertRaises(RuntimeError):
+            with timer():
+                raise RuntimeError("boom")
+
+        self.assertEqual(in_flight.value(service="sanity"), 0)
+        self.assertEqual(histogram.count(service="sanity"), 2)
+        self.assertEqual(errors.value(service="sanity"), 1)
+
+class TestAsyncTimer(unittest.IsolatedAsyncioTestCase):
+    async def test_async_with(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_async_seconds", "Latency")
+        async with Timer(histogram, {}):
+            pass
+        self.assertEqual(histogram.count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+import unittest
+import tempfile
+import asyncio
+import zlib
+import json
+import re
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+sys.path.append(os.path.join(os.getcwd()))
+from core import pdf_store
+from services.foxit import FoxitClient
+from services.pdf_enhance import PdfReader
+from services.pdf_local import LocalPdfRenderer
+
+def _context(items=3):
+    return {
+        "title": "Weekly Sync (Q4)",
+        "doc_type": "meeting_notes",
+        "date": "Oct 27, 2025",
+        "structured_data": {
+            "summary": "Reviewed the roadmap and agreed on owners.",
+            "attendees": ["Alice", "Bob"],
+            "action_items": [{"task": f"Task {i}", "owner": "Alice", "deadline": "Friday"} for i in range(items)],
+        },
+    }
+
+def _page_text(pdf: bytes) -> str:
+    streams = re.findall(rb"stream\n(.*?)\nendstream", pdf, re.S)
+    return "\n".join(zlib.decompress(s).decode("latin-1") for s in streams)
+
+class TestLocalPdfRenderer(unittest.TestCase):
+    def test_renders_a_valid_pdf(self):
+        pdf = LocalPdfRenderer().render(_context())
+
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        # Every xref entry points at its object header
+        startxref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+        self.assertTrue(pdf[startxref:].startswith(b"xref"))
+        offsets = re.findall(rb"(\d{10}) 00000 n ", pdf[startxref:])
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(pdf[int(offset):].startswith(b"%d 0 obj" % number))
+
+        text = _page_text(pdf)
+        self.assertIn("(Weekly Sync \\(Q4\\)) Tj", text)
+        self.assertIn("(Action Items) Tj", text)
+        self.assertIn("(Owner) Tj", text)
+        self.assertIn("(Task 2) Tj", text)
+
+    def test_long_tables_paginate_with_repeated_header(self):
+        pdf = LocalPdfRenderer().render(_context(items=150))
+        pages = int(re.search(rb"/Count (\d+)", pdf).group(1))
+        self.assertGreater(pages, 1)
+        self.assertEqual(_page_text(pdf).count("(Deadline) Tj"), pages)
+
+class TestPdfBackendSelection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(pdf_store, "PDF_OUTPUT_DIR", self.tmp.name)
+        self.patcher.start()
+        self.client = FoxitClient()
+        self.client.client_id = "id"
+        self.client.client_secret = "secret"
+        self.client.local_max_html_chars = 5000
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_auto_mode_selects_by_size_and_credentials(self):
+        local, foxit = self.client.pdf_backends["local"], self.client.pdf_backends["foxit"]
+        self.assertIs(self.client.select_pdf_backend("x" * 100), local)
+        self.assertIs(self.client.select_pdf_backend("x" * 10000), foxit)
+
+        self.client.pdf_backend_mode = "foxit"
+        self.assertIs(self.client.select_pdf_backend("x" * 100), foxit)
+        self.client.client_secret = None
+        self.assertIs(self.client.select_pdf_backend("x" * 10000), local)
+
+    def test_small_documents_skip_foxit(self):
+        foxit = self.client.pdf_backends["foxit"]
+        with patch.object(foxit, "render_async") as remote:
+            path = asyncio.run(self.client.generate_pdf_from_html_async(_context(), "meeting_notes"))
+        remote.assert_not_called()
+        with open(path, "rb") as f:
+            self.assertTrue(f.read().startswith(b"%PDF-1.4"))
+
+    def test_foxit_failure_falls_back_to_local(self):
+        self.client.local_max_html_chars = 0
+        foxit = self.client.pdf_backends["foxit"]
+        with patch.object(foxit, "render", side_effect=RuntimeError("503")):
+            path = self.client.generate_pdf_from_html(_context(), "meeting_notes")
+        self.assertTrue(os.path.exists(path))
+
+        self.client.pdf_backend_mode = "foxit"
+        with patch.object(foxit, "render", side_effect=RuntimeError("503")):
+            self.assertEqual(self.client.generate_pdf_from_html(_context(items=4), "meeting_notes"), "")
+
+class TestPdfStreaming(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(pdf_store, "PDF_OUTPUT_DIR", self.tmp.name)
+        self.patcher.start()
+        self.client = FoxitClient()
+        self.client.local_max_html_chars = 0
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def _foxit(self, handler):
+        self.client.client_id = "id"
+        self.client.client_secret = "secret"
+        self.client.tokens._store("token", 3600)
+        self.client._async_http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def _collect(self, stream):
+        return b"".join([chunk async for chunk in stream])
+
+    async def test_streamed_bytes_are_the_stored_enhanced_pdf(self):
+        context = _context(items=150)
+        stream = await self.client.stream_pdf_async(context, "meeting_notes")
+        body = await self._collect(stream)
+
+        self.assertTrue(stream.complete)
+        with open(stream.path, "rb") as f:
+            self.assertEqual(f.read(), body)
+        # Same bytes and name as rendering to disk and enhancing afterwards
+        self.assertTrue(body.startswith(LocalPdfRenderer().render(context)))
+        raw = await self.client.generate_pdf_from_html_async(context, "meeting_notes")
+        self.assertEqual(self.client.enhance_pdf(raw), stream.path)
+        with open(stream.path, "rb") as f:
+            pages = PdfReader(f).pages()
+        self.assertTrue(all(len(page["Contents"]) == 3 for _, page, _ in pages))
+
+        again = await self.client.stream_pdf_async(context, "meeting_notes")
+        self.assertIsNone(again.chunks)
+        self.assertEqual(again.path, stream.path)
+
+    async def test_remote_chunks_are_relayed_as_they_arrive(self):
+        pdf = LocalPdfRenderer().render(_context(items=150))
+
+        async def body():
+            for i in range(0, len(pdf), 1000):
+                yield pdf[i:i + 1000]
+
+        self._foxit(lambda request: httpx.Response(200, content=body()))
+
+        stream = await self.client.stream_pdf_async(_context(items=150), "meeting_notes")
+        chunks = [chunk async for chunk in stream]
+        await self.client.aclose()
+
+        # One chunk per 8 KiB read from Foxit, then the enhancement update
+        self.assertEqual(len(chunks), -(-len(pdf) // 8192) + 1)
+        self.assertEqual(b"".join(chunks[:-1]), pdf)
+        self.assertIn(b"(CONFIDENTIAL) Tj", chunks[-1])
+        self.assertTrue(os.path.exists(stream.path))
+
+    async def test_failure_before_first_byte_falls_back_and_aborted_stream_leaves_no_file(self):
+        self._foxit(lambda request: httpx.Response(503))
+        stream = await self.client.stream_pdf_async(_context(), "meeting_notes")
+        body = await self._collect(stream)
+        await self.client.aclose()
+        self.assertTrue(body.startswith(b"%PDF-1.4"))
+
+        self.client.pdf_backend_mode = "local"
+        partial = await self.client.stream_pdf_async(_context(items=200), "meeting_notes")
+        iterator = partial.__aiter__()
+        await iterator.__anext__()
+        await iterator.aclose()
+
+        self.assertFalse(partial.complete)
+        self.assertFalse(os.path.exists(partial.path))
+        self.assertEqual([name for _, _, files in os.walk(self.tmp.name) for name in files if name.endswith(".part")], [])
+
+class TestAsyncRenderAndEnhance(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(pdf_store, "PDF_OUTPUT_DIR", self.tmp.name)
+        self.patcher.start()
+        self.client = FoxitClient()
+        self.client.client_id = "id"
+        self.client.client_secret = "secret"
+        self.client.tokens._store("token", 3600)
+        self.client.local_max_html_chars = 0
+        self.requests = []
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def _doc_gen(self, status=200, content=b"%PDF-1.7 from foxit"):
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return httpx.Response(status, content=content)
+        self.client._async_http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_doc_gen_response_is_streamed_to_disk_and_reused(self):
+        self._doc_gen()
+
+        path = await self.client.generate_pdf_from_html_async(_context(), "meeting_notes")
+        again = await self.client.generate_pdf_from_html_async(_context(), "meeting_notes")
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.7 from foxit")
+        self.assertEqual(again, path)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.requests[0].headers["Authorization"], "Bearer token")
+        self.assertIn("Weekly Sync", json.loads(self.requests[0].content)["html"])
+
+    async def test_doc_gen_failure_falls_back_to_local(self):
+        self._doc_gen(status=503)
+
+        path = await self.client.generate_pdf_from_html_async(_context(), "meeting_notes")
+        with open(path, "rb") as f:
+            self.assertTrue(f.read().startswith(b"%PDF-1.4"))
+
+        self.client.pdf_backend_mode = "foxit"
+        self.assertEqual(await self.client.generate_pdf_from_html_async(_context(items=4), "meeting_notes"), "")
+
+    async def test_local_enhancement_matches_the_sync_path(self):
+        self.client.pdf_backend_mode = "local"
+        raw = await self.client.generate_pdf_from_html_async(_context(), "meeting_notes")
+
+        enhanced = await self.client.enhance_pdf_async(raw)
+
+        self.assertNotEqual(enhanced, raw)
+        self.assertEqual(self.client.enhance_pdf(raw), enhanced)
+        with open(enhanced, "rb") as f:
+            self.assertIn(b"(CONFIDENTIAL) Tj", f.read())
+
+    async def test_foxit_enhancement_runs_a_task_and_falls_back_locally(self):
+        self.client.pdf_backend_mode = "local"
+        self.client.enhance_backend = "foxit"
+        raw = await self.client.generate_pdf_from_html_async(_context(), "meeting_notes")
+
+        async def run(pdf_path, output_path, operation, options):
+            with pdf_store.atomic_writer(output_path) as f:
+                f.write(b"%PDF-1.7 enhanced by foxit")
+            return output_path
+
+        with patch.object(self.client.tasks, "run", AsyncMock(side_effect=run)) as task:
+            enhanced = await self.client.enhance_pdf_async(raw, {"watermark": "DRAFT"})
+        self.assertEqual(task.call_args.args[0], raw)
+        self.assertEqual(task.call_args.args[3]["watermark"], "DRAFT")
+        with open(enhanced, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.7 enhanced by foxit")
+
+        with patch.object(self.client.tasks, "run", AsyncMock(side_effect=RuntimeError("task failed"))):
+            local = await self.client.enhance_pdf_async(raw, {"watermark": "FINAL"})
+        self.assertEqual(local, self.client.enhance_pdf(raw, {"watermark": "FINAL"}))
+        self.assertNotEqual(local, enhanced)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import tempfile
+import re
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.pdf_enhance import PdfReader, Ref, enhance_file
+from services.pdf_local import LocalPdfRenderer
+
+def _context(items=3):
+    return {
+        "title": "Weekly Sync",
+        "doc_type": "meeting_notes",
+        "structured_data": {"action_items": [{"task": f"Task {i}", "owner": "Alice"} for i in range(items)]},
+    }
+
+def _xref_offsets(pdf: bytes, startxref: int) -> dict:
+    """num -> offset for one classic xref section."""
+    section = pdf[startxref:pdf.index(b"trailer", startxref)]
+    offsets, lines = {}, section.split(b"\n")[1:]
+    i = 0
+    while i < len(lines) and lines[i].strip():
+        start, count = map(int, lines[i].split())
+        for n in range(count):
+            offset, _, kind = lines[i + 1 + n].split()
+            if kind == b"n":
+                offsets[start + n] = int(offset)
+        i += count + 1
+    return offsets
+
+class TestPdfEnhance(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "doc.pdf")
+        self.output = os.path.join(self.tmp.name, "doc_enhanced.pdf")
+        with open(self.source, "wb") as f:
+            f.write(LocalPdfRenderer().render(_context(items=150)))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _enhance(self, options):
+        self.assertTrue(enhance_file(self.source, self.output, options))
+        with open(self.source, "rb") as f:
+            original = f.read()
+        with open(self.output, "rb") as f:
+            return original, f.read()
+
+    def test_update_is_appended_after_the_original_bytes(self):
+        original, enhanced = self._enhance({"watermark": "CONFIDENTIAL", "page_numbers": True})
+
+        self.assertTrue(enhanced.startswith(original))
+        update = enhanced[len(original):]
+        self.assertEqual(update.count(b"startxref"), 1)
+        self.assertIn(b"/Prev %d" % int(re.search(rb"startxref\n(\d+)", original).group(1)), update)
+
+        startxref = int(re.findall(rb"startxref\n(\d+)", enhanced)[-1])
+        self.assertGreaterEqual(startxref, len(original))
+        for number, offset in _xref_offsets(enhanced, startxref).items():
+            self.assertTrue(enhanced[offset:].startswith(b"%d 0 obj" % number))
+
+    def test_all_options_are_applied_in_one_update(self):
+        _, enhanced = self._enhance({
+            "watermark": "CONFIDENTIAL",
+            "page_numbers": True,
+            "metadata": {"title": "Roadmap ☃", "subject": "meeting_notes"},
+        })
+
+        with open(self.output, "rb") as f:
+            reader = PdfReader(f)
+            pages = reader.pages()
+            info = reader.resolve(reader.trailer["Info"])
+
+        self.assertGreater(len(pages), 1)
+        self.assertEqual(enhanced.count(b"%%EOF"), 2)
+        self.assertEqual(enhanced.count(b"(CONFIDENTIAL) Tj"), len(pages))
+        self.assertIn(b"(Page %d of %d) Tj" % (len(pages), len(pages)), enhanced)
+        for _, page, _ in pages:
+            # Original content first, wrapped between the q stream and the overlay
+            self.assertEqual(len(page["Contents"]), 3)
+            self.assertIn("DMF2", page["Resources"]["Font"])
+            self.assertIn("F1", page["Resources"]["Font"])
+        self.assertEqual(info["Subject"], b"(meeting_notes)")
+        self.assertTrue(info["Title"].startswith(b"<FEFF"))
+        self.assertEqual(info["Producer"], b"(DocuMind)")
+
+    def test_same_input_and_options_give_identical_bytes(self):
+        options = {"watermark": "CONFIDENTIAL", "page_numbers": True, "metadata": {"title": "Roadmap"}}
+        _, first = self._enhance(options)
+        _, second = self._enhance(options)
+
+        self.assertEqual(first, second)
+        self.assertNotIn(b"/ModDate", first)
+
+    def test_enhanced_output_can_be_enhanced_again(self):
+        self._enhance({"watermark": "DRAFT"})
+        second = os.path.join(self.tmp.name, "twice.pdf")
+        self.assertTrue(enhance_file(self.output, second, {"page_numbers": True}))
+
+        with open(second, "rb") as f:
+            reader = PdfReader(f)
+            pages = reader.pages()
+        # Newest xref section wins: pages resolve to the second update
+        self.assertEqual(len(pages[0][1]["Contents"]), 5)
+        self.assertIsInstance(reader.trailer["Prev"], int)
+
+    def test_unsupported_pdf_is_copied_unchanged(self):
+        with open(self.source, "wb") as f:
+            f.write(b"%PDF-1.5\n1 0 obj\n<< /Type /XRef >>\nstream\nendstream\nendobj\nstartxref\n9\n%%EOF\n")
+
+        self.assertFalse(enhance_file(self.source, self.output, {"watermark": "CONFIDENTIAL"}))
+        with open(self.source, "rb") as a, open(self.output, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_reader_parses_references_and_page_tree(self):
+        with open(self.source, "rb") as f:
+            count = int(re.search(rb"/Count (\d+)", f.read()).group(1))
+            reader = PdfReader(f)
+            self.assertEqual(reader.trailer["Root"], Ref(1, 0))
+            self.assertEqual(len(reader.pages()), count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import unittest
+import tempfile
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.getcwd()))
+from core import pdf_store
+from core.pdf_store import raw_pdf_path, enhanced_pdf_path, atomic_writer, file_etag, etag_matches, is_content_addressed, shard_path, PdfStorage
+from services.foxit import FoxitClient
+
+class TestPdfStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(pdf_store, "PDF_OUTPUT_DIR", self.tmp.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_paths_are_content_addressed(self):
+        a = raw_pdf_path("meeting_notes", "<h1>A</h1>", "foxit-blink")
+        self.assertEqual(a, raw_pdf_path("meeting_notes", "<h1>A</h1>", "foxit-blink"))
+        self.assertNotEqual(a, raw_pdf_path("meeting_notes", "<h1>B</h1>", "foxit-blink"))
+        self.assertNotEqual(a, raw_pdf_path("meeting_notes", "<h1>A</h1>", "mock"))
+        self.assertTrue(os.path.basename(a).startswith("meeting_notes-"))
+
+        enhanced = enhanced_pdf_path(a, {"watermark": "CONFIDENTIAL"})
+        self.assertEqual(enhanced, enhanced_pdf_path(a, {"watermark": "CONFIDENTIAL"}))
+        self.assertNotEqual(enhanced, enhanced_pdf_path(a, {"watermark": "DRAFT"}))
+        self.assertTrue(enhanced.endswith("_enhanced.pdf"))
+
+    def test_enhanced_path_hashes_non_addressed_input(self):
+        path = os.path.join(self.tmp.name, "upload.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 one")
+        first = enhanced_pdf_path(path)
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 two")
+        self.assertNotEqual(first, enhanced_pdf_path(path))
+
+    def test_atomic_writer_never_leaves_partial_files(self):
+        path = os.path.join(self.tmp.name, "doc.pdf")
+        with self.assertRaises(RuntimeError):
+            with atomic_writer(path) as f:
+                f.write(b"%PDF-partial")
+                raise RuntimeError("connection dropped")
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+        with atomic_writer(path) as f:
+            f.write(b"%PDF-complete")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-complete")
+
+    def test_download_validators(self):
+        raw = raw_pdf_path("meeting_notes", "<h1>A</h1>", "local-v1")
+        self.assertTrue(is_content_addressed(raw))
+        self.assertTrue(is_content_addressed(enhanced_pdf_path(raw, {})))
+        self.assertFalse(is_content_addressed("upload.pdf"))
+
+        path = os.path.join(self.tmp.name, "doc.pdf")
+        with atomic_writer(path) as f:
+            f.write(b"%PDF-1.4 one")
+        etag = file_etag(path)
+        self.assertEqual(etag, file_etag(path))
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        with atomic_writer(path) as f:
+            f.write(b"%PDF-1.4 two!")
+        self.assertNotEqual(etag, file_etag(path))
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+    def test_identical_renders_are_reused(self):
+        client = FoxitClient()
+        client.client_id = client.client_secret = None
+        data = {"title": "Sync", "doc_type": "general", "date": "Oct 27, 2025", "structured_data": {"summary": "Hi"}}
+
+        local = client.pdf_backends["local"]
+        with patch.object(local, "render", wraps=local.render) as write:
+            first = client.generate_pdf_from_html(data, "general")
+            second = asyncio.run(client.generate_pdf_from_html_async(data, "general"))
+            other = client.generate_pdf_from_html({**data, "title": "Other"}, "general")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(write.call_count, 2)
+
+        enhanced = client.enhance_pdf(first)
+        self.assertEqual(enhanced, client.enhance_pdf(first))
+        self.assertNotEqual(enhanced, client.enhance_pdf(first, {"watermark": "DRAFT"}))
+        self.assertTrue(os.path.exists(enhanced))
+
+    def test_render_is_skipped_once_the_raw_pdf_was_superseded(self):
+        client = FoxitClient()
+        client.client_id = client.client_secret = None
+        data = {"title": "Sync", "doc_type": "general", "date": "Oct 27, 2025", "structured_data": {"summary": "Hi"}}
+        storage = PdfStorage(self.tmp.name)
+
+        local = client.pdf_backends["local"]
+        with patch.object(local, "render", wraps=local.render) as write, patch("services.foxit.pdf_storage", storage):
+            for _ in range(2):
+                raw = asyncio.run(client.generate_pdf_from_html_async(data, "general"))
+                enhanced = asyncio.run(client.enhance_pdf_async(raw))
+                # What the pipeline does once enhancement succeeded
+                storage.add(enhanced, source=raw)
+                self.assertFalse(os.path.exists(raw))
+            self.assertEqual(client.generate_pdf_from_html(data, "general"), raw)
+
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(client.enhance_pdf(raw), enhanced)
+
+class TestPdfStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = PdfStorage(self.tmp.name, max_bytes=1000, max_age_seconds=3600, evict_interval=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, size=100):
+        path = shard_path(name, self.tmp.name)
+        with atomic_writer(path) as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_files_are_sharded_and_resolved_through_the_index(self):
+        path = self._write("a.pdf")
+        self.assertEqual(os.path.relpath(path, self.tmp.name).count(os.sep), 2)
+        self.assertIsNone(self.storage.resolve("b.pdf"))
+
+        self.storage.add(path)
+        self.assertEqual(self.storage.resolve("a.pdf"), path)
+        self.assertEqual(self.storage.total_bytes, 100)
+        self.assertEqual(len(self.storage), 1)
+
+        os.remove(path)
+        self.assertIsNone(self.storage.resolve("a.pdf"))
+        self.assertEqual(self.storage.total_bytes, 0)
+
+    def test_files_written_by_another_process_are_found_in_their_shard(self):
+        path = self._write("elsewhere.pdf")  # never add()ed to this index
+        self.assertEqual(self.storage.resolve("elsewhere.pdf"), path)
+        self.assertEqual(self.storage.total_bytes, 100)
+        self.assertIsNone(self.storage.resolve("../elsewhere.pdf"))
+        self.assertIsNone(self.storage.resolve("missing.pdf"))
+        self.assertEqual(len(self.storage), 1)
+
+    def test_enhanced_pdf_supersedes_its_raw_source(self):
+        raw, enhanced = self._write("doc.pdf"), self._write("doc_enhanced.pdf", 150)
+        self.storage.add(raw)
+        self.storage.add(enhanced, source=raw)
+
+        self.assertFalse(os.path.exists(raw))
+        self.assertIsNone(self.storage.resolve("doc.pdf"))
+        self.assertEqual(self.storage.total_bytes, 150)
+
+    def test_evicts_least_recently_used_above_quota(self):
+        paths = {}
+        for i in range(12):
+            paths[i] = self._write(f"{i}.pdf")
+            self.storage.add(paths[i])
+            self.storage._entries[f"{i}.pdf"]["used_at"] = 1000 + i
+        self.storage._entries["0.pdf"]["used_at"] = 2000  # recently downloaded
+
+        evicted = self.storage.evict(now=2001)
+
+        self.assertEqual(evicted, 3)  # 1200 bytes -> 90% of the 1000 byte quota
+        self.assertEqual(self.storage.total_bytes, 900)
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[4]))
+        for i in (1, 2, 3):
+            self.assertFalse(os.path.exists(paths[i]))
+
+    def test_evicts_by_age(self):
+        old, new = self._write("old.pdf"), self._write("new.pdf")
+        self.storage.add(old)
+        self.storage.add(new)
+        self.storage._entries["old.pdf"]["used_at"] -= 7200
+
+        self.assertEqual(self.storage.evict(), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+    def test_rebuild_indexes_shards_and_migrates_flat_files(self):
+        sharded = self._write("sharded.pdf")
+        with open(os.path.join(self.tmp.name, "flat.pdf"), "wb") as f:
+            f.write(b"y" * 50)
+
+        self.assertEqual(self.storage.rebuild(), 2)
+        self.assertEqual(self.storage.resolve("sharded.pdf"), sharded)
+        self.assertEqual(self.storage.resolve("flat.pdf"), shard_path("flat.pdf", self.tmp.name))
+        self.assertEqual(self.storage.total_bytes, 150)
+
+    async def test_background_eviction_runs_when_quota_is_exceeded(self):
+        self.storage.evict_interval = 30
+        await self.storage.start()
+        for i in range(3):
+            self.storage.add(self._write(f"{i}.pdf", 400))
+        for _ in range(100):
+            if self.storage.total_bytes <= 900:
+                break
+            await asyncio.sleep(0.01)
+        await self.storage.stop()
+        self.assertLessEqual(self.storage.total_bytes, 900)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from unittest.mock import AsyncMock, patch, MagicMock
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core import pipeline
+from services.llm import llm_service
+
+class TestProcessBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_bounded_concurrency_and_per_item_errors(self):
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_pipeline(text, source_type="text", on_stage=None):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            if text == "bad":
+                raise RuntimeError("boom")
+            return {"doc_type": "general", "title": text}
+
+        items = [(f"doc {i}", "text") for i in range(10)] + [("bad", "text")]
+        with patch.object(pipeline, "process_document_pipeline_async", fake_pipeline):
+            results = {index: outcome async for index, outcome in pipeline.process_batch_async(items, concurrency=3)}
+
+        self.assertEqual(in_flight["max"], 3)
+        self.assertEqual(len(results), 11)
+        self.assertEqual(results[4]["title"], "doc 4")
+        self.assertIsInstance(results[10], RuntimeError)
+
+class TestFallbackResultsAreNotCached(unittest.IsolatedAsyncioTestCase):
+    async def _run(self, structure):
+        async def fake_graph(structure_step, on_stage=None):
+            doc_type, structured_data = await structure_step()
+            return {"doc_type": doc_type, "structured_data": structured_data, "pdf_path": "doc.pdf"}
+
+        cache = MagicMock()
+        cache.get.return_value = None
+        with patch.object(pipeline, "result_cache", cache), \
+                patch.object(pipeline, "_run_document_graph", fake_graph), \
+                patch.object(pipeline, "_classify_and_structure_async", structure):
+            await pipeline.process_document_pipeline_async("Some notes.")
+        return cache
+
+    async def test_mock_structure_is_not_cached(self):
+        async def structure(text, on_stage=None):
+            # Runs in a child task, like the graph's LLM stage
+            return await asyncio.create_task(asyncio.to_thread(lambda: ("general", llm_service.mock_structured_data("general"))))
+
+        cache = await self._run(structure)
+        cache.set.assert_not_called()
+
+    async def test_classification_fallback_is_not_cached(self):
+        async def structure(text, on_stage=None):
+            with patch.object(llm_service, "async_client") as client:
+                client.chat.completions.create.side_effect = RuntimeError("429 quota exceeded")
+                doc_type = await llm_service.classify_text_async(text, use_local=False)
+            return doc_type, {"title": "Notes"}
+
+        cache = await self._run(structure)
+        cache.set.assert_not_called()
+
+    async def test_real_results_are_cached(self):
+        async def structure(text, on_stage=None):
+            return "general", {"title": "Notes"}
+
+        cache = await self._run(structure)
+        cache.set.assert_called_once()
+
+class TestStageReporting(unittest.IsolatedAsyncioTestCase):
+    async def _stages(self, single):
+        stages = []
+
+        async def on_stage(stage, status):
+            stages.append((stage, status))
+
+        with patch.object(pipeline, "LLM_SINGLE_PASS", True), \
+                patch.object(llm_service, "classify_locally", return_value=None), \
+                patch.object(llm_service, "classify_and_structure_async", AsyncMock(return_value=single)), \
+                patch.object(llm_service, "classify_text_async", AsyncMock(return_value="prd")), \
+                patch.object(llm_service, "structure_text_async", AsyncMock(return_value={"title": "T"})):
+            await pipeline._classify_and_structure_async("Some notes.", on_stage)
+        return stages
+
+    async def test_ambiguous_single_pass_keeps_stages_sequential(self):
+        self.assertEqual(await self._stages(None), [
+            ("classify", "running"), ("classify", "done"), ("structure", "running"), ("structure", "done"),
+        ])
+
+    async def test_single_pass_answer_completes_both_stages(self):
+        single = {"doc_type": pipeline.DocumentType.PRD, "structured_data": {"title": "T"}}
+        self.assertEqual(await self._stages(single), [
+            ("classify", "running"), ("classify", "done"), ("structure", "running"), ("structure", "done"),
+        ])
+
+class TestStreamingPipeline(unittest.IsolatedAsyncioTestCase):
+    async def _events(self, deltas, error=None):
+        async def create(**kwargs):
+            async def chunks():
+                for delta in deltas:
+                    chunk = MagicMock()
+                    chunk.choices[0].delta.content = delta
+                    yield chunk
+                if error:
+                    raise error
+            return chunks()
+
+        async def fake_graph(structure_step, on_stage=None):
+            doc_type, structured_data = await structure_step()
+            self.structured_data = structured_data
+            return {"doc_type": doc_type.value, "title": structured_data.get("title"), "pdf_path": "", "cached": False}
+
+        cache = MagicMock()
+        cache.get.return_value = None
+        client = MagicMock()
+        client.chat.completions.create = create
+        with patch.object(pipeline, "result_cache", cache), \
+                patch.object(pipeline, "_run_document_graph", fake_graph), \
+                patch.object(llm_service, "classify_locally", return_value=None), \
+                patch.object(llm_service, "async_client", client):
+            events = [event async for event in pipeline.stream_document_pipeline_async("Some notes.")]
+        return events, cache
+
+    async def test_cut_off_stream_keeps_the_sections_already_sent(self):
+        events, cache = await self._events(
+            ['{"doc_type": "prd", "title": "Search", "content": {"overview": "Fast", ', '"goals": ["a"'],
+            error=RuntimeError("connection reset"),
+        )
+
+        self.assertEqual(events[:-1], [
+            ("meta", {"key": "doc_type", "value": "prd"}),
+            ("meta", {"key": "title", "value": "Search"}),
+            ("section", {"key": "overview", "value": "Fast"}),
+        ])
+        self.assertEqual(events[-1][0], "document")
+        self.assertEqual(events[-1][1]["title"], "Search")
+        self.assertEqual(self.structured_data["content"], {"overview": "Fast"})
+        cache.set.assert_not_called()
+
+    async def test_failure_before_any_section_uses_mock_data(self):
+        events, cache = await self._events(['{"doc_'], error=RuntimeError("connection reset"))
+
+        self.assertEqual(events[-1][1]["title"], llm_service.mock_structured_data("general")["title"])
+        self.assertIn(("meta", {"key": "title", "value": events[-1][1]["title"]}), events)
+        cache.set.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
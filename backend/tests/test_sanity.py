@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import httpx
 
 sys.path.append(os.path.join(os.getcwd()))
 from services.sanity import SanityClient
@@ -11,7 +12,7 @@ class TestSanityClient(unittest.TestCase):
         self.client = SanityClient()
         self.client.token = "fake-token" # Ensure methods run
 
-    @patch('services.sanity.requests.post')
+    @patch('services.sanity.http_pool.session.post')
     def test_create_document(self, mock_post):
         # Mock successful response
         mock_post.return_value.status_code = 200
@@ -32,7 +33,7 @@ class TestSanityClient(unittest.TestCase):
         self.assertIn("mutations", kwargs['json'])
         self.assertEqual(kwargs['json']['mutations'][0]['create']['title'], "Test Doc")
 
-    @patch('services.sanity.requests.get')
+    @patch('services.sanity.http_pool.session.get')
     def test_get_documents(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -47,7 +48,7 @@ class TestSanityClient(unittest.TestCase):
         args, kwargs = mock_get.call_args
         self.assertIn("generatedDocument", kwargs['params']['query'])
 
-    @patch('services.sanity.requests.get')
+    @patch('services.sanity.http_pool.session.get')
     def test_get_open_tasks(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -58,5 +59,26 @@ class TestSanityClient(unittest.TestCase):
         self.assertEqual(len(tasks), 1)
         self.assertEqual(len(tasks[0]['tasks']), 1)
 
+class TestSanityClientAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = SanityClient()
+        self.client.token = "fake-token"
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_create_document_async(self):
+        seen = {}
+
+        def handler(request):
+            seen["body"] = request.content
+            return httpx.Response(200, json={"results": [{"id": "123"}]})
+
+        self.client._async_http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        response = await self.client.create_document_async("meeting_notes", "Test Doc", {"summary": "S"}, "/tmp/test.pdf")
+
+        self.assertEqual(response, {"results": [{"id": "123"}]})
+        self.assertIn(b"Test Doc", seen["body"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.stages import StageGraph
+
+def _sleeper(seconds, value=None):
+    async def stage(inputs):
+        await asyncio.sleep(seconds)
+        return value if value is not None else inputs
+    return stage
+
+class TestStageGraph(unittest.IsolatedAsyncioTestCase):
+    async def test_independent_stages_overlap(self):
+        graph = (
+            StageGraph()
+            .add("llm", _sleeper(0.1, "structured"))
+            .add("auth", _sleeper(0.05, "token"))
+            .add("templates", _sleeper(0.05, "compiled"))
+            .add("render", _sleeper(0.02), deps=("llm", "auth", "templates"))
+        )
+
+        start = time.perf_counter()
+        run = await graph.run()
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.17)
+        self.assertEqual(run.results["render"], {"llm": "structured", "auth": "token", "templates": "compiled"})
+        self.assertEqual(run.critical_path(), ["llm", "render"])
+        self.assertEqual(run.report()["critical_path"], ["llm", "render"])
+
+    async def test_optional_stage_failure_is_non_blocking(self):
+        async def broken(_):
+            raise RuntimeError("warmup failed")
+
+        graph = (
+            StageGraph()
+            .add("warmup", broken, optional=True)
+            .add("work", _sleeper(0, "done"), deps=("warmup",))
+        )
+        run = await graph.run()
+        self.assertIsNone(run.results["warmup"])
+        self.assertEqual(run.results["work"], "done")
+
+    async def test_required_stage_failure_propagates(self):
+        async def broken(_):
+            raise RuntimeError("llm down")
+
+        graph = StageGraph().add("llm", broken).add("render", _sleeper(0), deps=("llm",))
+        with self.assertRaises(RuntimeError):
+            await graph.run()
+
+    def test_unknown_dependency_rejected(self):
+        with self.assertRaises(ValueError):
+            StageGraph().add("render", _sleeper(0), deps=("llm",))
+
+if __name__ == '__main__':
+    unittest.main()
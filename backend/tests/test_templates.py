@@ -0,0 +1,52 @@
+import unittest
+import tempfile
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.getcwd()))
+from services.foxit import FoxitClient, create_template_env, warmup_context
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+class TestTemplateCache(unittest.TestCase):
+    def test_warmup_persists_bytecode(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = FoxitClient()
+            client.template_env = create_template_env(cache_dir=cache_dir, auto_reload=False)
+
+            count = client.warm_templates()
+
+            self.assertEqual(count, 4)
+            self.assertEqual(len(os.listdir(cache_dir)), count)
+
+            # A fresh worker renders from the persisted bytecode
+            env = create_template_env(cache_dir=cache_dir, auto_reload=False)
+            html = env.get_template("general.html").render(**warmup_context("general"))
+            self.assertIn("Warmup", html)
+
+class TestThreadedRendering(unittest.IsolatedAsyncioTestCase):
+    async def test_only_large_contexts_use_the_executor(self):
+        client = FoxitClient()
+        client.render_executor = RecordingExecutor()
+        client.render_thread_threshold = 1000
+        small = warmup_context("general")
+        large = {**small, "structured_data": {"action_items": ["x" * 100] * 50}}
+
+        small_html = await client._render_html_async(small, "general")
+        large_html = await client._render_html_async(large, "general")
+
+        self.assertEqual(client.render_executor.submitted, 1)
+        self.assertEqual(small_html, client._render_html(small, "general"))
+        self.assertIn("x" * 100, large_html)
+        client.render_executor.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
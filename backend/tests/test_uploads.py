@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd()))
+from core.uploads import MultipartFileStream, UploadError, UploadTooLargeError
+
+BOUNDARY = "----documind"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+def _multipart(parts):
+    body = b""
+    for name, filename, content_type, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if content_type:
+            body += f"Content-Type: {content_type}\r\n".encode()
+        body += b"\r\n" + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+async def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+class TestMultipartFileStream(unittest.IsolatedAsyncioTestCase):
+    async def _read(self, body, size=7, max_bytes=10 ** 6):
+        upload = await MultipartFileStream(_chunks(body, size), CONTENT_TYPE, "file", max_bytes).open()
+        return upload, b"".join([chunk async for chunk in upload])
+
+    async def test_streams_the_file_field_across_chunk_boundaries(self):
+        audio = bytes(range(256)) * 40
+        body = _multipart([
+            ("note", None, None, b"ignored"),
+            ("file", "call.mp3", "audio/mpeg", audio),
+            ("extra", None, None, b"after"),
+        ])
+
+        upload, data = await self._read(body)
+
+        self.assertEqual(data, audio)
+        self.assertEqual(upload.filename, "call.mp3")
+        self.assertEqual(upload.content_type, "audio/mpeg")
+        self.assertEqual(upload.size, len(audio))
+
+    async def test_open_consumes_only_the_start_of_the_body(self):
+        consumed = []
+
+        async def body():
+            data = _multipart([("file", "a.wav", "audio/wav", b"x" * 10000)])
+            for i in range(0, len(data), 100):
+                consumed.append(i)
+                yield data[i:i + 100]
+
+        upload = await MultipartFileStream(body(), CONTENT_TYPE, "file", 10 ** 6).open()
+        self.assertEqual(len(consumed), 2)
+        self.assertGreater(upload.size, 0)
+
+    async def test_oversized_file_is_rejected_while_streaming(self):
+        body = _multipart([("file", "big.mp3", "audio/mpeg", b"x" * 5000)])
+        with self.assertRaises(UploadTooLargeError):
+            await self._read(body, size=512, max_bytes=4096)
+
+    async def test_invalid_uploads(self):
+        with self.assertRaises(UploadError):
+            MultipartFileStream(_chunks(b"", 1), "application/json", "file", 100)
+        with self.assertRaises(UploadError):
+            await self._read(_multipart([("other", "a.mp3", "audio/mpeg", b"abc")]))
+        truncated = _multipart([("file", "a.mp3", "audio/mpeg", b"x" * 1000)])[:500]
+        with self.assertRaises(UploadError):
+            await self._read(truncated)
+
+if __name__ == '__main__':
+    unittest.main()
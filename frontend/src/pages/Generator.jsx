@@ -26,9 +26,11 @@ function GeneratorContent() {
     const [pdfPath, setPdfPath] = useState(null)
     const [error, setError] = useState(null)
     const [isRecording, setIsRecording] = useState(false)
+    const [liveText, setLiveText] = useState('')
 
     const mediaRecorderRef = useRef(null)
     const chunksRef = useRef([])
+    const liveRef = useRef(null)
 
     // ── Voice Recording Logic ─────────────────────────────
     const startRecording = async () => {
@@ -36,17 +38,44 @@ function GeneratorContent() {
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true })
             mediaRecorderRef.current = new MediaRecorder(stream)
             chunksRef.current = []
+            setLiveText('')
+
+            // Stream to /ws/transcribe while recording; the upload below is only the fallback
+            const finals = []
+            const live = api.openLiveTranscription((segment) => {
+                const text = `Speaker ${segment.speaker ?? 0}: ${segment.text}`
+                if (segment.type === 'final') finals.push(text)
+                setLiveText([...finals, ...(segment.type === 'interim' ? [text] : [])].join('\n'))
+            })
+            liveRef.current = live
+            live.opened.catch(() => { liveRef.current = null })
 
             mediaRecorderRef.current.ondataavailable = (e) => {
-                if (e.data.size > 0) chunksRef.current.push(e.data)
+                if (e.data.size > 0) {
+                    chunksRef.current.push(e.data)
+                    liveRef.current?.send(e.data)
+                }
             }
 
             mediaRecorderRef.current.onstop = async () => {
+                stream.getTracks().forEach(track => track.stop())
+                if (liveRef.current) {
+                    try {
+                        const result = await liveRef.current.stop()
+                        setRawText(result.formatted_transcript || result.transcript)
+                        setInputMode('text')
+                        return
+                    } catch (err) {
+                        console.error("Live transcription failed, uploading instead:", err)
+                    } finally {
+                        liveRef.current = null
+                    }
+                }
                 const blob = new Blob(chunksRef.current, { type: 'audio/webm' })
                 await handleTranscribe(blob)
             }
 
-            mediaRecorderRef.current.start()
+            mediaRecorderRef.current.start(250) // emit a chunk every 250 ms
             setIsRecording(true)
             setError(null)
         } catch (err) {
@@ -157,6 +186,9 @@ function GeneratorContent() {
                             {isRecording ? (
                                 <>
                                     <div className="animate-pulse text-red-400 font-bold mb-2">Recording in progress...</div>
+                                    {liveText && (
+                                        <div className="max-h-20 overflow-y-auto px-4 text-sm text-[var(--dm-text-muted)] whitespace-pre-line">{liveText}</div>
+                                    )}
                                     <Button themeColor="error" size="large" onClick={stopRecording} icon="stop">
                                         <StopCircle className="mr-2" /> Stop Recording
                                     </Button>
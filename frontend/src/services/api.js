@@ -65,5 +65,46 @@ export const api = {
         } catch (error) {
             throw new Error(error.response?.data?.detail || 'Transcription failed');
         }
+    },
+
+    // Live Transcription (WebSocket): send() microphone chunks while recording,
+    // onSegment receives interim/final segments as they arrive, and stop()
+    // resolves with the finished transcript.
+    openLiveTranscription: (onSegment) => {
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}/api/ws/transcribe`);
+        // Audio recorded while the socket is still connecting is held, then sent in order
+        const queued = [];
+        const deliver = (data) => {
+            if (socket.readyState === WebSocket.CONNECTING) queued.push(data);
+            else if (socket.readyState === WebSocket.OPEN) socket.send(data);
+        };
+        const opened = new Promise((resolve, reject) => {
+            socket.onopen = (event) => {
+                queued.splice(0).forEach((data) => socket.send(data));
+                resolve(event);
+            };
+            socket.onerror = () => reject(new Error('Live transcription unavailable'));
+        });
+        const finished = new Promise((resolve, reject) => {
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'transcript') resolve(message);
+                else if (message.type === 'error') reject(new Error(message.detail));
+                else onSegment(message);
+            };
+            socket.onclose = () => reject(new Error('Live transcription closed early'));
+        });
+        finished.catch(() => {}); // surfaced by stop()
+
+        return {
+            opened,
+            send: deliver,
+            stop: () => {
+                deliver(JSON.stringify({ type: 'stop' }));
+                return finished;
+            },
+            close: () => socket.close(),
+        };
     }
 };